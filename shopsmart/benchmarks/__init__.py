@@ -0,0 +1,18 @@
+"""
+Бенчмарки производительности проекта.
+
+Запуск из директории с manage.py, например:
+
+    python -m benchmarks.import_feed --sizes 10000 100000 1000000 --output import.json
+"""
+import os
+
+import django
+
+
+def setup_django():
+    """
+    Инициализация Django для запуска бенчмарка как отдельного скрипта
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shopsmart.settings')
+    django.setup()
@@ -0,0 +1,130 @@
+"""
+Бенчмарк сжатия ответов API: сколько байтов экономит каждая кодировка и уровень
+сжатия и сколько процессорного времени это стоит (shop.compression).
+
+Ответы строятся представлениями API на синтетическом каталоге и заказах
+(см. testdata) и сжимаются той же функцией, что и в
+CompressionMiddleware. brotli и zstd измеряются, если установлены пакеты
+brotli и zstandard. Для каждого ответа и уровня выводятся размер, доля
+сэкономленных байтов и лучшее время сжатия из нескольких повторов:
+
+- catalog - страница каталога из 100 строк (ProductInfoView);
+- orders - заказы со строками (OrderView.get);
+- orders_expanded - заказы с ?expand=order_info.product_info;
+- export - полная выгрузка каталога в NDJSON (ProductExportView).
+
+    python -m benchmarks.compression --rows 1000 --output compression.json
+"""
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+
+from ujson import dumps
+
+from testdata import seed
+from . import setup_django
+from .import_feed import benchmark_database, git_commit
+
+DEFAULT_ROWS = 1000
+DEFAULT_REPEAT = 5
+LEVELS = {'gzip': (1, 4, 6, 9), 'br': (1, 4, 5, 6, 9, 11), 'zstd': (1, 3, 6, 9, 19)}
+
+
+def responses(buyer):
+    """
+    Тела ответов эндпоинтов без сжатия: название -> байты
+    """
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from shop.views import OrderView, ProductExportView, ProductInfoView
+
+    factory = APIRequestFactory()
+
+    def get(view, path, params=None, **kwargs):
+        request = factory.get(path, params)
+        force_authenticate(request, buyer)
+        response = view.as_view()(request, **kwargs)
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        if hasattr(response, 'render'):
+            response.render()
+        assert response.status_code == 200 and b'"Errors"' not in response.content, response.content
+        return response.content
+
+    return {
+        'catalog': get(ProductInfoView, '/api/v1/product/info', {'page_size': 100}),
+        'orders': get(OrderView, '/api/v1/order/'),
+        'orders_expanded': get(OrderView, '/api/v1/order/', {'expand': 'order_info.product_info'}),
+        'export': get(ProductExportView, '/api/v1/product/export.ndjson', export_format='ndjson'),
+    }
+
+
+def timed(function, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        started = perf_counter()
+        result = function()
+        seconds = perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def measure(rows=DEFAULT_ROWS, repeat=DEFAULT_REPEAT):
+    setup_django()
+    from django.test.utils import override_settings
+    from shop import compression
+
+    results = []
+    # Кэш ответов и ограничение частоты запросов - в памяти процесса, без Redis
+    with tempfile.TemporaryDirectory() as directory, benchmark_database(directory) as connection, \
+            override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                              CATALOG_CACHE_TIMEOUT=0, ALLOWED_HOSTS=['testserver']):
+        bodies = responses(seed(rows))
+        for name, body in bodies.items():
+            for encoding in compression.available_encodings():
+                for compression_level in LEVELS[encoding]:
+                    seconds, compressed = timed(lambda: compression.compress(encoding, body, compression_level),
+                                                repeat)
+                    results.append({
+                        'response': name,
+                        'encoding': encoding,
+                        'level': compression_level,
+                        'default': compression_level == compression.level(encoding),
+                        'bytes': len(body),
+                        'compressed_bytes': len(compressed),
+                        'saved_percent': round(100 * (1 - len(compressed) / len(body)), 1),
+                        'compress_ms': round(seconds * 1000, 3),
+                        'mb_per_second': round(len(body) / seconds / 1024 / 1024, 1),
+                    })
+
+    from django import get_version
+    return {
+        'benchmark': 'compression',
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': get_version(),
+        'database': connection.vendor,
+        'rows': rows,
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарк сжатия ответов API')
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help='Количество строк каталога')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Количество повторов')
+    parser.add_argument('--output', help='Файл для результатов в JSON (по умолчанию stdout)')
+    args = parser.parse_args(argv)
+
+    report = dumps(measure(args.rows, args.repeat), indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(report + '\n', encoding='utf-8')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
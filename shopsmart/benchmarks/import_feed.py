@@ -0,0 +1,211 @@
+"""
+Бенчмарк импорта прайс-листов от загрузки по HTTP до публикации каталога.
+
+Каждый размер прайс-листа измеряется в отдельном процессе с отдельной тестовой
+базой данных, чтобы пиковый RSS одного прогона не влиял на другие.
+Для каждого размера выполняются сценарии:
+
+- initial - первая загрузка прайс-листа в пустой каталог;
+- update - повторная загрузка, в которой у части товаров изменилась цена;
+- unchanged - повторная загрузка того же файла (пропускается по хэшу содержимого).
+
+Результаты выводятся в JSON, который можно сравнивать между коммитами:
+
+    python -m benchmarks.import_feed --sizes 10000 100000 1000000 --output import.json
+"""
+import argparse
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread
+from time import perf_counter
+
+from ujson import dumps, loads
+
+from testdata import write_feed
+from . import setup_django
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+SCENARIOS = ('initial', 'update', 'unchanged')
+CHANGED_SHARE = 0.1  # Доля товаров с измененной ценой в сценарии update
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve_directory(directory):
+    """
+    Локальный HTTP сервер, отдающий прайс-листы из directory
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=directory))
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class QueryCounter:
+    """
+    Подсчет запросов к базе без сохранения их текста
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def peak_rss_mb():
+    """
+    Пиковый RSS процесса в мегабайтах (ru_maxrss в Linux в килобайтах, в macOS в байтах)
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+@contextmanager
+def benchmark_database(directory):
+    """
+    Отдельная база данных для прогона, чтобы не изменять рабочую
+    """
+    from django.db import connection
+
+    if connection.vendor == 'sqlite':
+        # База в памяти увеличила бы измеряемый RSS
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = str(Path(directory) / 'benchmark.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def run_scenario(connection, user, url, scenario, size):
+    from shop.importer import run_import_job
+    from shop.models import ImportJob
+
+    job = ImportJob.objects.create(user=user, url=url)
+    counter = QueryCounter()
+    started = perf_counter()
+    with connection.execute_wrapper(counter):
+        job = run_import_job(job.id)
+    seconds = perf_counter() - started
+    return {
+        'size': size,
+        'scenario': scenario,
+        'status': job.status,
+        'skipped': job.skipped,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(size / seconds, 1),
+        'peak_rss_mb': peak_rss_mb(),
+        'queries': counter.count,
+        'rows_created': job.rows_created,
+        'rows_updated': job.rows_updated,
+        'rows_deleted': job.rows_deleted,
+        'rows_unchanged': job.rows_unchanged,
+        'errors': len(job.errors),
+    }
+
+
+def measure(size, format='yaml'):
+    """
+    Прогон всех сценариев для прайс-листа из size товаров в текущем процессе
+    """
+    setup_django()
+    from shop.models import User
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory, benchmark_database(directory) as connection:
+        user = User.objects.create_user(email='benchmark@example.com', password='benchmark', type='shop')
+        name = f'price.{format}'
+        with serve_directory(directory) as base_url:
+            url = f'{base_url}/{name}'
+            path = Path(directory) / name
+            for scenario in SCENARIOS:
+                if scenario == 'update':
+                    # Last-Modified передается с точностью до секунды: сдвигаем время изменения файла,
+                    # чтобы обновленный прайс-лист не получил ответ 304
+                    modified = path.stat().st_mtime + 1
+                    write_feed(path, size, format, changed=CHANGED_SHARE)
+                    os.utime(path, (modified, modified))
+                elif scenario == 'initial':
+                    write_feed(path, size, format)
+                results.append(run_scenario(connection, user, url, scenario, size))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, format='yaml'):
+    """
+    Прогон бенчмарка для каждого размера в отдельном процессе
+    """
+    results = []
+    for size in sizes:
+        child = subprocess.run([sys.executable, '-m', 'benchmarks.import_feed', '--child', '--format', format,
+                                '--sizes', str(size)], capture_output=True, text=True)
+        if child.returncode:
+            results.append({'size': size, 'status': 'crashed', 'stderr': child.stderr[-2000:]})
+            continue
+        results.extend(loads(child.stdout.strip().splitlines()[-1]))
+
+    from django import get_version
+    from django.db import connection
+    return {
+        'benchmark': 'import_feed',
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': get_version(),
+        'database': connection.vendor,
+        'format': format,
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарк импорта прайс-листов')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Количество товаров')
+    parser.add_argument('--format', choices=('yaml', 'jsonl'), default='yaml', help='Формат прайс-листа')
+    parser.add_argument('--output', help='Файл для результатов в JSON (по умолчанию stdout)')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(dumps(measure(args.sizes[0], args.format)))
+        return
+
+    setup_django()
+    report = dumps(run(args.sizes, args.format), indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(report + '\n', encoding='utf-8')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
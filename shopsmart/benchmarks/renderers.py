@@ -0,0 +1,131 @@
+"""
+Бенчмарк JSON для API: стандартные JSONRenderer, JSONParser и JsonResponse
+против их вариантов на ujson (shop.renderers).
+
+Данные - ответы каталога и заказов на синтетическом каталоге (см. testdata).
+Для каждого сценария выводится лучшее время из нескольких повторов, размер в байтах,
+ускорение и совпадение вывода:
+
+- catalog - строки каталога (ProductInfoView, ProductInfoBulkView);
+- orders - заказы со строками (OrderView.get и корзина);
+- orders_expanded - заказы с ?expand=order_info.product_info.
+
+    python -m benchmarks.renderers --rows 1000 --output renderers.json
+"""
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+from time import perf_counter
+
+from ujson import dumps, loads
+
+from testdata import seed
+from . import setup_django
+from .import_feed import benchmark_database, git_commit
+
+DEFAULT_ROWS = 1000
+DEFAULT_REPEAT = 5
+
+
+def payloads(buyer):
+    """
+    Данные ответов: название -> данные до рендеринга
+    """
+    from shop import fast_serializers
+    from shop.fields import FieldSelection
+    from shop.models import CatalogEntry, Order
+
+    def orders(selection):
+        return fast_serializers.orders(fast_serializers.order_rows(Order.objects.filter(user=buyer), selection),
+                                       selection)
+
+    return {
+        'catalog': {'next': None, 'previous': None,
+                    'results': list(CatalogEntry.objects.order_by('pk').values_list('data', flat=True))},
+        'orders': {'Status': True, 'Orders': orders(FieldSelection())},
+        'orders_expanded': {'Status': True, 'Orders': orders(FieldSelection(expand={'order_info.product_info'}))},
+    }
+
+
+def pairs(data):
+    """
+    Пары (стандартный вариант, вариант на ujson) для рендеринга, ответа и разбора data
+    """
+    from django.http import JsonResponse as DjangoJsonResponse
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from shop.renderers import JsonResponse, UJSONParser, UJSONRenderer
+
+    body = JSONRenderer().render(data)
+    return {
+        'render': (lambda: JSONRenderer().render(data), lambda: UJSONRenderer().render(data)),
+        'json_response': (lambda: DjangoJsonResponse(data).content, lambda: JsonResponse(data).content),
+        'parse': (lambda: JSONParser().parse(BytesIO(body)), lambda: UJSONParser().parse(BytesIO(body))),
+    }
+
+
+def timed(function, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        started = perf_counter()
+        result = function()
+        seconds = perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def measure(rows=DEFAULT_ROWS, repeat=DEFAULT_REPEAT):
+    setup_django()
+    results = []
+    with tempfile.TemporaryDirectory() as directory, benchmark_database(directory) as connection:
+        for name, data in payloads(seed(rows)).items():
+            for operation, (standard, fast) in pairs(data).items():
+                standard_seconds, standard_result = timed(standard, repeat)
+                fast_seconds, fast_result = timed(fast, repeat)
+                if operation == 'json_response':
+                    # JsonResponse Django экранирует не-ASCII символы, поэтому сравниваются данные
+                    identical = loads(standard_result) == loads(fast_result)
+                else:
+                    identical = standard_result == fast_result
+                results.append({
+                    'scenario': name,
+                    'operation': operation,
+                    'bytes': len(fast_result) if operation != 'parse' else None,
+                    'standard_ms': round(standard_seconds * 1000, 2),
+                    'ujson_ms': round(fast_seconds * 1000, 2),
+                    'speedup': round(standard_seconds / fast_seconds, 1),
+                    'identical': identical,
+                })
+
+    from django import get_version
+    return {
+        'benchmark': 'renderers',
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': get_version(),
+        'database': connection.vendor,
+        'rows': rows,
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарк JSON-рендерера и парсера API')
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help='Количество строк')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Количество повторов')
+    parser.add_argument('--output', help='Файл для результатов в JSON (по умолчанию stdout)')
+    args = parser.parse_args(argv)
+
+    report = dumps(measure(args.rows, args.repeat), indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(report + '\n', encoding='utf-8')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
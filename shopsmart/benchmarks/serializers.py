@@ -0,0 +1,139 @@
+"""
+Микробенчмарк сериализации для чтения: сериализаторы DRF и быстрые сериализаторы
+из строк .values() (shop.fast_serializers).
+
+Каталог и заказы создаются testdata.seed. Для каждого сценария выводится
+лучшее время из нескольких повторов в пересчете на 1000 строк, ускорение и
+количество запросов; выводы обоих способов сравниваются и должны совпадать:
+
+- catalog - строки каталога (ProductInfoView);
+- orders - заказы со строками (OrderView.get и корзина);
+- orders_expanded - заказы с ?expand=order_info.product_info.
+
+    python -m benchmarks.serializers --rows 1000 --output serializers.json
+"""
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+
+from ujson import dumps, loads
+
+from testdata import seed
+from . import setup_django
+from .import_feed import QueryCounter, benchmark_database, git_commit
+
+DEFAULT_ROWS = 1000
+DEFAULT_REPEAT = 5
+
+
+def scenarios(buyer):
+    """
+    Пары (сериализаторы DRF, быстрые сериализаторы) для каждого сценария
+    """
+    from django.db.models import F, Sum
+    from shop import fast_serializers
+    from shop.fields import FieldSelection
+    from shop.models import Order, ProductInfo
+    from shop.serializers import OrderInfoSerializer, OrderSerializer, ProductInfoSerializer
+
+    class ExpandedOrderInfoSerializer(OrderInfoSerializer):
+        product_info = ProductInfoSerializer(read_only=True)
+
+    class ExpandedOrderSerializer(OrderSerializer):
+        order_info = ExpandedOrderInfoSerializer(many=True, read_only=True)
+
+    def catalog_drf():
+        infos = ProductInfo.objects.live().order_by('id').select_related('product').prefetch_related(
+            'product_parameters')
+        return ProductInfoSerializer(infos, many=True).data
+
+    def catalog_fast():
+        ids = list(ProductInfo.objects.live().order_by('id').values_list('id', flat=True))
+        data = fast_serializers.product_infos(ids)
+        return [data[pk] for pk in ids]
+
+    def orders_drf(serializer, *prefetch):
+        orders = Order.objects.filter(user=buyer).select_related('user_info').prefetch_related(
+            'order_info', *prefetch).annotate(
+            total_sum=Sum(F('order_info__product_info__price') * F('order_info__quantity'))).distinct()
+        return serializer(orders, many=True).data
+
+    def orders_fast(selection):
+        return fast_serializers.orders(fast_serializers.order_rows(Order.objects.filter(user=buyer), selection),
+                                       selection)
+
+    expanded = FieldSelection(expand={'order_info.product_info'})
+    return {
+        'catalog': (catalog_drf, catalog_fast),
+        'orders': (lambda: orders_drf(OrderSerializer), lambda: orders_fast(FieldSelection())),
+        'orders_expanded': (lambda: orders_drf(ExpandedOrderSerializer, 'order_info__product_info__product',
+                                               'order_info__product_info__product_parameters'),
+                            lambda: orders_fast(expanded)),
+    }
+
+
+def timed(connection, function, repeat):
+    """
+    Лучшее время из repeat прогонов, количество запросов и результат последнего прогона
+    """
+    best, result, counter = None, None, QueryCounter()
+    for _ in range(repeat):
+        counter.count = 0
+        started = perf_counter()
+        with connection.execute_wrapper(counter):
+            result = function()
+        seconds = perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best, counter.count, loads(dumps(result))
+
+
+def measure(rows=DEFAULT_ROWS, repeat=DEFAULT_REPEAT):
+    setup_django()
+    results = []
+    with tempfile.TemporaryDirectory() as directory, benchmark_database(directory) as connection:
+        buyer = seed(rows)
+        for name, (drf, fast) in scenarios(buyer).items():
+            drf_seconds, drf_queries, drf_result = timed(connection, drf, repeat)
+            fast_seconds, fast_queries, fast_result = timed(connection, fast, repeat)
+            results.append({
+                'scenario': name,
+                'rows': rows,
+                'drf_ms_per_1000_rows': round(drf_seconds * 1000 * 1000 / rows, 2),
+                'fast_ms_per_1000_rows': round(fast_seconds * 1000 * 1000 / rows, 2),
+                'speedup': round(drf_seconds / fast_seconds, 1),
+                'drf_queries': drf_queries,
+                'fast_queries': fast_queries,
+                'identical': drf_result == fast_result,
+            })
+
+    from django import get_version
+    return {
+        'benchmark': 'serializers',
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': get_version(),
+        'database': connection.vendor,
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарк сериализации для чтения')
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help='Количество строк')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Количество повторов')
+    parser.add_argument('--output', help='Файл для результатов в JSON (по умолчанию stdout)')
+    args = parser.parse_args(argv)
+
+    report = dumps(measure(args.rows, args.repeat), indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(report + '\n', encoding='utf-8')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,42 @@
 from django.contrib import admin
+from django.db import transaction
 from .models import User, UserInfo, Shop, Category, OrderInfo, Order, ProductInfo, ProductParameter, Parameter, \
-    EmailToken, Product
+    EmailToken, Product, ImportJob, ShopFeed, ParameterFacet, CatalogEntry, BestOffer
+from . import readmodel
+
+
+class CatalogSourceAdmin(admin.ModelAdmin):
+    """
+    Админка данных, из которых собираются строки каталога (см. readmodel).
+    Строки каталога затронутых товаров пересобираются после фиксации транзакции,
+    когда реестр названий уже обновлен сигналами.
+    """
+    product_path = None  # Путь от модели к id товара
+
+    def catalog_products(self, queryset):
+        """
+        id товаров, строки каталога которых зависят от записей queryset
+        """
+        return set(queryset.order_by().values_list(self.product_path, flat=True).distinct())
+
+    def refresh_catalog(self, product_ids):
+        transaction.on_commit(lambda: readmodel.refresh_products(product_ids, reindex=True))
+
+    def save_model(self, request, obj, form, change):
+        # Запись могла перейти к другому товару, поэтому пересобираются и прежние товары
+        product_ids = self.catalog_products(self.model.objects.filter(pk=obj.pk)) if change else set()
+        super().save_model(request, obj, form, change)
+        self.refresh_catalog(product_ids | self.catalog_products(self.model.objects.filter(pk=obj.pk)))
+
+    def delete_model(self, request, obj):
+        product_ids = self.catalog_products(self.model.objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+        self.refresh_catalog(product_ids)
+
+    def delete_queryset(self, request, queryset):
+        product_ids = self.catalog_products(queryset)
+        super().delete_queryset(request, queryset)
+        self.refresh_catalog(product_ids)
 
 
 # @admin.register(UserInfo)
@@ -15,13 +51,22 @@ class UserAdmin(admin.ModelAdmin):
 
 
 @admin.register(Shop)
-class ShopAdmin(admin.ModelAdmin):
-    pass
+class ShopAdmin(CatalogSourceAdmin):
+    product_path = 'product_info__product_id'
+
+    def save_model(self, request, obj, form, change):
+        # В строки каталога из магазина попадает только статус, его переносит сигнал post_save (см. signals)
+        super(CatalogSourceAdmin, self).save_model(request, obj, form, change)
+
+
+@admin.register(ShopFeed)
+class ShopFeedAdmin(admin.ModelAdmin):
+    list_display = ('shop', 'url', 'checked_at', 'updated_at')
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
-    pass
+class CategoryAdmin(CatalogSourceAdmin):
+    product_path = 'products__id'
 
 
 @admin.register(OrderInfo)
@@ -37,19 +82,37 @@ class OrderAdmin(admin.ModelAdmin):
 
 
 @admin.register(ProductInfo)
-class ProductInfoAdmin(admin.ModelAdmin):
-    pass
+class ProductInfoAdmin(CatalogSourceAdmin):
+    product_path = 'product_id'
 
 
 
 @admin.register(ProductParameter)
-class ProductParameterAdmin(admin.ModelAdmin):
-    pass
+class ProductParameterAdmin(CatalogSourceAdmin):
+    product_path = 'product_info__product_id'
 
 
 @admin.register(Parameter)
-class ParameterAdmin(admin.ModelAdmin):
-    pass
+class ParameterAdmin(CatalogSourceAdmin):
+    product_path = 'product_parameters__product_info__product_id'
+
+
+@admin.register(ParameterFacet)
+class ParameterFacetAdmin(admin.ModelAdmin):
+    list_display = ('shop', 'category', 'parameter', 'value', 'count')
+    list_filter = ('shop',)
+
+
+@admin.register(CatalogEntry)
+class CatalogEntryAdmin(admin.ModelAdmin):
+    list_display = ('product_info', 'shop', 'category', 'shop_status')
+    list_filter = ('shop_status', 'shop')
+
+
+@admin.register(BestOffer)
+class BestOfferAdmin(admin.ModelAdmin):
+    list_display = ('product', 'shop', 'min_price', 'max_price', 'offer_count')
+    list_filter = ('category',)
 
 
 
@@ -59,5 +122,11 @@ class EmailTokenAdmin(admin.ModelAdmin):
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    pass
+class ProductAdmin(CatalogSourceAdmin):
+    product_path = 'id'
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'url', 'status', 'rows_processed', 'created_at', 'finished_at')
+    list_filter = ('status',)
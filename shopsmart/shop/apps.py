@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shop'
+
+    def ready(self):
+        # Подключаем обработчики сигналов не только в процессе веб-сервера, но и в воркерах Celery
+        from . import signals  # noqa: F401
@@ -0,0 +1,111 @@
+"""
+Поколения каталога магазинов.
+
+Каждая строка ProductInfo появляется в поколении generation и скрывается,
+начиная с поколения retired_generation. Каталог магазина - это строки,
+видимые в поколении Shop.catalog_generation. Импорт пишет новые строки следующего
+поколения, которые покупатели не видят, а новые значения изменившихся строк -
+в ProductInfoUpdate. В конце транзакция переключения меняет указатель поколения
+магазина и переносит эти значения в строки, так что id строк при изменении цены,
+количества или параметров не меняется. В ней нет ничего, кроме указателя и переноса
+изменений, поэтому ее длительность зависит только от числа изменившихся строк.
+Скрытые строки прошлых поколений удаляются пакетами.
+Производные данные каталога - фасеты (см. facets), поисковый индекс (см. search)
+и модель чтения (см. readmodel) - обновляются после переключения пакетами, каждый
+в своей транзакции; до конца обновления они отстают от каталога. Если публикация
+прервется после переключения, их восстанавливают команды rebuild_facets,
+rebuild_search_index и rebuild_catalog.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from .facets import apply_delta, facet_delta
+from .models import Shop, ProductInfo, ProductInfoUpdate, ProductParameter
+from .search import get_backend
+from . import readmodel
+
+GC_BATCH_SIZE = 1000  # Количество строк, удаляемых за один запрос при сборке мусора
+UPDATE_BATCH_SIZE = 1000  # Количество изменений строк, переносимых за раз при публикации
+INFO_FIELDS = ('model', 'price', 'price_rrc', 'quantity')  # Поля строки, которые меняет импорт
+
+
+def discard_pending(shop):
+    """
+    Удаление следов незавершенного импорта: строк будущих поколений, изменений строк и отметок о скрытии
+    """
+    live = shop.catalog_generation
+    pending = ProductInfo.objects.filter(shop_id=shop.id, generation__gt=live)
+    product_ids = set(pending.order_by().values_list('product_id', flat=True).distinct())
+    pending.delete()
+    ProductInfoUpdate.objects.filter(shop_id=shop.id).delete()
+    ProductInfo.objects.filter(shop_id=shop.id, retired_generation__gt=live).update(retired_generation=None)
+    # Строки будущих поколений входят в список строк товара в ответе каталога
+    readmodel.refresh_products(product_ids)
+
+
+def publish(shop, generation):
+    """
+    Переключение каталога магазина на поколение generation и обновление производных данных
+    """
+    updates = ProductInfoUpdate.objects.filter(shop_id=shop.id, generation=generation)
+    # Фасеты вычитают прежние параметры изменившихся строк, поэтому приращения считаются до переноса изменений
+    delta = facet_delta(shop.id, generation)
+    product_ids = set(ProductInfo.objects.filter(
+        Q(generation=generation) | Q(retired_generation=generation) | Q(pending_update__generation=generation),
+        shop_id=shop.id).order_by().values_list('product_id', flat=True).distinct())
+    with transaction.atomic():
+        Shop.objects.filter(id=shop.id).update(catalog_generation=generation)
+        apply_updates(updates)
+    shop.catalog_generation = generation
+
+    apply_delta(shop.id, delta)
+    search_backend = get_backend()
+    if search_backend is not None:
+        # Изменившиеся строки находятся по ProductInfoUpdate, поэтому изменения удаляются последними
+        search_backend.update(shop.id, generation)
+    readmodel.refresh_products(product_ids)
+    updates.delete()
+
+
+def apply_updates(updates, batch_size=UPDATE_BATCH_SIZE):
+    """
+    Перенос новых значений из ProductInfoUpdate в строки ProductInfo и их параметры
+    """
+    last = None
+    while True:
+        batch = updates.order_by('pk')
+        if last is not None:
+            batch = batch.filter(pk__gt=last)
+        batch = list(batch[:batch_size])
+        if not batch:
+            break
+        last = batch[-1].pk
+        ProductInfo.objects.bulk_update([
+            ProductInfo(id=update.product_info_id, **{field: getattr(update, field) for field in INFO_FIELDS})
+            for update in batch], INFO_FIELDS)
+        ProductParameter.objects.filter(product_info_id__in=[update.product_info_id for update in batch]).delete()
+        ProductParameter.objects.bulk_create([
+            ProductParameter(product_info_id=update.product_info_id, parameter_id=parameter_id, value=value)
+            for update in batch
+            for parameter_id, value in update.parameters])
+
+
+def collect_garbage(shop_id, batch_size=GC_BATCH_SIZE):
+    """
+    Удаление строк, скрытых в уже опубликованных поколениях.
+    Строки, на которые ссылаются заказы, сохраняются для истории заказов.
+    """
+    live = Shop.objects.values_list('catalog_generation', flat=True).get(id=shop_id)
+    garbage = ProductInfo.objects.filter(shop_id=shop_id, retired_generation__lte=live,
+                                         order_info__isnull=True).values_list('id', 'product_id')
+    deleted, product_ids = 0, set()
+    while True:
+        rows = list(garbage[:batch_size])
+        if not rows:
+            break
+        ProductInfo.objects.filter(id__in=[row_id for row_id, _ in rows]).delete()
+        product_ids.update(product_id for _, product_id in rows)
+        deleted += len(rows)
+    # Удаленные строки пропадают из списка строк товара в ответе каталога
+    readmodel.refresh_products(product_ids)
+    return deleted
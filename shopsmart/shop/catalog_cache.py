@@ -0,0 +1,181 @@
+"""
+Кэш ответов каталога (ProductInfoView).
+
+Ключ ответа - нормализованные параметры запроса (фильтры, курсор или номер страницы)
+и версия области каталога, которую читает запрос: магазин и категория, только магазин,
+только категория или весь каталог. Версии хранятся в кэше и меняются после фиксации
+транзакции, в которой пересобраны строки каталога (см. readmodel): для каждой
+затронутой пары (магазин, категория) меняются версии пары, магазина, категории
+и всего каталога. Импорт одного магазина не сбрасывает ответы, отфильтрованные
+по другим магазинам или по незатронутым категориям.
+
+Количество попаданий и промахов считается в кэше, см. stats().
+
+Те же версии служат для ETag ответов каталога (декоратор conditional), а версии списков категорий и магазинов
+меняются при их изменении (см. signals). Магазин, раскрытый в ответе по ?expand=shop,
+читается не из строк каталога, поэтому в ключ и ETag такого ответа входит и версия
+списка магазинов. ETag вычисляется без запроса к базе, поэтому
+на запрос с совпавшим If-None-Match ответ 304 отдается без запроса и сериализации.
+"""
+import hashlib
+from functools import wraps
+from time import time_ns
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.views.decorators.http import condition
+
+from .fields import FieldSelection
+
+PREFIX = 'catalog'
+HITS_KEY = f'{PREFIX}:hits'
+MISSES_KEY = f'{PREFIX}:misses'
+CATEGORIES_KEY = f'{PREFIX}:version:categories'  # Версия списка категорий
+SHOPS_KEY = f'{PREFIX}:version:shops'  # Версия списка магазинов
+EXPANDED_KEYS = {'shop': SHOPS_KEY}  # Версии данных связей, раскрываемых по ?expand=
+
+
+def scope_key(shop_id=None, category_id=None):
+    """
+    Ключ версии области каталога
+    """
+    if shop_id and category_id:
+        return f'{PREFIX}:version:shop:{shop_id}:category:{category_id}'
+    if shop_id:
+        return f'{PREFIX}:version:shop:{shop_id}'
+    if category_id:
+        return f'{PREFIX}:version:category:{category_id}'
+    return f'{PREFIX}:version:all'
+
+
+def _normalize_id(value):
+    value = (value or '').strip()
+    return str(int(value)) if value.isdigit() else value
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # Версия вытеснена из кэша или еще не создана: новая версия не совпадет ни с одним ответом
+        cache.add(key, time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _expanded_versions(request):
+    """
+    Версии данных связей, раскрытых в ответе на запрос
+    """
+    selection = FieldSelection.from_request(request)
+    return tuple(_version(key) for relation, key in EXPANDED_KEYS.items() if selection.expands(relation))
+
+
+def _digest(request, params, *parts):
+    """
+    Хэш нормализованных параметров запроса params и дополнительных частей ключа
+    """
+    params = sorted((name, sorted(values)) for name, values in params.lists() if any(values))
+    # Ссылки на соседние страницы абсолютные, поэтому хост входит в ключ
+    return hashlib.sha1(repr((request.get_host(), parts, params)).encode()).hexdigest()
+
+
+def page_key(request):
+    """
+    Ключ ответа для запроса к каталогу, вычисляется один раз на запрос
+    """
+    key = getattr(request, '_catalog_page_key', None)
+    if key is None:
+        params = request.query_params.copy()
+        # Фильтры по магазину и категории определяют область каталога и входят в ключ отдельно
+        shop_id = _normalize_id(params.pop('shop_id', [''])[-1])
+        category_id = _normalize_id(params.pop('category_id', [''])[-1])
+        digest = _digest(request, params, shop_id, category_id)
+        versions = (_version(scope_key(shop_id, category_id)),) + _expanded_versions(request)
+        key = f'{PREFIX}:page:{digest}:{":".join(map(str, versions))}'
+        request._catalog_page_key = key
+    return key
+
+
+def page_etag(request, *args, **kwargs):
+    """
+    ETag ответа каталога: ключ ответа и формат вывода
+    """
+    return hashlib.sha1(f'{page_key(request)}:{request.accepted_renderer.format}'.encode()).hexdigest()
+
+
+def list_etag(version_key):
+    """
+    Функция ETag для списка, версия которого хранится по ключу version_key
+    """
+    def etag(request, *args, **kwargs):
+        return _digest(request, request.query_params, _version(version_key), *_expanded_versions(request),
+                       request.accepted_renderer.format)
+    return etag
+
+
+def conditional(etag_func):
+    """
+    Декоратор condition с функцией etag_func, но ETag получают только успешные ответы:
+    ответ с ошибкой клиент не должен сохранять и перепроверять по ETag
+    """
+    def decorator(func):
+        conditional_func = condition(etag_func=etag_func)(func)
+
+        @wraps(func)
+        def inner(request, *args, **kwargs):
+            response = conditional_func(request, *args, **kwargs)
+            if response.status_code >= 400:
+                del response['ETag']
+            return response
+        return inner
+    return decorator
+
+
+def bump(keys):
+    """
+    Смена версий keys после фиксации текущей транзакции
+    """
+    transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time_ns()), None))
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_page(key):
+    """
+    Сохраненный ответ или None; учитывается попадание или промах
+    """
+    data = cache.get(key)
+    _count(MISSES_KEY if data is None else HITS_KEY)
+    return data
+
+
+def set_page(key, data):
+    cache.set(key, data, settings.CATALOG_CACHE_TIMEOUT)
+
+
+def invalidate(pairs):
+    """
+    Смена версий областей каталога, затронутых изменением строк пар (магазин, категория)
+    после фиксации текущей транзакции
+    """
+    keys = {scope_key()}
+    for shop_id, category_id in pairs:
+        keys.update((scope_key(shop_id), scope_key(category_id=category_id), scope_key(shop_id, category_id)))
+    if pairs:
+        bump(keys)
+
+
+def stats():
+    """
+    Количество попаданий и промахов кэша ответов каталога
+    """
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counters.get(HITS_KEY, 0), counters.get(MISSES_KEY, 0)
+    return {'hits': hits, 'misses': misses, 'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None}
@@ -0,0 +1,164 @@
+"""
+Сжатие ответов по Accept-Encoding: zstd, brotli или gzip.
+
+Кодировка выбирается по весам q из Accept-Encoding, при равных весах - в порядке
+ENCODINGS (лучшее сжатие JSON при той же скорости идет первым). brotli и zstd
+используются, если установлены пакеты brotli и zstandard (есть в requirements.txt;
+без них ответы сжимаются только gzip), gzip доступен всегда.
+Сжимаются только ответы API (JSON, NDJSON, CSV) не короче COMPRESSION_MIN_SIZE байт:
+короткий ответ помещается в один пакет и без сжатия. HTML (админка, браузерный
+интерфейс API) не сжимается: в нем есть токен CSRF, и сжатие вместе с отражением
+данных запроса открыло бы атаку BREACH.
+Уровни сжатия задаются настройкой COMPRESSION_LEVELS; значения по умолчанию -
+распространенный компромисс скорости и степени сжатия, сравнить уровни на ответах
+каталога и заказов можно бенчмарком benchmarks.compression.
+
+Потоковые ответы (выгрузка каталога, см. export) сжимаются по мере отдачи,
+порции без выходных данных компрессора не отправляются.
+"""
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ENCODINGS = ('zstd', 'br', 'gzip')  # Порядок предпочтения при равных весах
+DEFAULT_LEVELS = {'zstd': 3, 'br': 5, 'gzip': 6}
+DEFAULT_MIN_SIZE = 1024
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/csv')
+ACCEPT_ENCODING = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*')
+
+
+class _Gzip:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+COMPRESSORS = {'gzip': _Gzip}
+if brotli is not None:
+    COMPRESSORS['br'] = _Brotli
+if zstandard is not None:
+    COMPRESSORS['zstd'] = _Zstd
+
+
+def available_encodings():
+    return [encoding for encoding in ENCODINGS if encoding in COMPRESSORS]
+
+
+def level(encoding):
+    return getattr(settings, 'COMPRESSION_LEVELS', {}).get(encoding, DEFAULT_LEVELS[encoding])
+
+
+def negotiate(accept_encoding):
+    """
+    Кодировка для заголовка Accept-Encoding или None, если сжимать не нужно
+    """
+    weights = {}
+    for item in accept_encoding.split(','):
+        match = ACCEPT_ENCODING.fullmatch(item)
+        if match:
+            try:
+                weights[match[1].lower()] = float(match[2]) if match[2] else 1.0
+            except ValueError:
+                continue
+    candidates = [(weights.get(encoding, weights.get('*', 0)), -index, encoding)
+                  for index, encoding in enumerate(available_encodings())]
+    weight, _, encoding = max(candidates)
+    return encoding if weight > 0 else None
+
+
+def compress(encoding, data, compression_level=None):
+    """
+    Сжатие байтов data в кодировку encoding
+    """
+    compressor = COMPRESSORS[encoding](level(encoding) if compression_level is None else compression_level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(encoding, chunks):
+    """
+    Сжатие потока байтов по мере чтения
+    """
+    compressor = COMPRESSORS[encoding](level(encoding))
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Сжатие ответов по Accept-Encoding (zstd, brotli, gzip)
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or getattr(response, 'is_async', False):
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE',
+                                                                      DEFAULT_MIN_SIZE):
+            return response
+
+        # Ответ зависит от Accept-Encoding, даже если этот клиент сжатие не принимает
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(encoding, response.streaming_content)
+            del response['Content-Length']
+        else:
+            compressed = compress(encoding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # Сжатый ответ не совпадает побайтно с несжатым, поэтому ETag становится слабым
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        response['Content-Encoding'] = encoding
+        return response
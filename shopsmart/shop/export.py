@@ -0,0 +1,85 @@
+"""
+Потоковая выгрузка каталога активных магазинов (NDJSON или CSV).
+
+Строки читаются из модели чтения (CatalogEntry) курсором по первичному ключу
+порциями по EXPORT_CHUNK_SIZE (.iterator(), в PostgreSQL - серверный курсор)
+и сразу превращаются в текст, так что память не зависит от размера каталога.
+Выгрузку отдает ProductExportView (StreamingHttpResponse, сжатие по Accept-Encoding -
+см. compression) и пишет в файл команда export_catalog; при сжатии gzip поток
+сжимается по мере записи (compression.compress_stream).
+"""
+import csv
+
+from ujson import dumps
+
+from .compression import compress_stream
+from .models import CatalogEntry
+
+EXPORT_CHUNK_SIZE = 2000  # Количество строк, читаемых из курсора за раз
+BUFFER_SIZE = 64 * 1024  # Размер текста, который кодируется и сжимается за раз
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+CSV_FIELDS = ('id', 'product_id', 'product', 'category', 'model', 'price', 'price_rrc', 'quantity', 'shop',
+              'parameters')
+
+
+def catalog_rows(category_id=None, shop_id=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Ответы строк каталога активных магазинов в порядке id
+    """
+    entries = CatalogEntry.objects.filter(shop_status=True)
+    if category_id is not None:
+        entries = entries.filter(category_id=category_id)
+    if shop_id is not None:
+        entries = entries.filter(shop_id=shop_id)
+    return entries.order_by('pk').values_list('data', flat=True).iterator(chunk_size=chunk_size)
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield dumps(row, ensure_ascii=False) + '\n'
+
+
+class _Line:
+    """
+    Файл для csv.writer, который возвращает записанную строку вместо записи
+    """
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    """
+    Строки CSV: товар и категория по названию, параметры - JSON-объект название -> значение
+    """
+    writer = csv.writer(_Line())
+    yield writer.writerow(CSV_FIELDS)
+    for row in rows:
+        product = row['product'] or {}
+        parameters = {parameter['parameter']: parameter['value'] for parameter in row['product_parameters']}
+        yield writer.writerow((row['id'], product.get('id'), product.get('name'), product.get('category'),
+                               row['model'], row['price'], row['price_rrc'], row['quantity'], row['shop'],
+                               dumps(parameters, ensure_ascii=False)))
+
+
+def byte_chunks(lines, buffer_size=BUFFER_SIZE):
+    """
+    Поток строк порциями байтов: строки собираются в буфер, чтобы компрессор не вызывался на каждую строку
+    """
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    yield ''.join(buffer).encode()
+
+
+def export(export_format, compress=False, **filters):
+    """
+    Выгрузка каталога: строки текста или, при compress, порции байтов gzip
+    """
+    rows = catalog_rows(**filters)
+    lines = csv_lines(rows) if export_format == 'csv' else ndjson_lines(rows)
+    return compress_stream('gzip', byte_chunks(lines)) if compress else lines
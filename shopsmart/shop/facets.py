@@ -0,0 +1,120 @@
+"""
+Фасеты каталога: количество товаров по значениям параметров.
+
+Счетчики хранятся в ParameterFacet по ключу (магазин, категория, параметр, значение)
+и обновляются приращениями при публикации поколения каталога (см. catalog.publish):
+параметры строк, появившихся в поколении, прибавляются к счетчикам, параметры строк,
+скрытых в нем, вычитаются; у изменившихся строк прежние параметры вычитаются,
+а записанные импортом в ProductInfoUpdate прибавляются. Стоимость обновления пропорциональна числу изменившихся
+строк, а не размеру каталога. Приращения считаются до переключения поколения (facet_delta), пока у изменившихся
+строк прежние параметры, а применяются к счетчикам после него (apply_delta).
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import Shop, ProductInfo, ProductInfoUpdate, ProductParameter, ParameterFacet
+from . import registry
+
+FACET_BATCH_SIZE = 500  # Количество ключей фасетов, читаемых одним запросом
+
+
+def count_parameters(parameters):
+    """
+    Количество строк ProductParameter по ключу (категория, параметр, значение)
+    """
+    return Counter({(category_id, parameter_id, value): count for category_id, parameter_id, value, count in
+                    parameters.order_by().values('product_info__product__category_id', 'parameter_id', 'value')
+                    .annotate(count=Count('id'))
+                    .values_list('product_info__product__category_id', 'parameter_id', 'value', 'count')})
+
+
+def facet_delta(shop_id, generation):
+    """
+    Приращения счетчиков фасетов от изменений поколения generation каталога магазина.
+    Считаются до переноса изменений в строки (catalog.apply_updates).
+    """
+    delta = count_parameters(ProductParameter.objects.filter(product_info__shop_id=shop_id,
+                                                             product_info__generation=generation))
+    delta.subtract(count_parameters(ProductParameter.objects.filter(product_info__shop_id=shop_id,
+                                                                    product_info__retired_generation=generation)))
+    updates = ProductInfoUpdate.objects.filter(shop_id=shop_id, generation=generation)
+    delta.subtract(count_parameters(ProductParameter.objects.filter(
+        product_info__in=updates.values('product_info_id'))))
+    for category_id, parameters in updates.values_list('product_info__product__category_id', 'parameters').iterator():
+        delta.update((category_id, parameter_id, value) for parameter_id, value in parameters)
+    return {key: count for key, count in delta.items() if count}
+
+
+def apply_delta(shop_id, delta):
+    """
+    Применение приращений к счетчикам фасетов магазина пакетами по FACET_BATCH_SIZE ключей
+    """
+    keys = sorted(delta)
+    for start in range(0, len(keys), FACET_BATCH_SIZE):
+        batch = keys[start:start + FACET_BATCH_SIZE]
+        facets = {(facet.category_id, facet.parameter_id, facet.value): facet for facet in
+                  ParameterFacet.objects.filter(shop_id=shop_id,
+                                                parameter_id__in={parameter_id for _, parameter_id, _ in batch},
+                                                value__in={value for _, _, value in batch})}
+        created, updated, deleted = [], [], []
+        for key in batch:
+            facet = facets.get(key)
+            if facet is None:
+                if delta[key] > 0:
+                    created.append(ParameterFacet(shop_id=shop_id, category_id=key[0], parameter_id=key[1],
+                                                  value=key[2], count=delta[key]))
+                continue
+            facet.count += delta[key]
+            if facet.count > 0:
+                updated.append(facet)
+            else:
+                deleted.append(facet.id)
+
+        with transaction.atomic(savepoint=False):
+            ParameterFacet.objects.bulk_create(created)
+            ParameterFacet.objects.bulk_update(updated, ['count'])
+            ParameterFacet.objects.filter(id__in=deleted).delete()
+
+
+def rebuild_facets(shop_id):
+    """
+    Полный пересчет фасетов магазина, например после ручной правки параметров в админке
+    """
+    generation = Shop.objects.values_list('catalog_generation', flat=True).get(id=shop_id)
+    counts = count_parameters(ProductParameter.objects.filter(
+        product_info__in=ProductInfo.objects.filter(shop_id=shop_id).visible_in(generation).values('id')))
+    with transaction.atomic():
+        ParameterFacet.objects.filter(shop_id=shop_id).delete()
+        ParameterFacet.objects.bulk_create([
+            ParameterFacet(shop_id=shop_id, category_id=category_id, parameter_id=parameter_id, value=value,
+                           count=count)
+            for (category_id, parameter_id, value), count in counts.items()
+        ], batch_size=FACET_BATCH_SIZE)
+
+
+def facet_counts(category_id=None, shop_id=None, products=None):
+    """
+    Счетчики фасетов каталога активных магазинов.
+    Без фильтров по параметрам счетчики берутся из ParameterFacet, с фильтрами
+    считаются одним GROUP BY по отобранным товарам products.
+    """
+    if products is None:
+        rows = ParameterFacet.objects.filter(shop__status=True)
+        if category_id:
+            rows = rows.filter(category_id=category_id)
+        if shop_id:
+            rows = rows.filter(shop_id=shop_id)
+        rows = rows.order_by().values('parameter_id', 'value').annotate(count=Sum('count'))
+    else:
+        rows = (ProductParameter.objects.filter(product_info__in=products.order_by().values('pk'))
+                .order_by().values('parameter_id', 'value').annotate(count=Count('id')))
+
+    facets = {}
+    for parameter_id, value, count in rows.values_list('parameter_id', 'value', 'count'):
+        facets.setdefault(parameter_id, []).append({'value': value, 'count': count})
+    names = registry.parameters.names(facets)
+    return sorted(({'parameter': names.get(parameter_id),
+                    'values': sorted(values, key=lambda item: (-item['count'], item['value']))}
+                   for parameter_id, values in facets.items()), key=lambda facet: facet['parameter'])
@@ -0,0 +1,117 @@
+"""
+Быстрая сериализация для чтения.
+
+Ответы строятся словарями прямо из строк .values(), без экземпляров моделей
+и вложенных сериализаторов DRF на каждую строку. Вывод совпадает с выводом
+ProductInfoSerializer и OrderSerializer: те же поля, порядок ключей и форматы
+значений. Выбор полей и раскрытие связей (см. fields) учитываются, связи,
+не попавшие в ответ, не запрашиваются.
+Скорость сравнивается с сериализаторами DRF бенчмарком benchmarks.serializers.
+"""
+from django.db.models import F, Sum
+from rest_framework.fields import DateTimeField
+
+from .fields import FieldSelection
+from .models import OrderInfo, Product, ProductInfo, ProductParameter, Shop, UserInfo
+from . import registry
+
+ALL_FIELDS = FieldSelection()
+ORDER_FIELDS = ('id', 'user_info_id', 'created_at', 'status')
+USER_INFO_FIELDS = ('id', 'user', 'city', 'phone', 'street', 'house_number', 'flat_number')
+SHOP_FIELDS = ('id', 'name', 'url', 'status')
+
+# Формат даты как в DateTimeField сериализаторов (ISO 8601 в текущем часовом поясе)
+datetime_field = DateTimeField()
+
+
+def _grouped(pairs):
+    groups = {}
+    for key, value in pairs:
+        groups.setdefault(key, []).append(value)
+    return groups
+
+
+def product_infos(ids, selection=ALL_FIELDS, prefix=''):
+    """
+    Ответы ProductInfoSerializer для строк ProductInfo по id: id -> словарь.
+    prefix - путь строк в ответе для выбора полей, например order_info.product_info.
+    """
+    def wanted(name):
+        return selection.includes(f'{prefix}{name}')
+
+    rows = list(ProductInfo.objects.filter(id__in=ids).order_by().values_list(
+        'id', 'product_id', 'model', 'price', 'price_rrc', 'quantity', 'shop_id'))
+
+    products = {}
+    if wanted('product'):
+        product_ids = {row[1] for row in rows}
+        product_rows = list(Product.objects.filter(id__in=product_ids).order_by().values_list(
+            'id', 'name', 'category_id'))
+        siblings = {}
+        if wanted('product.product_info'):
+            # Только строки опубликованных каталогов: скрытые строки остаются в базе для заказов.
+            # Порядок как в ProductSerializer.get_product_info: по модели и id
+            siblings = _grouped(ProductInfo.objects.live().filter(product_id__in=product_ids)
+                                .order_by('model', 'id').values_list('product_id', 'id'))
+        categories = registry.categories.names({category_id for _, _, category_id in product_rows})
+        products = {product_id: {'id': product_id, 'name': name, 'category': categories.get(category_id),
+                                 'product_info': siblings.get(product_id, [])}
+                    for product_id, name, category_id in product_rows}
+
+    parameters = {}
+    if wanted('product_parameters'):
+        parameter_rows = list(ProductParameter.objects.filter(product_info_id__in=ids).order_by('id').values_list(
+            'product_info_id', 'id', 'parameter_id', 'value'))
+        names = registry.parameters.names({parameter_id for _, _, parameter_id, _ in parameter_rows})
+        parameters = _grouped((product_info_id, {'id': pk, 'parameter': names.get(parameter_id), 'value': value})
+                              for product_info_id, pk, parameter_id, value in parameter_rows)
+
+    shops = None
+    if selection.expands(f'{prefix}shop'):
+        shops = {shop['id']: shop for shop in Shop.objects.filter(id__in={row[6] for row in rows}).order_by()
+                 .values(*SHOP_FIELDS)}
+
+    return {pk: selection.project({
+        'id': pk, 'product': products.get(product_id), 'model': model, 'price': price, 'price_rrc': price_rrc,
+        'quantity': quantity, 'shop': shop_id if shops is None else shops.get(shop_id),
+        'product_parameters': parameters.get(pk, []),
+    }, prefix) for pk, product_id, model, price, price_rrc, quantity, shop_id in rows}
+
+
+def order_rows(orders, selection=ALL_FIELDS):
+    """
+    Строки заказов для orders (.values), сумма заказа считается только если попадает в ответ
+    """
+    if selection.includes('total_sum'):
+        return orders.values(*ORDER_FIELDS).annotate(
+            total_sum=Sum(F('order_info__product_info__price') * F('order_info__quantity')))
+    return orders.values(*ORDER_FIELDS)
+
+
+def orders(rows, selection=ALL_FIELDS):
+    """
+    Ответы OrderSerializer для строк order_rows
+    """
+    rows = list(rows)
+    user_infos = {}
+    if selection.includes('user_info'):
+        user_infos = {user_info['id']: user_info for user_info in UserInfo.objects.filter(
+            id__in={row['user_info_id'] for row in rows}).order_by().values(*USER_INFO_FIELDS)}
+
+    lines = {}
+    if selection.includes('order_info'):
+        line_rows = list(OrderInfo.objects.filter(order_id__in=[row['id'] for row in rows]).order_by('id')
+                         .values_list('order_id', 'id', 'product_info_id', 'quantity'))
+        infos = None
+        if selection.expands('order_info.product_info'):
+            infos = product_infos({row[2] for row in line_rows}, selection, 'order_info.product_info.')
+        lines = _grouped((order_id, {'id': pk, 'order': order_id,
+                                     'product_info': product_info_id if infos is None else infos.get(product_info_id),
+                                     'quantity': quantity})
+                         for order_id, pk, product_info_id, quantity in line_rows)
+
+    return [selection.project({
+        'id': row['id'], 'user_info': user_infos.get(row['user_info_id']),
+        'created_at': datetime_field.to_representation(row['created_at']), 'status': row['status'],
+        'order_info': lines.get(row['id'], []), 'total_sum': row.get('total_sum'),
+    }) for row in rows]
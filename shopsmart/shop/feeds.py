@@ -0,0 +1,206 @@
+"""
+Загрузка и потоковое чтение прайс-листов поставщиков.
+
+Прайс-лист загружается условным запросом (If-None-Match / If-Modified-Since)
+во временный файл с подсчетом хэша содержимого, так что неизменный прайс-лист
+можно пропустить, не разбирая его.
+Прайс-лист читается из файлового объекта порциями, товары раздела goods
+отдаются по одному, поэтому расход памяти не зависит от размера файла.
+Поддерживаются YAML (shop/categories/goods) и JSON Lines: первая строка
+содержит shop и categories, каждая следующая - один товар.
+"""
+from hashlib import sha256
+from tempfile import SpooledTemporaryFile
+
+from requests import get
+from ujson import loads as loads_json
+from yaml import ScalarNode
+from yaml.events import (ScalarEvent, SequenceStartEvent, SequenceEndEvent, MappingStartEvent, MappingEndEvent,
+                         DocumentStartEvent)
+
+try:
+    # Загрузчик на libyaml в разы быстрее загрузчика на чистом Python
+    from yaml import CSafeLoader as FeedLoader
+except ImportError:
+    from yaml import SafeLoader as FeedLoader
+
+CHUNK_SIZE = 64 * 1024  # Размер порции, читаемой из потока
+SPOOL_SIZE = 8 * 1024 * 1024  # Прайс-листы до этого размера не записываются на диск
+FEED_TIMEOUT = 60  # Таймаут соединения с сервером поставщика в секундах
+
+JSONL_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines')
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+
+
+class PriceListError(Exception):
+    """
+    Ошибка в содержимом прайс-листа
+    """
+
+
+class PriceList:
+    """
+    Прайс-лист: магазин, категории и итератор по товарам
+    """
+
+    def __init__(self, shop, categories, goods):
+        self.shop = shop
+        self.categories = categories
+        self.goods = goods
+
+
+class FeedDownload:
+    """
+    Результат загрузки прайс-листа
+    """
+
+    def __init__(self, not_modified, file=None, content_type=None, etag='', last_modified='', content_hash=''):
+        self.not_modified = not_modified  # Сервер ответил 304 Not Modified
+        self.file = file
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+
+
+def download_feed(url, etag='', last_modified='', timeout=FEED_TIMEOUT):
+    """
+    Загрузка прайс-листа во временный файл.
+    При известных ETag и Last-Modified отправляется условный запрос.
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    with get(url, stream=True, timeout=timeout, headers=headers) as response:
+        if response.status_code == 304:
+            return FeedDownload(True, etag=etag, last_modified=last_modified)
+        response.raise_for_status()
+
+        file = SpooledTemporaryFile(SPOOL_SIZE)
+        digest = sha256()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            digest.update(chunk)
+            file.write(chunk)
+        file.seek(0)
+        return FeedDownload(False, file, response.headers.get('Content-Type'), response.headers.get('ETag', ''),
+                            response.headers.get('Last-Modified', ''), digest.hexdigest())
+
+
+def feed_format(url, content_type=None):
+    """
+    Определение формата прайс-листа по заголовку Content-Type или расширению файла
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in JSONL_CONTENT_TYPES or url.split('?')[0].lower().endswith(JSONL_EXTENSIONS):
+        return 'jsonl'
+    return 'yaml'
+
+
+def read_price_list(stream, format='yaml'):
+    if format == 'jsonl':
+        return read_jsonl(stream)
+    return read_yaml(stream)
+
+
+def read_yaml(stream):
+    """
+    Чтение YAML прайс-листа по событиям парсера.
+    Разделы shop и categories должны идти до раздела goods.
+    """
+    loader = FeedLoader(stream)
+    loader.get_event()
+    if not loader.check_event(DocumentStartEvent):
+        raise PriceListError('Пустой прайс-лист')
+    loader.get_event()
+    if not loader.check_event(MappingStartEvent):
+        raise PriceListError('Прайс-лист должен быть словарем')
+    loader.get_event()
+
+    header = {}
+    while not loader.check_event(MappingEndEvent):
+        key = _construct(loader, loader.get_event())
+        if key == 'goods':
+            if not {'shop', 'categories'}.issubset(header):
+                raise PriceListError('Разделы shop и categories должны идти до раздела goods')
+            return PriceList(header['shop'], header['categories'], _iter_goods(loader))
+        header[key] = _construct(loader, loader.get_event())
+
+    loader.dispose()
+    if 'shop' not in header:
+        raise PriceListError('Не указан магазин')
+    return PriceList(header['shop'], header.get('categories') or [], iter(()))
+
+
+def _iter_goods(loader):
+    try:
+        event = loader.get_event()
+        if isinstance(event, ScalarEvent) and event.value in ('', '~', 'null'):
+            return
+        if not isinstance(event, SequenceStartEvent):
+            raise PriceListError('Раздел goods должен быть списком')
+        while not loader.check_event(SequenceEndEvent):
+            yield _construct(loader, loader.get_event())
+    finally:
+        loader.dispose()
+
+
+def _construct(loader, event):
+    """
+    Построение объекта Python из событий парсера без хранения дерева узлов
+    """
+    if isinstance(event, ScalarEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(ScalarNode, event.value, event.implicit)
+        constructor = loader.yaml_constructors.get(tag, loader.yaml_constructors[None])
+        return constructor(loader, ScalarNode(tag, event.value, event.start_mark, event.end_mark, event.style))
+
+    if isinstance(event, SequenceStartEvent):
+        sequence = []
+        while not loader.check_event(SequenceEndEvent):
+            sequence.append(_construct(loader, loader.get_event()))
+        loader.get_event()
+        return sequence
+
+    if isinstance(event, MappingStartEvent):
+        mapping = {}
+        while not loader.check_event(MappingEndEvent):
+            key = _construct(loader, loader.get_event())
+            mapping[key] = _construct(loader, loader.get_event())
+        loader.get_event()
+        return mapping
+
+    raise PriceListError('Якоря и ссылки YAML не поддерживаются')
+
+
+def iter_lines(stream, chunk_size=CHUNK_SIZE):
+    """
+    Чтение строк из потока порциями по chunk_size байт
+    """
+    tail = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        lines = (tail + chunk).split(b'\n')
+        tail = lines.pop()
+        yield from lines
+    if tail:
+        yield tail
+
+
+def read_jsonl(stream):
+    """
+    Чтение прайс-листа в формате JSON Lines
+    """
+    lines = (line for line in iter_lines(stream) if line.strip())
+    try:
+        header = loads_json(next(lines))
+    except StopIteration:
+        raise PriceListError('Пустой прайс-лист')
+    if not isinstance(header, dict) or 'shop' not in header:
+        raise PriceListError('Первая строка должна содержать shop и categories')
+    return PriceList(header['shop'], header.get('categories') or [], (loads_json(line) for line in lines))
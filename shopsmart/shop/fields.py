@@ -0,0 +1,61 @@
+"""
+Выборочные поля (?fields=) и раскрытие связей (?expand=) в ответах API.
+
+fields - список полей через запятую, вложенные поля указываются через точку:
+?fields=id,price,product.name. Без fields выводятся все поля.
+expand - список связей, которые выводятся вложенным объектом вместо id:
+?expand=shop или ?expand=order_info.product_info.
+
+Связи, которые не попали в ответ, не запрашиваются из базы: ответы строятся
+по выбору в shop.fast_serializers.
+"""
+
+
+def _paths(value):
+    return {path.strip() for path in (value or '').split(',') if path.strip()}
+
+
+class FieldSelection:
+    """
+    Выбор полей и раскрываемых связей ответа
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields  # None - все поля
+        self.expand = expand or set()
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        return cls(_paths(params['fields']) if params.get('fields') else None, _paths(params.get('expand')))
+
+    def includes(self, path):
+        """
+        Входит ли поле path в ответ: оно выбрано само, выбран его предок или вложенное в него поле
+        """
+        if self.fields is None:
+            return True
+        return any(path == field or path.startswith(f'{field}.') or field.startswith(f'{path}.')
+                   for field in self.fields)
+
+    def expands(self, path):
+        return path in self.expand and self.includes(path)
+
+    def project(self, data, prefix=''):
+        """
+        Выбор полей из готового ответа (словаря или списка словарей)
+        """
+        if self.fields is None:
+            return data
+        if isinstance(data, list):
+            return [self.project(item, prefix) if isinstance(item, dict) else item for item in data]
+        result = {}
+        for name, value in data.items():
+            path = f'{prefix}{name}'
+            if not self.includes(path):
+                continue
+            selected_whole = any(path == field or path.startswith(f'{field}.') for field in self.fields)
+            result[name] = value if selected_whole or not isinstance(value, (dict, list)) \
+                else self.project(value, f'{path}.')
+        return result
+
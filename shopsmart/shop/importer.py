@@ -0,0 +1,484 @@
+"""
+Импорт прайс-листов поставщиков.
+
+Импорт выполняется в фоновой задаче Celery (см. tasks.import_price_list),
+ход выполнения сохраняется в модели ImportJob.
+
+Товары записываются пакетами, каждый пакет фиксируется вместе с контрольной
+точкой магазина (хэш прайс-листа и количество записанных строк, см. ShopFeed).
+Если воркер завершился во время импорта, повторный импорт того же прайс-листа
+продолжается с последнего зафиксированного пакета.
+"""
+from itertools import islice
+from time import perf_counter
+
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from requests import RequestException
+from yaml import YAMLError
+
+from .catalog import INFO_FIELDS, discard_pending, publish, collect_garbage
+from .feeds import PriceListError, download_feed, feed_format, read_price_list
+from .models import ImportJob, Shop, ShopFeed, Category, Product, ProductInfo, ProductInfoUpdate, ProductParameter, \
+    Parameter
+from . import catalog_cache, readmodel, registry
+
+BATCH_SIZE = 1000  # Количество товаров, записываемых одним пакетом
+MAX_ERRORS = 100  # Максимальное количество сохраняемых ошибок по строкам
+PROGRESS_TIMEOUT = 60 * 60  # Время жизни прогресса задачи в кэше
+IMPORT_LOCK_TIMEOUT = 10 * 60  # Время жизни блокировки импорта, продлевается после каждого пакета
+
+GOODS_FIELDS = ('id', 'category', 'model', 'name', 'price', 'price_rrc', 'quantity')
+NUMERIC_FIELDS = ('id', 'price', 'price_rrc', 'quantity')  # Неотрицательные целые (PositiveIntegerField)
+# Наибольшая длина строковых полей товара и параметров, как в моделях
+MAX_LENGTHS = {'model': ProductInfo._meta.get_field('model').max_length,
+               'name': Product._meta.get_field('name').max_length}
+MAX_PARAMETER_LENGTH = min(Parameter._meta.get_field('name').max_length,
+                           ProductParameter._meta.get_field('value').max_length)
+
+
+def progress_key(job_id):
+    return f'shop:import_job:{job_id}'
+
+
+def lock_key(shop_id):
+    return f'shop:import_lock:{shop_id}'
+
+
+def load_progress(job):
+    """
+    Подстановка текущего прогресса выполняющейся задачи из кэша.
+    Прогресс публикуется через кэш, чтобы не перезаписывать строку задачи после каждого пакета.
+    """
+    if job.status == 'running':
+        progress = cache.get(progress_key(job.id))
+        if progress:
+            job.rows_processed = progress['rows_processed']
+            job.errors = progress['errors']
+            for change, count in progress['changes'].items():
+                setattr(job, f'rows_{change}', count)
+    return job
+
+
+def run_import_job(job_id):
+    """
+    Выполнение задачи импорта: загрузка прайс-листа и запись его в базу
+    """
+    job = ImportJob.objects.get(id=job_id)
+    job.status = 'running'
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    try:
+        feed = ShopFeed.objects.filter(shop__user_id=job.user_id, url=job.url).first()
+        if feed is None:
+            download = download_feed(job.url)
+        else:
+            download = download_feed(job.url, feed.etag, feed.last_modified)
+
+        if download.not_modified or (feed is not None and download.content_hash == feed.content_hash):
+            # Прайс-лист не изменился: не разбираем и не пишем его
+            job.skipped = True
+            job.shop_id = feed.shop_id
+            ShopFeed.objects.filter(id=feed.id).update(checked_at=timezone.now())
+        else:
+            with download.file:
+                price_list = read_price_list(download.file, feed_format(job.url, download.content_type))
+                writer = write_price_list(job, price_list, download.content_hash)
+            save_feed(writer.shop, job.url, download)
+    except (RequestException, YAMLError, PriceListError, KeyError, TypeError, ValueError, DatabaseError) as e:
+        job.status = 'failed'
+        job.errors.append(str(e))
+    else:
+        job.status = 'done'
+
+    job.finished_at = timezone.now()
+    if job.shop_id:
+        record_refresh(job)
+    job.save(update_fields=['status', 'shop', 'skipped', 'rows_processed', 'resumed_from', 'rows_per_second',
+                            'rows_created', 'rows_updated', 'rows_deleted', 'rows_unchanged', 'errors', 'finished_at'])
+    cache.delete(progress_key(job.id))
+    return job
+
+
+def save_feed(shop, url, download):
+    """
+    Сохранение состояния успешно загруженного прайс-листа магазина
+    """
+    now = timezone.now()
+    ShopFeed.objects.update_or_create(shop=shop, defaults={
+        'url': url,
+        'etag': download.etag,
+        'last_modified': download.last_modified,
+        'content_hash': download.content_hash,
+        'checked_at': now,
+        'updated_at': now,
+    })
+
+
+def record_refresh(job):
+    """
+    Сохранение длительности и задержки обновления прайс-листа магазина
+    """
+    values = {'last_duration': job.duration}
+    if job.due_at:
+        values['last_lag'] = (job.started_at - job.due_at).total_seconds()
+    ShopFeed.objects.filter(shop_id=job.shop_id).update(**values)
+
+
+def get_shop(job, name):
+    """
+    Получение магазина прайс-листа с проверкой владельца.
+    Новый магазин создается для пользователя задачи; существующий магазин без владельца
+    прайс-лист не получает, владельца ему назначает администратор.
+    Ссылка на прайс-лист хранится в ImportJob и ShopFeed, а не в публичной ссылке магазина:
+    в ней часто есть токен доступа.
+    """
+    shop, _ = Shop.objects.get_or_create(name=name, defaults={'user_id': job.user_id})
+    if shop.user_id is None:
+        raise PriceListError('У магазина нет владельца, его назначает администратор')
+    if shop.user_id != job.user_id:
+        raise PriceListError('Магазин принадлежит другому пользователю')
+    job.shop_id = shop.id
+    return shop
+
+
+def write_price_list(job, price_list, content_hash=''):
+    """
+    Запись прайс-листа в новое поколение каталога магазина.
+    Пакеты товаров коммитятся по отдельности и не видны покупателям,
+    пока поколение не опубликовано. Изменяются только строки,
+    отличающиеся от текущего каталога магазина.
+    По хэшу содержимого content_hash ведется контрольная точка импорта.
+    """
+    shop = get_shop(job, price_list.shop)
+    lock = lock_key(shop.id)
+    # Блокировка продлевается после каждого пакета, поэтому после гибели воркера
+    # она истекает быстро и повторный импорт может продолжить работу. Задача, повторно
+    # выданная брокером после гибели воркера, находит свою же блокировку и продолжает импорт
+    if not cache.add(lock, job.id, IMPORT_LOCK_TIMEOUT):
+        if cache.get(lock) != job.id:
+            raise PriceListError('Импорт этого магазина уже выполняется')
+        cache.touch(lock, IMPORT_LOCK_TIMEOUT)
+
+    try:
+        writer = PriceListWriter(job, shop, content_hash=content_hash)
+        with transaction.atomic():
+            writer.write_categories(price_list.categories)
+        writer.write_goods(price_list.goods)
+    finally:
+        cache.delete(lock)
+
+    collect_garbage(shop.id)
+    return writer
+
+
+def batched(iterable, size):
+    """
+    Разбиение последовательности на списки по size элементов
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class PriceListWriter:
+    """
+    Пакетная запись прайс-листа.
+    Прайс-лист сравнивается с опубликованными строками ProductInfo магазина по ключу
+    (товар, внешний id): новые товары записываются строками нового поколения, новые
+    значения изменившихся - в ProductInfoUpdate и переносятся в те же строки при
+    публикации, отсутствующие в прайс-листе строки скрываются в новом поколении,
+    неизменные не трогаются (см. catalog).
+    Товары и параметры пакета разрешаются несколькими запросами на весь пакет.
+    Если передан хэш прайс-листа content_hash, после каждого пакета сохраняется
+    контрольная точка, с которой можно продолжить прерванный импорт.
+    """
+
+    def __init__(self, job, shop, batch_size=BATCH_SIZE, content_hash=''):
+        self.job = job
+        self.shop = shop
+        self.batch_size = batch_size
+        self.content_hash = content_hash
+        self.category_ids = set()
+        self.stale_ids = set()  # id строк магазина, еще не встреченных в прайс-листе
+        self.generation = None  # Записываемое поколение каталога
+        self.changes = {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        if not self.seconds:
+            return None
+        return round(self.job.rows_processed / self.seconds, 1)
+
+    def write_categories(self, categories):
+        names = {category['id']: category['name'] for category in categories}
+        existing = Category.objects.in_bulk(list(names))
+
+        Category.objects.bulk_create([Category(id=category_id, name=name)
+                                      for category_id, name in names.items() if category_id not in existing])
+        renamed = [category for category in existing.values() if category.name != names[category.id]]
+        for category in renamed:
+            category.name = names[category.id]
+        Category.objects.bulk_update(renamed, ['name'])
+        # bulk_create и bulk_update не отправляют сигналы, поэтому реестр и версия списка категорий
+        # обновляются явно
+        for category_id, name in names.items():
+            registry.categories.remember(category_id, name)
+        if len(existing) < len(names) or renamed:
+            catalog_cache.bump([catalog_cache.CATEGORIES_KEY])
+        if renamed:
+            # Название категории входит в ответ каталога; пересборка - после обновления реестра
+            renamed_ids = [category.id for category in renamed]
+            transaction.on_commit(lambda: readmodel.refresh_categories(renamed_ids))
+
+        through = Category.shop.through
+        through.objects.bulk_create([through(category_id=category_id, shop_id=self.shop.id) for category_id in names],
+                                    ignore_conflicts=True)
+        self.category_ids = set(names)
+
+    def write_goods(self, goods):
+        """
+        Запись товаров пакетами по batch_size. goods может быть генератором:
+        в памяти держится только текущий пакет и id строк магазина.
+        """
+        started = perf_counter()
+        goods = iter(goods)
+        checkpoint = self._load_checkpoint()
+        if checkpoint is None:
+            discard_pending(self.shop)
+            self.generation = self.shop.catalog_generation + 1
+            self.stale_ids = set(ProductInfo.objects.filter(shop_id=self.shop.id)
+                                 .visible_in(self.shop.catalog_generation).values_list('id', flat=True))
+        else:
+            self._resume(goods, checkpoint)
+
+        for batch in batched(goods, self.batch_size):
+            rows = [(row, item) for row, item in enumerate(batch, start=self.job.rows_processed + 1)
+                    if self._validate(row, item)]
+            with transaction.atomic():
+                if rows:
+                    self._write_batch(rows)
+                self.job.rows_processed += len(batch)
+                self._save_checkpoint()
+            self._report_progress()
+
+        self._retire_stale()
+        if self.changes['created'] or self.changes['updated'] or self.changes['deleted']:
+            publish(self.shop, self.generation)
+        self._clear_checkpoint()
+
+        self.seconds += perf_counter() - started
+        self.job.rows_per_second = self.rows_per_second
+        self.job.rows_created = self.changes['created']
+        self.job.rows_updated = self.changes['updated']
+        self.job.rows_deleted = self.changes['deleted']
+        self.job.rows_unchanged = self.changes['unchanged']
+
+    def _error(self, message):
+        if len(self.job.errors) < MAX_ERRORS:
+            self.job.errors.append(message)
+
+    def _validate(self, row, item):
+        if not isinstance(item, dict):
+            self._error(f'Строка {row}: товар должен быть словарем')
+            return False
+        missing = [field for field in GOODS_FIELDS if field not in item]
+        if missing:
+            self._error(f'Строка {row}: нет полей {", ".join(missing)}')
+            return False
+        if item['category'] not in self.category_ids:
+            self._error(f'Строка {row}: неизвестная категория {item["category"]}')
+            return False
+        try:
+            # Приводим значения к типам модели, чтобы сравнение с базой было точным
+            for field in NUMERIC_FIELDS:
+                item[field] = int(item[field])
+        except (TypeError, ValueError):
+            self._error(f'Строка {row}: некорректное числовое значение')
+            return False
+        negative = [field for field in NUMERIC_FIELDS if item[field] < 0]
+        if negative:
+            self._error(f'Строка {row}: отрицательные значения полей {", ".join(negative)}')
+            return False
+        parameters = item.get('parameters') or {}
+        if not isinstance(parameters, dict):
+            self._error(f'Строка {row}: параметры должны быть словарем')
+            return False
+        item['model'] = str(item['model'])
+        too_long = [field for field, max_length in MAX_LENGTHS.items() if len(str(item[field])) > max_length]
+        if too_long:
+            self._error(f'Строка {row}: слишком длинные значения полей {", ".join(too_long)}')
+            return False
+        if any(len(str(name)) > MAX_PARAMETER_LENGTH or len(str(value)) > MAX_PARAMETER_LENGTH
+               for name, value in parameters.items()):
+            self._error(f'Строка {row}: название или значение параметра длиннее {MAX_PARAMETER_LENGTH} символов')
+            return False
+        return True
+
+    def _load_checkpoint(self):
+        """
+        Контрольная точка прерванного импорта того же прайс-листа в еще не опубликованное поколение
+        """
+        if not self.content_hash:
+            return None
+        feed, _ = ShopFeed.objects.get_or_create(shop_id=self.shop.id, defaults={'url': self.job.url})
+        if (feed.checkpoint_hash != self.content_hash or not feed.checkpoint_rows
+                or feed.checkpoint_generation != self.shop.catalog_generation + 1):
+            return None
+        return feed
+
+    def _save_checkpoint(self):
+        if self.content_hash:
+            ShopFeed.objects.filter(shop_id=self.shop.id).update(
+                checkpoint_hash=self.content_hash, checkpoint_generation=self.generation,
+                checkpoint_rows=self.job.rows_processed, checkpoint_changes=self.changes)
+
+    def _clear_checkpoint(self):
+        if self.content_hash:
+            ShopFeed.objects.filter(shop_id=self.shop.id).update(
+                checkpoint_hash='', checkpoint_generation=0, checkpoint_rows=0, checkpoint_changes={})
+
+    def _resume(self, goods, checkpoint):
+        """
+        Продолжение импорта с контрольной точки. Строки зафиксированных пакетов
+        только читаются, чтобы исключить встреченные товары из удаляемых.
+        """
+        self.generation = checkpoint.checkpoint_generation
+        self.changes.update(checkpoint.checkpoint_changes)
+        self.job.resumed_from = checkpoint.checkpoint_rows
+        self.stale_ids = set(ProductInfo.objects.filter(shop_id=self.shop.id)
+                             .visible_in(self.shop.catalog_generation).values_list('id', flat=True))
+
+        for batch in batched(islice(goods, checkpoint.checkpoint_rows), self.batch_size):
+            rows = [(row, item) for row, item in enumerate(batch, start=self.job.rows_processed + 1)
+                    if self._validate(row, item)]
+            if rows:
+                self._mark_seen([item for _, item in rows])
+            self.job.rows_processed += len(batch)
+            self._report_progress()
+
+    def _mark_seen(self, items):
+        """
+        Исключение товаров уже записанного пакета из строк, которые нужно скрыть
+        """
+        products = self._resolve_products(items)
+        keys = {(products[(item['name'], item['category'])], item['id']) for item in items}
+        for info_id, product_id, external_id in ProductInfo.objects.filter(
+                shop_id=self.shop.id, product_id__in={product_id for product_id, _ in keys},
+                external_id__in={external_id for _, external_id in keys}).values_list(
+                'id', 'product_id', 'external_id'):
+            if (product_id, external_id) in keys:
+                self.stale_ids.discard(info_id)
+
+    def _is_live(self, info):
+        live = self.shop.catalog_generation
+        return info.generation <= live and (info.retired_generation is None or info.retired_generation > live)
+
+    def _write_batch(self, rows):
+        products = self._resolve_products([item for _, item in rows])
+        parameters = self._resolve_parameters([item for _, item in rows])
+
+        incoming = {}
+        for row, item in rows:
+            key = (products[(item['name'], item['category'])], item['id'])
+            if key in incoming:
+                self._error(f'Строка {row}: повтор товара {item["id"]}')
+            else:
+                item['parameters'] = {parameters[name]: str(value)
+                                      for name, value in (item.get('parameters') or {}).items()}
+                incoming[key] = (row, item)
+
+        existing = {}
+        for info in ProductInfo.objects.filter(shop_id=self.shop.id,
+                                               product_id__in={product_id for product_id, _ in incoming},
+                                               external_id__in={external_id for _, external_id in incoming}):
+            key = (info.product_id, info.external_id)
+            if key not in incoming or not (info.generation == self.generation or self._is_live(info)):
+                continue
+            if info.id not in self.stale_ids:
+                # Строка уже создана или сверена раньше в этом же прайс-листе
+                row, item = incoming.pop(key)
+                self._error(f'Строка {row}: повтор товара {item["id"]}')
+                continue
+            self.stale_ids.discard(info.id)
+            existing[key] = info
+
+        current = {}
+        for product_info_id, parameter_id, value in ProductParameter.objects.filter(
+                product_info_id__in=[info.id for info in existing.values()]).values_list(
+                'product_info_id', 'parameter_id', 'value'):
+            current.setdefault(product_info_id, {})[parameter_id] = value
+
+        # Новые товары записываются строками нового поколения, новые значения изменившихся -
+        # изменениями строк, которые переносятся в них при публикации
+        created = []
+        updated = []
+        for key, (_, item) in incoming.items():
+            info = existing.get(key)
+            values = {field: item[field] for field in INFO_FIELDS}
+            if info is None:
+                created.append((ProductInfo(product_id=key[0], shop_id=self.shop.id, external_id=key[1],
+                                            generation=self.generation, **values), item))
+            elif (all(getattr(info, field) == value for field, value in values.items())
+                    and current.get(info.id, {}) == item['parameters']):
+                self.changes['unchanged'] += 1
+            else:
+                updated.append(ProductInfoUpdate(product_info_id=info.id, shop_id=self.shop.id,
+                                                 generation=self.generation,
+                                                 parameters=sorted(item['parameters'].items()), **values))
+
+        ProductInfo.objects.bulk_create([info for info, _ in created])
+        ProductParameter.objects.bulk_create([
+            ProductParameter(product_info_id=info.id, parameter_id=parameter_id, value=value)
+            for info, item in created
+            for parameter_id, value in item['parameters'].items()
+        ], batch_size=self.batch_size)
+        ProductInfoUpdate.objects.bulk_create(updated)
+
+        self.changes['created'] += len(created)
+        self.changes['updated'] += len(updated)
+
+    def _retire_stale(self):
+        """
+        Скрытие строк магазина, которых нет в прайс-листе
+        """
+        for ids in batched(self.stale_ids, self.batch_size):
+            ProductInfo.objects.filter(id__in=ids).update(retired_generation=self.generation)
+            self.changes['deleted'] += len(ids)
+        self.stale_ids = set()
+
+    def _resolve_products(self, items):
+        """
+        Получение id товаров пакета по (название, категория), недостающие создаются
+        """
+        keys = {(item['name'], item['category']) for item in items}
+        products = {(name, category_id): product_id for product_id, name, category_id in
+                    Product.objects.filter(name__in={name for name, _ in keys},
+                                           category_id__in={category_id for _, category_id in keys})
+                    .values_list('id', 'name', 'category_id')}
+
+        created = Product.objects.bulk_create([Product(name=name, category_id=category_id)
+                                               for name, category_id in keys if (name, category_id) not in products])
+        products.update({(product.name, product.category_id): product.id for product in created})
+        return products
+
+    def _resolve_parameters(self, items):
+        """
+        Получение id параметров пакета по названию, недостающие создаются
+        """
+        return registry.parameters.ids({name for item in items for name in (item.get('parameters') or {})},
+                                       create=True)
+
+    def _report_progress(self):
+        cache.set(progress_key(self.job.id),
+                  {'rows_processed': self.job.rows_processed, 'errors': self.job.errors, 'changes': self.changes},
+                  PROGRESS_TIMEOUT)
+        cache.touch(lock_key(self.shop.id), IMPORT_LOCK_TIMEOUT)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from shop.catalog_cache import stats
+
+
+class Command(BaseCommand):
+    help = 'Количество попаданий и промахов кэша ответов каталога'
+
+    def handle(self, *args, **options):
+        counters = stats()
+        self.stdout.write(f'Попаданий: {counters["hits"]}, промахов: {counters["misses"]}, '
+                          f'доля попаданий: {counters["hit_rate"]}')
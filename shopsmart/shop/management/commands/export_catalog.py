@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from shop.export import FORMATS, export
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка каталога активных магазинов в NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='ndjson', help='Формат выгрузки')
+        parser.add_argument('--output', help='Файл выгрузки (по умолчанию stdout)')
+        parser.add_argument('--gzip', action='store_true', help='Сжать выгрузку в gzip')
+        parser.add_argument('--category-id', type=int, help='Только товары категории')
+        parser.add_argument('--shop-id', type=int, help='Только товары магазина')
+
+    def handle(self, *args, **options):
+        chunks = export(options['format'], options['gzip'], category_id=options['category_id'],
+                        shop_id=options['shop_id'])
+        if not options['gzip']:
+            chunks = (line.encode() for line in chunks)
+        if options['output']:
+            with open(options['output'], 'wb') as file:
+                file.writelines(chunks)
+        else:
+            sys.stdout.buffer.writelines(chunks)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from shop.models import BestOffer, CatalogEntry
+from shop.readmodel import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Полное перестроение модели чтения каталога по опубликованным каталогам магазинов'
+
+    def handle(self, *args, **options):
+        rebuild()
+        self.stdout.write(f'Строк каталога: {CatalogEntry.objects.count()}, '
+                          f'лучших предложений: {BestOffer.objects.count()}')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from shop.facets import rebuild_facets
+from shop.models import Shop
+
+
+class Command(BaseCommand):
+    help = 'Полный пересчет фасетов каталога (всех магазинов или указанных)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('shop_ids', nargs='*', type=int, help='id магазинов')
+
+    def handle(self, *args, **options):
+        shop_ids = options['shop_ids'] or Shop.objects.values_list('id', flat=True)
+        for shop_id in shop_ids:
+            rebuild_facets(shop_id)
+            self.stdout.write(f'Фасеты магазина {shop_id} пересчитаны')
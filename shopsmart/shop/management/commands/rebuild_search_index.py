@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.models import Shop
+from shop.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестроение поискового индекса каталога (всех магазинов или указанных)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('shop_ids', nargs='*', type=int, help='id магазинов')
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend is None:
+            raise CommandError('Для этой СУБД нет поискового индекса, задайте SEARCH_BACKEND')
+        shops = Shop.objects.all()
+        if options['shop_ids']:
+            shops = shops.filter(id__in=options['shop_ids'])
+        for shop_id, generation in shops.values_list('id', 'catalog_generation'):
+            backend.rebuild(shop_id, generation)
+            self.stdout.write(f'Поисковый индекс магазина {shop_id} перестроен')
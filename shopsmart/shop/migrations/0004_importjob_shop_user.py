@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-18 03:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_rename_token_emailtoken_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='user',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shop', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(verbose_name='Ссылка на прайс-лист')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершен'), ('failed', 'Ошибка')], default='queued', max_length=10, verbose_name='Статус импорта')),
+                ('rows_processed', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Ошибки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата начала')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Задача импорта',
+                'verbose_name_plural': 'Задачи импорта',
+                'ordering': ('-created_at',),
+            },
+        ),
+    ]
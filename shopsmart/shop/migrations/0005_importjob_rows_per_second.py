@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_importjob_shop_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='rows_per_second',
+            field=models.FloatField(blank=True, null=True, verbose_name='Строк в секунду'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-18 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_importjob_rows_per_second'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='rows_created',
+            field=models.PositiveIntegerField(default=0, verbose_name='Добавлено строк'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='rows_deleted',
+            field=models.PositiveIntegerField(default=0, verbose_name='Удалено строк'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='rows_unchanged',
+            field=models.PositiveIntegerField(default=0, verbose_name='Строк без изменений'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='rows_updated',
+            field=models.PositiveIntegerField(default=0, verbose_name='Изменено строк'),
+        ),
+    ]
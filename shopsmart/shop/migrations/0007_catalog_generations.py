@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_importjob_change_counts'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='productinfo',
+            name='unique_product_info',
+        ),
+        migrations.AddField(
+            model_name='productinfo',
+            name='generation',
+            field=models.PositiveIntegerField(default=0, verbose_name='Поколение каталога'),
+        ),
+        migrations.AddField(
+            model_name='productinfo',
+            name='retired_generation',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Скрыто с поколения'),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='catalog_generation',
+            field=models.PositiveIntegerField(default=0, verbose_name='Опубликованное поколение каталога'),
+        ),
+        migrations.AddConstraint(
+            model_name='productinfo',
+            constraint=models.UniqueConstraint(fields=('product', 'external_id', 'shop', 'generation'), name='unique_product_info'),
+        ),
+    ]
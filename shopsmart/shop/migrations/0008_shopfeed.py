@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-18 03:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_catalog_generations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='skipped',
+            field=models.BooleanField(default=False, verbose_name='Прайс-лист не изменился'),
+        ),
+        migrations.CreateModel(
+            name='ShopFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(verbose_name='Ссылка на прайс-лист')),
+                ('etag', models.CharField(blank=True, max_length=200, verbose_name='ETag')),
+                ('last_modified', models.CharField(blank=True, max_length=100, verbose_name='Last-Modified')),
+                ('content_hash', models.CharField(blank=True, max_length=64, verbose_name='Хэш содержимого')),
+                ('checked_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата проверки')),
+                ('updated_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата изменения')),
+                ('shop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to='shop.shop', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Прайс-лист магазина',
+                'verbose_name_plural': 'Прайс-листы магазинов',
+            },
+        ),
+    ]
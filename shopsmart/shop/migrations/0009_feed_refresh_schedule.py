@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-18 03:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_shopfeed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='due_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Плановая дата обновления'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='shop',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to='shop.shop', verbose_name='Магазин'),
+        ),
+        migrations.AddField(
+            model_name='shopfeed',
+            name='last_duration',
+            field=models.FloatField(blank=True, null=True, verbose_name='Длительность последнего обновления (с)'),
+        ),
+        migrations.AddField(
+            model_name='shopfeed',
+            name='last_lag',
+            field=models.FloatField(blank=True, null=True, verbose_name='Задержка последнего обновления (с)'),
+        ),
+        migrations.AddField(
+            model_name='shopfeed',
+            name='next_refresh_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата следующего обновления'),
+        ),
+    ]
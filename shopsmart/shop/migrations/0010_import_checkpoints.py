@@ -0,0 +1,38 @@
+# Generated by Django 5.1.5 on 2026-10-18 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_feed_refresh_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='resumed_from',
+            field=models.PositiveIntegerField(default=0, verbose_name='Продолжен со строки'),
+        ),
+        migrations.AddField(
+            model_name='shopfeed',
+            name='checkpoint_changes',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Изменения в зафиксированных строках'),
+        ),
+        migrations.AddField(
+            model_name='shopfeed',
+            name='checkpoint_generation',
+            field=models.PositiveIntegerField(default=0, verbose_name='Импортируемое поколение'),
+        ),
+        migrations.AddField(
+            model_name='shopfeed',
+            name='checkpoint_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Хэш импортируемого прайс-листа'),
+        ),
+        migrations.AddField(
+            model_name='shopfeed',
+            name='checkpoint_rows',
+            field=models.PositiveIntegerField(default=0, verbose_name='Зафиксировано строк'),
+        ),
+    ]
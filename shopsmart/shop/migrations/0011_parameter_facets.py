@@ -0,0 +1,53 @@
+# Generated by Django 5.1.5 on 2026-10-18 03:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def build_facets(apps, schema_editor):
+    """
+    Расчет фасетов по опубликованным каталогам магазинов
+    """
+    Shop = apps.get_model('shop', 'Shop')
+    ProductParameter = apps.get_model('shop', 'ProductParameter')
+    ParameterFacet = apps.get_model('shop', 'ParameterFacet')
+    for shop_id, generation in Shop.objects.values_list('id', 'catalog_generation'):
+        rows = (ProductParameter.objects
+                .filter(Q(product_info__retired_generation__isnull=True)
+                        | Q(product_info__retired_generation__gt=generation),
+                        product_info__shop_id=shop_id, product_info__generation__lte=generation)
+                .order_by().values('product_info__product__category_id', 'parameter_id', 'value')
+                .annotate(count=Count('id')))
+        ParameterFacet.objects.bulk_create([
+            ParameterFacet(shop_id=shop_id, category_id=row['product_info__product__category_id'],
+                           parameter_id=row['parameter_id'], value=row['value'], count=row['count'])
+            for row in rows
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_import_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParameterFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(max_length=200, verbose_name='Значение')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество товаров')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='shop.category', verbose_name='Категория')),
+                ('parameter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='shop.parameter', verbose_name='Параметр')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='shop.shop', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Значение фильтра',
+                'verbose_name_plural': 'Значения фильтров',
+                'constraints': [models.UniqueConstraint(fields=('shop', 'category', 'parameter', 'value'), name='unique_parameter_facet')],
+            },
+        ),
+        migrations.RunPython(build_facets, migrations.RunPython.noop),
+    ]
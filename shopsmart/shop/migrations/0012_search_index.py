@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Таблицы поискового индекса по СУБД (см. shop.search). SQL записан здесь, а не берется
+# из кода приложения, чтобы миграция не менялась вместе с ним
+CREATE_SEARCH_INDEX = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS shop_search USING fts5('
+        'name, model, category, parameters, shop_id UNINDEXED, category_id UNINDEXED, '
+        "tokenize='unicode61 remove_diacritics 2')",
+    ],
+    'postgresql': [
+        'CREATE TABLE IF NOT EXISTS shop_search ('
+        'product_info_id bigint PRIMARY KEY, shop_id bigint NOT NULL, category_id bigint, '
+        'document tsvector NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS shop_search_document ON shop_search USING gin (document)',
+        'CREATE INDEX IF NOT EXISTS shop_search_shop ON shop_search (shop_id)',
+    ],
+}
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Создание таблицы поискового индекса для СУБД, если для нее есть реализация индекса.
+    Индекс существующих каталогов заполняется командой rebuild_search_index.
+    """
+    for statement in CREATE_SEARCH_INDEX.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_SEARCH_INDEX:
+        schema_editor.execute('DROP TABLE IF EXISTS shop_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0011_parameter_facets'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.1.5 on 2026-10-18 03:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Q
+
+BATCH_SIZE = 500  # Количество товаров, строки которых собираются за один проход
+
+
+def build_entries(apps, schema_editor):
+    """
+    Строки каталога по опубликованным каталогам магазинов. Ответ строки собирается так же,
+    как в shop.fast_serializers.product_infos: код приложения в миграции не используется
+    """
+    ProductInfo = apps.get_model('shop', 'ProductInfo')
+    ProductParameter = apps.get_model('shop', 'ProductParameter')
+    CatalogEntry = apps.get_model('shop', 'CatalogEntry')
+    live = ProductInfo.objects.filter(Q(retired_generation__isnull=True)
+                                      | Q(retired_generation__gt=F('shop__catalog_generation')),
+                                      generation__lte=F('shop__catalog_generation'))
+    product_ids = sorted(live.order_by().values_list('product_id', flat=True).distinct())
+    for start in range(0, len(product_ids), BATCH_SIZE):
+        rows = list(live.filter(product_id__in=product_ids[start:start + BATCH_SIZE]).order_by('id').values_list(
+            'id', 'product_id', 'product__name', 'product__category_id', 'product__category__name', 'model',
+            'price', 'price_rrc', 'quantity', 'shop_id', 'shop__status'))
+        # Строки товара - все его строки в опубликованных каталогах, по модели и id
+        siblings = {}
+        for row in sorted(rows, key=lambda row: (row[5], row[0])):
+            siblings.setdefault(row[1], []).append(row[0])
+        parameters = {}
+        for product_info_id, pk, name, value in (
+                ProductParameter.objects.filter(product_info_id__in=[row[0] for row in rows]).order_by('id')
+                .values_list('product_info_id', 'id', 'parameter__name', 'value')):
+            parameters.setdefault(product_info_id, []).append({'id': pk, 'parameter': name, 'value': value})
+        CatalogEntry.objects.bulk_create([
+            CatalogEntry(product_info_id=pk, product_id=product_id, shop_id=shop_id, category_id=category_id,
+                         shop_status=shop_status, data={
+                             'id': pk,
+                             'product': {'id': product_id, 'name': name, 'category': category,
+                                         'product_info': siblings[product_id]},
+                             'model': model, 'price': price, 'price_rrc': price_rrc, 'quantity': quantity,
+                             'shop': shop_id, 'product_parameters': parameters.get(pk, []),
+                         })
+            for pk, product_id, name, category_id, category, model, price, price_rrc, quantity, shop_id, shop_status
+            in rows
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogEntry',
+            fields=[
+                ('product_info', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='catalog_entry', serialize=False, to='shop.productinfo', verbose_name='Информация о товаре')),
+                ('shop_status', models.BooleanField(verbose_name='Магазин принимает заказы')),
+                ('data', models.JSONField(verbose_name='Данные для выдачи')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to='shop.category', verbose_name='Категория')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to='shop.product', verbose_name='Товар')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to='shop.shop', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Строка каталога',
+                'verbose_name_plural': 'Строки каталога',
+                'indexes': [models.Index(fields=['shop_status', 'product_info'], name='catalog_entry_status'), models.Index(fields=['category', 'shop_status', 'product_info'], name='catalog_entry_category'), models.Index(fields=['shop', 'product_info'], name='catalog_entry_shop')],
+            },
+        ),
+        migrations.RunPython(build_entries, migrations.RunPython.noop),
+    ]
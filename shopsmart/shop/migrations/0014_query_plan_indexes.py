@@ -0,0 +1,53 @@
+# Generated by Django 5.1.5 on 2026-10-18 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0013_catalog_entries'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='catalogentry',
+            name='catalog_entry_status',
+        ),
+        migrations.RemoveIndex(
+            model_name='catalogentry',
+            name='catalog_entry_category',
+        ),
+        migrations.RemoveIndex(
+            model_name='catalogentry',
+            name='catalog_entry_shop',
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(condition=models.Q(('shop_status', True)), fields=['product_info'], name='catalog_entry_active'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(condition=models.Q(('shop_status', True)), fields=['category', 'product_info'], name='catalog_entry_category'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(condition=models.Q(('shop_status', True)), fields=['shop', 'product_info'], name='catalog_entry_shop'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['name'], name='category_name'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'status'], name='order_user_status'),
+        ),
+        migrations.AddIndex(
+            model_name='parameter',
+            index=models.Index(fields=['name'], name='parameter_name'),
+        ),
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(condition=models.Q(('status', True)), fields=['name'], name='shop_active'),
+        ),
+    ]
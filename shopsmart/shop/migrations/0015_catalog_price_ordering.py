@@ -0,0 +1,62 @@
+# Generated by Django 5.1.5 on 2026-10-18 03:59
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_prices(apps, schema_editor):
+    """
+    Цена и количество существующих строк каталога из строк ProductInfo
+    """
+    CatalogEntry = apps.get_model('shop', 'CatalogEntry')
+    ProductInfo = apps.get_model('shop', 'ProductInfo')
+    product_info = ProductInfo.objects.filter(pk=OuterRef('product_info_id'))
+    CatalogEntry.objects.update(price=Subquery(product_info.values('price')[:1]),
+                                quantity=Subquery(product_info.values('quantity')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0014_query_plan_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogentry',
+            name='price',
+            field=models.PositiveIntegerField(default=0, verbose_name='Цена'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='catalogentry',
+            name='quantity',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_prices, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(condition=models.Q(('shop_status', True)), fields=['price', 'product_info'], name='catalog_price'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(condition=models.Q(('shop_status', True)), fields=['category', 'price', 'product_info'], name='catalog_category_price'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(condition=models.Q(('shop_status', True)), fields=['shop', 'price', 'product_info'], name='catalog_shop_price'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(condition=models.Q(('shop_status', True)), fields=['quantity', 'product_info'], name='catalog_quantity'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(condition=models.Q(('shop_status', True)), fields=['category', 'quantity', 'product_info'], name='catalog_category_quantity'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(condition=models.Q(('shop_status', True)), fields=['shop', 'quantity', 'product_info'], name='catalog_shop_quantity'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.5 on 2026-10-18 04:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_offers(apps, schema_editor):
+    """
+    Лучшие предложения по строкам каталога активных магазинов. Строки каталога
+    заполняет миграция 0013_catalog_entries, их цены - 0015_catalog_price_ordering
+    """
+    CatalogEntry = apps.get_model('shop', 'CatalogEntry')
+    BestOffer = apps.get_model('shop', 'BestOffer')
+    offers = {}
+    for product_id, product_info_id, shop_id, category_id, price in (
+            CatalogEntry.objects.filter(shop_status=True).order_by('product_id', 'price', 'pk')
+            .values_list('product_id', 'product_info_id', 'shop_id', 'category_id', 'price').iterator()):
+        offer = offers.get(product_id)
+        if offer is None:
+            offers[product_id] = BestOffer(product_id=product_id, category_id=category_id,
+                                           product_info_id=product_info_id, shop_id=shop_id,
+                                           min_price=price, max_price=price, offer_count=1)
+        else:
+            offer.max_price = price
+            offer.offer_count += 1
+    BestOffer.objects.bulk_create(offers.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0015_catalog_price_ordering'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BestOffer',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='best_offer', serialize=False, to='shop.product', verbose_name='Товар')),
+                ('min_price', models.PositiveIntegerField(verbose_name='Лучшая цена')),
+                ('max_price', models.PositiveIntegerField(verbose_name='Самая высокая цена')),
+                ('offer_count', models.PositiveIntegerField(verbose_name='Количество предложений')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_offers', to='shop.category', verbose_name='Категория')),
+                ('product_info', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.productinfo', verbose_name='Лучшее предложение')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_offers', to='shop.shop', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Лучшее предложение',
+                'verbose_name_plural': 'Лучшие предложения',
+                'indexes': [models.Index(fields=['category', 'product'], name='best_offer_category'), models.Index(fields=['min_price', 'product'], name='best_offer_price'), models.Index(fields=['category', 'min_price', 'product'], name='best_offer_category_price')],
+            },
+        ),
+        migrations.RunPython(build_offers, migrations.RunPython.noop),
+    ]
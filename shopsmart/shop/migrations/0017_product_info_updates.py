@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-18 04:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0016_best_offers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductInfoUpdate',
+            fields=[
+                ('product_info', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pending_update', serialize=False, to='shop.productinfo', verbose_name='Информация о товаре')),
+                ('generation', models.PositiveIntegerField(verbose_name='Поколение каталога')),
+                ('model', models.CharField(max_length=200, verbose_name='Модель')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Количество')),
+                ('price', models.PositiveIntegerField(verbose_name='Цена')),
+                ('price_rrc', models.PositiveIntegerField(verbose_name='Розничная цена')),
+                ('parameters', models.JSONField(blank=True, default=list, verbose_name='Параметры')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.shop', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Изменение информации о товаре',
+                'verbose_name_plural': 'Изменения информации о товарах',
+                'indexes': [models.Index(fields=['shop', 'generation'], name='product_info_update_shop')],
+            },
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.db import models
 from easy_thumbnails.signals import saved_file
@@ -25,6 +26,13 @@ USER_TYPE_CHOICES = (
     ('shop', 'Магазин'),
 )
 
+IMPORT_STATUS_CHOICES = (
+    ('queued', 'В очереди'),
+    ('running', 'Выполняется'),
+    ('done', 'Завершен'),
+    ('failed', 'Ошибка'),
+)
+
 saved_file.connect(generate_aliases_global)
 
 @receiver(saved_file)
@@ -119,17 +127,52 @@ class Shop(models.Model):
     thumbnail = ThumbnailerImageField(upload_to='shops/thumbnails', blank=True)
     url = models.URLField(verbose_name='Ссылка на магазин')
     status = models.BooleanField(default=True, verbose_name=_('Статус получения заказов'))
+    user = models.OneToOneField(User, on_delete=models.SET_NULL, verbose_name='Пользователь', related_name='shop',
+                                blank=True, null=True)
+    catalog_generation = models.PositiveIntegerField(verbose_name='Опубликованное поколение каталога', default=0)
 
     class Meta:
         verbose_name = 'Магазин'
         verbose_name_plural = 'Магазины'
         ordering = ['name']
+        indexes = [models.Index(fields=['name'], condition=models.Q(status=True), name='shop_active')]
 
 
     def __str__(self):
         return self.name
 
 
+class ShopFeed(models.Model):
+    """
+    Прайс-лист магазина и состояние его последней загрузки
+    """
+    objects = models.manager.Manager()
+    shop = models.OneToOneField(Shop, on_delete=models.CASCADE, verbose_name='Магазин', related_name='feed')
+    url = models.URLField(verbose_name='Ссылка на прайс-лист')
+    etag = models.CharField(max_length=200, verbose_name='ETag', blank=True)
+    last_modified = models.CharField(max_length=100, verbose_name='Last-Modified', blank=True)
+    content_hash = models.CharField(max_length=64, verbose_name='Хэш содержимого', blank=True)
+    checked_at = models.DateTimeField(verbose_name='Дата проверки', blank=True, null=True)
+    updated_at = models.DateTimeField(verbose_name='Дата изменения', blank=True, null=True)
+    next_refresh_at = models.DateTimeField(verbose_name='Дата следующего обновления', blank=True, null=True)
+    last_duration = models.FloatField(verbose_name='Длительность последнего обновления (с)', blank=True, null=True)
+    last_lag = models.FloatField(verbose_name='Задержка последнего обновления (с)', blank=True, null=True)
+    # Контрольная точка незавершенного импорта: хэш прайс-листа, записываемое поколение каталога,
+    # количество строк в зафиксированных пакетах и счетчики изменений по ним
+    checkpoint_hash = models.CharField(max_length=64, verbose_name='Хэш импортируемого прайс-листа', blank=True)
+    checkpoint_generation = models.PositiveIntegerField(verbose_name='Импортируемое поколение', default=0)
+    checkpoint_rows = models.PositiveIntegerField(verbose_name='Зафиксировано строк', default=0)
+    checkpoint_changes = models.JSONField(verbose_name='Изменения в зафиксированных строках', default=dict,
+                                          blank=True)
+
+    class Meta:
+        verbose_name = 'Прайс-лист магазина'
+        verbose_name_plural = 'Прайс-листы магазинов'
+
+    def __str__(self):
+        return self.url
+
+
 class Category(models.Model):
     objects = models.manager.Manager()
     name = models.CharField(max_length=200, verbose_name='Категория')
@@ -139,6 +182,7 @@ class Category(models.Model):
         verbose_name = 'Категория'
         verbose_name_plural = 'Категории'
         ordering = ('name',)
+        indexes = [models.Index(fields=['name'], name='category_name')]
 
     def __str__(self):
         return self.name
@@ -161,8 +205,24 @@ class Product(models.Model):
 
 
 
+class ProductInfoQuerySet(models.QuerySet):
+
+    def visible_in(self, generation):
+        """
+        Строки, входящие в поколение каталога generation
+        """
+        return self.filter(models.Q(generation__lte=generation),
+                           models.Q(retired_generation__isnull=True) | models.Q(retired_generation__gt=generation))
+
+    def live(self):
+        """
+        Строки опубликованного поколения каталога своего магазина
+        """
+        return self.visible_in(models.F('shop__catalog_generation'))
+
+
 class ProductInfo(models.Model):
-    objects = models.manager.Manager()
+    objects = ProductInfoQuerySet.as_manager()
     model = models.CharField(max_length=200, verbose_name='Модель', blank=False, null=False)
     external_id = models.PositiveIntegerField(verbose_name='Внешний идентификатор')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='Товар', related_name='product_info')
@@ -170,12 +230,15 @@ class ProductInfo(models.Model):
     quantity = models.PositiveIntegerField(verbose_name='Количество', blank=False, null=False)
     price = models.PositiveIntegerField (verbose_name='Цена', blank=False, null=False)
     price_rrc = models.PositiveIntegerField(verbose_name='Розничная цена')
+    generation = models.PositiveIntegerField(verbose_name='Поколение каталога', default=0)
+    retired_generation = models.PositiveIntegerField(verbose_name='Скрыто с поколения', blank=True, null=True)
 
     class Meta:
         verbose_name = 'Информация о товаре'
         verbose_name_plural = 'Информация о товарах'
         ordering = ('model',)
-        constraints = [models.UniqueConstraint(fields=['product', 'external_id','shop'], name='unique_product_info')]
+        constraints = [models.UniqueConstraint(fields=['product', 'external_id', 'shop', 'generation'],
+                                               name='unique_product_info')]
 
 
 
@@ -187,6 +250,7 @@ class Parameter(models.Model):
         verbose_name = 'Параметр'
         verbose_name_plural = 'Параметры'
         ordering = ('name',)
+        indexes = [models.Index(fields=['name'], name='parameter_name')]
 
     def __str__(self):
         return self.name
@@ -206,6 +270,121 @@ class ProductParameter(models.Model):
         constraints = [models.UniqueConstraint(fields=['product_info', 'parameter'], name='unique_product_parameter')]
 
 
+class ProductInfoUpdate(models.Model):
+    """
+    Новые значения опубликованной строки ProductInfo, записанные импортом в поколение generation.
+    Переносятся в строку при публикации поколения (см. catalog), id строки не меняется.
+    parameters - пары (id параметра, значение)
+    """
+    product_info = models.OneToOneField(ProductInfo, on_delete=models.CASCADE, primary_key=True,
+                                        verbose_name='Информация о товаре', related_name='pending_update')
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, verbose_name='Магазин', related_name='+')
+    generation = models.PositiveIntegerField(verbose_name='Поколение каталога')
+    model = models.CharField(max_length=200, verbose_name='Модель')
+    quantity = models.PositiveIntegerField(verbose_name='Количество')
+    price = models.PositiveIntegerField(verbose_name='Цена')
+    price_rrc = models.PositiveIntegerField(verbose_name='Розничная цена')
+    parameters = models.JSONField(verbose_name='Параметры', default=list, blank=True)
+
+    class Meta:
+        verbose_name = 'Изменение информации о товаре'
+        verbose_name_plural = 'Изменения информации о товарах'
+        indexes = [models.Index(fields=['shop', 'generation'], name='product_info_update_shop')]
+
+
+class ParameterFacet(models.Model):
+    """
+    Количество товаров опубликованного каталога магазина в категории с данным значением параметра.
+    Обновляется при публикации поколения каталога (см. facets)
+    """
+    objects = models.manager.Manager()
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, verbose_name='Магазин', related_name='facets')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name='Категория',
+                                 related_name='facets')
+    parameter = models.ForeignKey(Parameter, on_delete=models.CASCADE, verbose_name='Параметр',
+                                  related_name='facets')
+    value = models.CharField(max_length=200, verbose_name='Значение')
+    count = models.PositiveIntegerField(verbose_name='Количество товаров', default=0)
+
+    class Meta:
+        verbose_name = 'Значение фильтра'
+        verbose_name_plural = 'Значения фильтров'
+        constraints = [models.UniqueConstraint(fields=['shop', 'category', 'parameter', 'value'],
+                                               name='unique_parameter_facet')]
+
+
+class CatalogEntry(models.Model):
+    """
+    Строка опубликованного каталога в готовом для выдачи виде (см. readmodel).
+    data - ответ ProductInfoSerializer для строки ProductInfo, цена и количество
+    копируются из нее для фильтров и сортировки.
+    """
+    product_info = models.OneToOneField(ProductInfo, on_delete=models.CASCADE, primary_key=True,
+                                        verbose_name='Информация о товаре', related_name='catalog_entry')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='Товар',
+                                related_name='catalog_entries')
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, verbose_name='Магазин', related_name='catalog_entries')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name='Категория',
+                                 related_name='catalog_entries')
+    shop_status = models.BooleanField(verbose_name='Магазин принимает заказы')
+    price = models.PositiveIntegerField(verbose_name='Цена')
+    quantity = models.PositiveIntegerField(verbose_name='Количество')
+    data = models.JSONField(verbose_name='Данные для выдачи')
+
+    class Meta:
+        verbose_name = 'Строка каталога'
+        verbose_name_plural = 'Строки каталога'
+        # Выдача читает только строки магазинов, принимающих заказы, в порядке первичного ключа
+        # (курсор и страницы): частичные индексы покрывают фильтр и сортировку без сортировки в памяти
+        indexes = [
+            models.Index(fields=['product_info'], condition=models.Q(shop_status=True), name='catalog_entry_active'),
+            models.Index(fields=['category', 'product_info'], condition=models.Q(shop_status=True),
+                         name='catalog_entry_category'),
+            models.Index(fields=['shop', 'product_info'], condition=models.Q(shop_status=True),
+                         name='catalog_entry_shop'),
+            # Сортировки по цене и количеству (?ordering=) с теми же фильтрами
+            models.Index(fields=['price', 'product_info'], condition=models.Q(shop_status=True),
+                         name='catalog_price'),
+            models.Index(fields=['category', 'price', 'product_info'], condition=models.Q(shop_status=True),
+                         name='catalog_category_price'),
+            models.Index(fields=['shop', 'price', 'product_info'], condition=models.Q(shop_status=True),
+                         name='catalog_shop_price'),
+            models.Index(fields=['quantity', 'product_info'], condition=models.Q(shop_status=True),
+                         name='catalog_quantity'),
+            models.Index(fields=['category', 'quantity', 'product_info'], condition=models.Q(shop_status=True),
+                         name='catalog_category_quantity'),
+            models.Index(fields=['shop', 'quantity', 'product_info'], condition=models.Q(shop_status=True),
+                         name='catalog_shop_quantity'),
+        ]
+
+
+class BestOffer(models.Model):
+    """
+    Лучшее предложение товара среди магазинов, принимающих заказы (см. readmodel):
+    самая низкая цена и строка ProductInfo с ней, самая высокая цена и количество предложений.
+    Товары без предложений в активных магазинах сюда не попадают.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, verbose_name='Товар',
+                                   related_name='best_offer')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name='Категория',
+                                 related_name='best_offers')
+    product_info = models.ForeignKey(ProductInfo, on_delete=models.CASCADE, verbose_name='Лучшее предложение',
+                                     related_name='+')
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, verbose_name='Магазин', related_name='best_offers')
+    min_price = models.PositiveIntegerField(verbose_name='Лучшая цена')
+    max_price = models.PositiveIntegerField(verbose_name='Самая высокая цена')
+    offer_count = models.PositiveIntegerField(verbose_name='Количество предложений')
+
+    class Meta:
+        verbose_name = 'Лучшее предложение'
+        verbose_name_plural = 'Лучшие предложения'
+        indexes = [
+            models.Index(fields=['category', 'product'], name='best_offer_category'),
+            models.Index(fields=['min_price', 'product'], name='best_offer_price'),
+            models.Index(fields=['category', 'min_price', 'product'], name='best_offer_category_price'),
+        ]
+
+
 class UserInfo(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Пользователь', related_name='user_info',
                              blank=True, null=True)
@@ -237,6 +416,8 @@ class Order(models.Model):
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ['-created_at']
+        # Корзина - заказ пользователя со статусом basket
+        indexes = [models.Index(fields=['user', 'status'], name='order_user_status')]
 
 
     def __str__(self):
@@ -256,6 +437,49 @@ class OrderInfo(models.Model):
         constraints = [models.UniqueConstraint(fields=['order_id', 'product_info'], name='unique_order_info')]
 
 
+class ImportJob(models.Model):
+    """
+    Задача импорта прайс-листа поставщика
+    """
+    objects = models.manager.Manager()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Пользователь', related_name='import_jobs')
+    shop = models.ForeignKey(Shop, on_delete=models.SET_NULL, verbose_name='Магазин', related_name='import_jobs',
+                             blank=True, null=True)
+    url = models.URLField(verbose_name='Ссылка на прайс-лист')
+    status = models.CharField(choices=IMPORT_STATUS_CHOICES, verbose_name='Статус импорта', max_length=10,
+                              default='queued')
+    rows_processed = models.PositiveIntegerField(verbose_name='Обработано строк', default=0)
+    resumed_from = models.PositiveIntegerField(verbose_name='Продолжен со строки', default=0)
+    skipped = models.BooleanField(verbose_name='Прайс-лист не изменился', default=False)
+    rows_per_second = models.FloatField(verbose_name='Строк в секунду', blank=True, null=True)
+    rows_created = models.PositiveIntegerField(verbose_name='Добавлено строк', default=0)
+    rows_updated = models.PositiveIntegerField(verbose_name='Изменено строк', default=0)
+    rows_deleted = models.PositiveIntegerField(verbose_name='Удалено строк', default=0)
+    rows_unchanged = models.PositiveIntegerField(verbose_name='Строк без изменений', default=0)
+    errors = models.JSONField(verbose_name='Ошибки', default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    due_at = models.DateTimeField(verbose_name='Плановая дата обновления', blank=True, null=True)
+    started_at = models.DateTimeField(verbose_name='Дата начала', blank=True, null=True)
+    finished_at = models.DateTimeField(verbose_name='Дата завершения', blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Задача импорта'
+        verbose_name_plural = 'Задачи импорта'
+        ordering = ('-created_at',)
+
+    def __str__(self):
+        return f'Импорт {self.url} ({self.status})'
+
+    @property
+    def duration(self):
+        """
+        Длительность импорта в секундах
+        """
+        if not self.started_at:
+            return None
+        return ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+
+
 class EmailToken(models.Model):
     objects = models.manager.Manager()
 
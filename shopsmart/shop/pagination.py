@@ -0,0 +1,158 @@
+"""
+Постраничный вывод по ключу (keyset pagination).
+
+Страница выбирается условием по ключу сортировки последней строки предыдущей
+страницы, а не смещением OFFSET, поэтому стоимость запроса не зависит от номера
+страницы. Ключ сортировки заканчивается уникальным полем id, курсоры непрозрачны
+для клиента (base64 от JSON). Общее количество строк считается только по запросу
+?count=true.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from ujson import dumps, loads
+
+
+class KeysetPagination(BasePagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering = ('id',)
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request, model):
+        """
+        Курсор: позиция (значения ключа сортировки) и направление обхода.
+        Значения позиции приводятся к типам полей сортировки модели model, так что
+        подделанный курсор отклоняется до запроса к базе.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = loads(urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (Base64Error, UnicodeError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [self.ordering_field(model, field).to_python(value)
+                        for field, value in zip(self.ordering, position)]
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def ordering_field(model, field):
+        name = field.lstrip('-')
+        return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+    def encode_cursor(self, position, reverse):
+        encoded = urlsafe_b64encode(dumps({'p': position, 'r': int(reverse)}).encode()).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def position_filter(self, position, reverse):
+        """
+        Условие "строка после позиции" в порядке сортировки:
+        (a > x) OR (a = x AND b > y) OR ...
+        Для составного ключа добавляется нестрогая граница a >= x, по которой база
+        начинает чтение индекса (a, b, ...) с позиции, а не с начала.
+        """
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            step = Q(**{f'{name}__{"lt" if descending else "gt"}': position[index]})
+            for previous, value in zip(self.ordering[:index], position):
+                step &= Q(**{previous.lstrip('-'): value})
+            condition |= step
+        if len(self.ordering) > 1:
+            first = self.ordering[0]
+            descending = first.startswith('-') != reverse
+            condition &= Q(**{f'{first.lstrip("-")}__{"lte" if descending else "gte"}': position[0]})
+        return condition
+
+    def get_position(self, instance):
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+        self.position = position
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.count = queryset.count()
+
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+        else:
+            ordering = list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position, reverse))
+
+        # Лишняя строка показывает, есть ли страница дальше в направлении обхода
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = results
+        return results
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        # На пустой странице продолжаем с позиции курсора
+        position = self.get_position(self.page[-1]) if self.page else self.position
+        return self.encode_cursor(position, False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self.get_position(self.page[0]) if self.page else self.position
+        return self.encode_cursor(position, True)
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            response['count'] = self.count
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer', 'description': 'Только при ?count=true'},
+                'results': schema,
+            },
+        }
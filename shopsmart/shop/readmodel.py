@@ -0,0 +1,127 @@
+"""
+Денормализованная модель чтения каталога.
+
+Для каждой строки опубликованного каталога в CatalogEntry хранится готовый ответ
+ProductInfoSerializer (строится из .values(), см. fast_serializers) и поля, по которым
+фильтруется и сортируется выдача: категория, магазин и его статус, цена и количество. Страница каталога читается одним
+запросом по индексу, без соединений и сериализации.
+
+Ответ строки зависит от товара (название, категория, id всех его строк ProductInfo),
+поэтому пересобираются сразу все строки товара: записи удаляются и создаются заново
+по строкам опубликованных каталогов. Пересборку вызывают публикация поколения и сборка
+мусора (см. catalog), запись категорий при импорте и изменения в админке (см. admin).
+Публикация обновляет поисковый индекс сама, остальные пересборки переиндексируют строки
+затронутых товаров (reindex=True), чтобы поиск находил новые названия категорий и параметров.
+Статус магазина переносится в строки при сохранении магазина (сигнал post_save, см. signals);
+после QuerySet.update(status=...) нужно вызвать refresh_shops явно.
+Полностью модель чтения перестраивается командой rebuild_catalog.
+Пересборка сбрасывает кэш ответов затронутых магазинов и категорий (см. catalog_cache).
+
+По строкам каталога активных магазинов пересчитываются и лучшие предложения товаров
+(BestOffer): самая низкая и самая высокая цена и количество предложений.
+"""
+from django.db import transaction
+
+from .models import BestOffer, CatalogEntry, Product, ProductInfo, ProductParameter, Shop
+from .search import get_backend
+from . import catalog_cache, fast_serializers
+
+REFRESH_BATCH_SIZE = 500  # Количество товаров, пересобираемых в одной транзакции
+
+
+def build_entries(rows):
+    """
+    Записи CatalogEntry для строк ProductInfo (id, товар, магазин, категория, статус магазина, цена, количество)
+    """
+    data = fast_serializers.product_infos([row[0] for row in rows])
+    return [CatalogEntry(product_info_id=pk, product_id=product_id, shop_id=shop_id, category_id=category_id,
+                         shop_status=shop_status, price=price, quantity=quantity, data=data[pk])
+            for pk, product_id, shop_id, category_id, shop_status, price, quantity in rows]
+
+
+def refresh_products(product_ids, batch_size=REFRESH_BATCH_SIZE, reindex=False):
+    """
+    Пересборка строк каталога товаров product_ids; с reindex=True - и их документов поискового индекса
+    """
+    search_backend = get_backend() if reindex else None
+    product_ids = sorted(set(product_ids) - {None})
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        rows = list(ProductInfo.objects.live().filter(product_id__in=batch).order_by('id').values_list(
+            'id', 'product_id', 'shop_id', 'product__category_id', 'shop__status', 'price', 'quantity'))
+        # Каждый пакет - отдельная транзакция: выдача не видит товар без строк каталога
+        with transaction.atomic(savepoint=False):
+            stale = CatalogEntry.objects.filter(product_id__in=batch)
+            pairs = set(stale.order_by().values_list('shop_id', 'category_id').distinct())
+            if search_backend is not None:
+                live_ids = [row[0] for row in rows]
+                # Строки, выпавшие из каталога (удаленные в админке), убираются из индекса
+                search_backend.delete(list(set(stale.values_list('product_info_id', flat=True)) - set(live_ids)))
+                search_backend.index(live_ids)
+            stale.delete()
+            entries = CatalogEntry.objects.bulk_create(build_entries(rows))
+            pairs.update((entry.shop_id, entry.category_id) for entry in entries)
+            refresh_offers(batch)
+            catalog_cache.invalidate(pairs)
+
+
+def refresh_offers(product_ids):
+    """
+    Пересчет лучших предложений товаров product_ids по строкам каталога активных магазинов
+    """
+    offers = {}
+    # Первая строка товара в порядке цены - лучшее предложение, при равной цене - более ранняя строка
+    for product_id, product_info_id, shop_id, category_id, price in (
+            CatalogEntry.objects.filter(product_id__in=product_ids, shop_status=True)
+            .order_by('product_id', 'price', 'pk')
+            .values_list('product_id', 'product_info_id', 'shop_id', 'category_id', 'price')):
+        offer = offers.get(product_id)
+        if offer is None:
+            offers[product_id] = BestOffer(product_id=product_id, category_id=category_id,
+                                           product_info_id=product_info_id, shop_id=shop_id,
+                                           min_price=price, max_price=price, offer_count=1)
+        else:
+            offer.max_price = price
+            offer.offer_count += 1
+    with transaction.atomic(savepoint=False):
+        BestOffer.objects.filter(product_id__in=product_ids).delete()
+        BestOffer.objects.bulk_create(offers.values())
+
+
+def refresh_categories(category_ids):
+    """
+    Пересборка строк каталога товаров категорий, например после переименования
+    """
+    refresh_products(Product.objects.filter(category_id__in=category_ids).values_list('id', flat=True), reindex=True)
+
+
+def refresh_parameters(parameter_ids):
+    """
+    Пересборка строк каталога товаров, у которых есть параметры parameter_ids
+    """
+    refresh_products(ProductParameter.objects.filter(parameter_id__in=parameter_ids)
+                     .order_by().values_list('product_info__product_id', flat=True).distinct(), reindex=True)
+
+
+def refresh_shops(shop_ids):
+    """
+    Перенос статуса магазинов в строки каталога
+    """
+    for shop_id, status in Shop.objects.filter(id__in=shop_ids).values_list('id', 'status'):
+        entries = CatalogEntry.objects.filter(shop_id=shop_id).exclude(shop_status=status)
+        pairs = set(entries.order_by().values_list('shop_id', 'category_id').distinct())
+        product_ids = list(entries.order_by().values_list('product_id', flat=True).distinct())
+        entries.update(shop_status=status)
+        for start in range(0, len(product_ids), REFRESH_BATCH_SIZE):
+            refresh_offers(product_ids[start:start + REFRESH_BATCH_SIZE])
+        catalog_cache.invalidate(pairs)
+
+
+def rebuild():
+    """
+    Полное перестроение модели чтения по опубликованным каталогам
+    """
+    catalog_cache.invalidate(set(CatalogEntry.objects.order_by().values_list('shop_id', 'category_id').distinct()))
+    CatalogEntry.objects.all().delete()
+    BestOffer.objects.all().delete()
+    refresh_products(ProductInfo.objects.live().order_by().values_list('product_id', flat=True).distinct())
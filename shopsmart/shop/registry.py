@@ -0,0 +1,160 @@
+"""
+Реестр названий категорий и параметров.
+
+Справочники Category и Parameter небольшие (сотни строк), поэтому они целиком
+загружаются в память процесса при первом обращении. Изменения, сделанные в
+этом процессе, попадают в реестр через сигналы (см. signals) и импорт
+прайс-листов; изменения из других процессов подхватываются при промахе
+и при перезагрузке реестра раз в REGISTRY_TTL секунд.
+
+Реестр, загруженный внутри транзакции, видит ее незафиксированные записи,
+поэтому он считается временным до фиксации: если транзакция откатилась,
+реестр загружается заново при следующем обращении вне транзакции.
+Тестовые транзакции не фиксируются, поэтому между тестами реестры
+сбрасываются явно функцией reset (см. CatalogTestCase в тестах).
+"""
+from threading import RLock
+from time import monotonic
+
+from django.db import transaction
+from .models import Category, Parameter
+
+REGISTRY_TTL = 5 * 60  # Период полной перезагрузки реестра в секундах
+
+
+class NameRegistry:
+    """
+    Соответствие id <-> название для модели с полем name
+    """
+
+    def __init__(self, model, ttl=REGISTRY_TTL):
+        self.model = model
+        self.ttl = ttl
+        self._lock = RLock()
+        self._names = None  # id -> название
+        self._ids = None  # название -> id
+        self._loaded_at = 0.0
+        self._uncommitted = False  # Загружен в транзакции, которая еще не зафиксирована
+
+    def _is_fresh(self):
+        if self._names is None or monotonic() - self._loaded_at >= self.ttl:
+            return False
+        # Вне транзакции незафиксированный реестр означает, что его транзакция откатилась
+        return not self._uncommitted or transaction.get_connection().in_atomic_block
+
+    def _ensure_loaded(self):
+        if self._is_fresh():
+            return
+        with self._lock:
+            names = dict(self.model.objects.order_by('-id').values_list('id', 'name'))
+            # При повторяющихся названиях побеждает запись с меньшим id
+            self._ids = {name: pk for pk, name in names.items()}
+            self._names = names
+            self._loaded_at = loaded_at = monotonic()
+            self._uncommitted = transaction.get_connection().in_atomic_block
+            if self._uncommitted:
+                transaction.on_commit(lambda: self._committed(loaded_at))
+
+    def _committed(self, loaded_at):
+        with self._lock:
+            if self._loaded_at == loaded_at:
+                self._uncommitted = False
+
+    def name(self, pk):
+        """
+        Название записи по id
+        """
+        if pk is None:
+            return None
+        self._ensure_loaded()
+        name = self._names.get(pk)
+        if name is None:
+            # Запись могла быть создана в другом процессе
+            name = self.model.objects.filter(id=pk).values_list('name', flat=True).first()
+            if name is not None:
+                self.remember(pk, name)
+        return name
+
+    def names(self, pks):
+        """
+        Названия записей по списку id, неизвестные id ищутся одним запросом
+        """
+        self._ensure_loaded()
+        result = {pk: self._names[pk] for pk in pks if pk in self._names}
+        missing = set(pks) - set(result) - {None}
+        if missing:
+            for pk, name in self.model.objects.filter(id__in=missing).values_list('id', 'name'):
+                result[pk] = name
+                self.remember(pk, name)
+        return result
+
+    def ids(self, names, create=False):
+        """
+        id записей по названиям. Неизвестные названия ищутся одним запросом,
+        при create=True недостающие записи создаются через bulk_create.
+        """
+        self._ensure_loaded()
+        names = set(names)
+        result = {name: self._ids[name] for name in names if name in self._ids}
+        missing = names - set(result)
+        if missing:
+            for pk, name in self.model.objects.filter(name__in=missing).order_by('-id').values_list('id', 'name'):
+                result[name] = pk
+                self.remember(pk, name)
+            if create:
+                created = self.model.objects.bulk_create([self.model(name=name) for name in missing
+                                                          if name not in result])
+                for instance in created:
+                    result[instance.name] = instance.id
+                    self.remember(instance.id, instance.name)
+        return result
+
+    def remember(self, pk, name):
+        """
+        Добавление записи в реестр после фиксации текущей транзакции
+        """
+        transaction.on_commit(lambda: self.set(pk, name))
+
+    def forget(self, pk):
+        """
+        Удаление записи из реестра после фиксации текущей транзакции
+        """
+        transaction.on_commit(lambda: self.discard(pk))
+
+    def set(self, pk, name):
+        with self._lock:
+            if self._names is None:
+                return
+            old = self._names.get(pk)
+            if old is not None and self._ids.get(old) == pk:
+                del self._ids[old]
+            self._names[pk] = name
+            if self._ids.get(name, pk) >= pk:
+                self._ids[name] = pk
+
+    def discard(self, pk):
+        with self._lock:
+            if self._names is None:
+                return
+            name = self._names.pop(pk, None)
+            if name is not None and self._ids.get(name) == pk:
+                del self._ids[name]
+
+    def clear(self):
+        with self._lock:
+            self._names = None
+            self._ids = None
+            self._uncommitted = False
+
+
+categories = NameRegistry(Category)
+parameters = NameRegistry(Parameter)
+REGISTRIES = (categories, parameters)
+
+
+def reset():
+    """
+    Сброс реестров процесса: тестовые транзакции откатываются, и id записей могут повторяться
+    """
+    for names in REGISTRIES:
+        names.clear()
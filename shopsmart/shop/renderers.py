@@ -0,0 +1,68 @@
+"""
+Быстрый JSON для API на ujson: рендерер и парсер DRF и JsonResponse для ответов
+представлений без сериализаторов.
+
+Вывод совпадает с JSONRenderer DRF: компактные разделители, UTF-8 без экранирования
+не-ASCII символов, \\u2028 и \\u2029 экранируются; типы, которых нет в JSON (даты,
+Decimal, UUID, ленивые строки), преобразуются кодировщиком DRF.
+Скорость сравнивается со стандартным json бенчмарком benchmarks.renderers.
+"""
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils.encoders import JSONEncoder
+from ujson import dumps as ujson_dumps, loads as ujson_loads
+
+# Кодировщик DRF вызывается только для значений, которые ujson не умеет выводить сам
+_encoder = JSONEncoder()
+
+
+def dumps(data, indent=0):
+    """
+    Текст JSON для data в формате JSONRenderer
+    """
+    text = ujson_dumps(data, ensure_ascii=False, escape_forward_slashes=False, indent=indent,
+                       default=_encoder.default)
+    # Как в JSONRenderer: разделители строк JavaScript недопустимы в строковых литералах
+    if '\u2028' in text or '\u2029' in text:
+        text = text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+    return text
+
+
+class UJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer на ujson
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        return dumps(data, indent or 0).encode()
+
+
+class UJSONParser(JSONParser):
+    """
+    JSONParser на ujson
+    """
+    renderer_class = UJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            return ujson_loads(stream.read().decode(encoding))
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class JsonResponse(HttpResponse):
+    """
+    Ответ JSON на ujson, замена django.http.JsonResponse в представлениях
+    """
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data).encode(), **kwargs)
@@ -0,0 +1,64 @@
+"""
+Плановое обновление прайс-листов всех магазинов.
+
+Задача refresh_shop_feeds запускается Celery beat и ставит в очередь импорт
+прайс-листов, срок обновления которых наступил. Одновременно выполняется
+не больше FEED_REFRESH_CONCURRENCY импортов, у каждого магазина - не больше
+одного. Магазины обслуживаются в порядке наступления срока, а медленные
+прайс-листы могут занимать не больше половины слотов, чтобы крупный
+поставщик не задерживал обновление мелких.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ImportJob, ShopFeed
+from .tasks import import_price_list
+
+
+def in_flight_jobs(now):
+    """
+    Задачи импорта в очереди или в работе.
+    Задачи старше FEED_JOB_TIMEOUT считаются потерянными (например, упал воркер).
+    """
+    return ImportJob.objects.filter(status__in=('queued', 'running'),
+                                    created_at__gte=now - timedelta(seconds=settings.FEED_JOB_TIMEOUT))
+
+
+def refresh_shop_feeds(now=None):
+    """
+    Постановка в очередь импорта прайс-листов, срок обновления которых наступил
+    """
+    now = now or timezone.now()
+    in_flight = in_flight_jobs(now)
+    slots = settings.FEED_REFRESH_CONCURRENCY - in_flight.count()
+    if slots <= 0:
+        return []
+
+    slow_slots = max(1, settings.FEED_REFRESH_CONCURRENCY // 2) - in_flight.filter(
+        shop__feed__last_duration__gt=settings.FEED_REFRESH_SLOW_SECONDS).count()
+
+    feeds = (ShopFeed.objects.filter(shop__status=True, shop__user__isnull=False)
+             .filter(Q(next_refresh_at__isnull=True) | Q(next_refresh_at__lte=now))
+             .exclude(shop_id__in=in_flight.filter(shop__isnull=False).values('shop_id'))
+             .select_related('shop')
+             .order_by(F('next_refresh_at').asc(nulls_first=True), 'id'))
+
+    queued = []
+    for feed in feeds.iterator():
+        if len(queued) == slots:
+            break
+        if feed.last_duration and feed.last_duration > settings.FEED_REFRESH_SLOW_SECONDS:
+            if slow_slots <= 0:
+                continue
+            slow_slots -= 1
+
+        job = ImportJob.objects.create(user_id=feed.shop.user_id, shop_id=feed.shop_id, url=feed.url,
+                                       due_at=feed.next_refresh_at or now)
+        feed.next_refresh_at = now + timedelta(seconds=settings.FEED_REFRESH_INTERVAL)
+        feed.save(update_fields=['next_refresh_at'])
+        import_price_list.delay(job.id)
+        queued.append(job)
+    return queued
@@ -0,0 +1,213 @@
+"""
+Полнотекстовый поиск по каталогу.
+
+В индексе хранятся только строки опубликованных каталогов магазинов: при публикации
+поколения (см. catalog.publish) строки, скрытые в нем, удаляются из индекса, а новые
+и изменившиеся добавляются. После переименования категорий и параметров и правок в админке
+строки затронутых товаров переиндексирует пересборка модели чтения (readmodel.refresh_products).
+Документ строки состоит из названия товара, модели, названия категории и значений параметров,
+название весит при ранжировании больше остальных полей.
+
+Реализация индекса зависит от СУБД и задается настройкой SEARCH_BACKEND (путь к классу),
+по умолчанию выбирается по СУБД (таблицы индекса создает миграция 0012_search_index):
+
+- SqliteSearchBackend - виртуальная таблица FTS5; слова приводятся к основе стеммером
+  Snowball до записи в индекс и в запросе, поиск идет по префиксам основ;
+- PostgresSearchBackend - таблица с tsvector и GIN индексом, конфигурация russian.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import ProductInfo, ProductParameter
+from .stemmer import stem
+from . import registry
+
+SEARCH_BATCH_SIZE = 1000  # Количество документов, записываемых в индекс одним запросом
+WORD = re.compile(r'\w+')
+
+
+def words(text):
+    return WORD.findall(str(text).lower().replace('ё', 'е'))
+
+
+class SearchBackend:
+    """
+    Поисковый индекс каталога
+    """
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def delete_shop(self, shop_id):
+        raise NotImplementedError
+
+    def insert(self, documents):
+        raise NotImplementedError
+
+    def search(self, query, limit, category_id=None, shop_id=None):
+        """
+        id строк ProductInfo активных магазинов, найденных по запросу, в порядке убывания релевантности
+        """
+        raise NotImplementedError
+
+    def documents(self, ids):
+        """
+        Документы индекса для строк ProductInfo: (id, магазин, категория, название, модель,
+        название категории, параметры)
+        """
+        rows = list(ProductInfo.objects.filter(id__in=ids).values_list(
+            'id', 'shop_id', 'product__category_id', 'product__name', 'model'))
+        parameter_rows = list(ProductParameter.objects.filter(product_info_id__in=ids).values_list(
+            'product_info_id', 'parameter_id', 'value'))
+        parameter_names = registry.parameters.names({parameter_id for _, parameter_id, _ in parameter_rows})
+        category_names = registry.categories.names({row[2] for row in rows})
+
+        parameters = {}
+        for product_info_id, parameter_id, value in parameter_rows:
+            parameters.setdefault(product_info_id, []).append(f'{parameter_names.get(parameter_id)} {value}')
+        for product_info_id, shop_id, category_id, name, model in rows:
+            yield (product_info_id, shop_id, category_id, name, model or '', category_names.get(category_id, ''),
+                   ' '.join(parameters.get(product_info_id, ())))
+
+    def index(self, ids):
+        ids = list(ids)
+        for start in range(0, len(ids), SEARCH_BATCH_SIZE):
+            self.insert(list(self.documents(ids[start:start + SEARCH_BATCH_SIZE])))
+
+    def update(self, shop_id, generation):
+        """
+        Применение изменений поколения generation каталога магазина к индексу
+        """
+        self.delete(list(ProductInfo.objects.filter(shop_id=shop_id, retired_generation=generation)
+                         .values_list('id', flat=True)))
+        # Изменившиеся строки индексируются после переноса новых значений, пока изменения не удалены
+        self.index(ProductInfo.objects.filter(Q(generation=generation) | Q(pending_update__generation=generation),
+                                              shop_id=shop_id).values_list('id', flat=True))
+
+    def rebuild(self, shop_id, generation):
+        """
+        Полное перестроение индекса магазина по опубликованному поколению
+        """
+        self.delete_shop(shop_id)
+        self.index(ProductInfo.objects.filter(shop_id=shop_id).visible_in(generation).values_list('id', flat=True))
+
+
+class SqliteSearchBackend(SearchBackend):
+    """
+    Индекс на виртуальной таблице FTS5 shop_search, rowid - id строки ProductInfo
+    """
+    table = 'shop_search'
+    weights = (10.0, 5.0, 2.0, 1.0)  # Веса полей name, model, category, parameters в bm25
+
+    @staticmethod
+    def stemmed(text):
+        return ' '.join(stem(word) for word in words(text))
+
+    def delete(self, ids):
+        with connection.cursor() as cursor:
+            for start in range(0, len(ids), SEARCH_BATCH_SIZE):
+                batch = ids[start:start + SEARCH_BATCH_SIZE]
+                cursor.execute(f'DELETE FROM {self.table} WHERE rowid IN ({", ".join(["%s"] * len(batch))})', batch)
+
+    def delete_shop(self, shop_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE shop_id = %s', [shop_id])
+
+    def insert(self, documents):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {self.table} (rowid, name, model, category, parameters, shop_id, category_id) '
+                f'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                [(product_info_id, self.stemmed(name), ' '.join(words(model)), self.stemmed(category),
+                  self.stemmed(parameters), shop_id, category_id)
+                 for product_info_id, shop_id, category_id, name, model, category, parameters in documents])
+
+    def search(self, query, limit, category_id=None, shop_id=None):
+        # Каждое слово ищется по префиксу основы, слова объединяются через И
+        terms = ' '.join(f'"{stem(word)}"*' for word in words(query))
+        if not terms:
+            return []
+        sql = [f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s',
+               'AND shop_id IN (SELECT id FROM shop_shop WHERE status)']
+        params = [terms]
+        if category_id:
+            sql.append('AND category_id = %s')
+            params.append(int(category_id))
+        if shop_id:
+            sql.append('AND shop_id = %s')
+            params.append(int(shop_id))
+        sql.append(f'ORDER BY bm25({self.table}, {", ".join(map(str, self.weights))}) LIMIT %s')
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(' '.join(sql), params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Индекс на таблице shop_search с колонкой tsvector и GIN индексом.
+    Основы слов выделяет конфигурация полнотекстового поиска russian.
+    """
+    table = 'shop_search'
+    config = 'russian'
+
+    def delete(self, ids):
+        if ids:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.table} WHERE product_info_id = ANY(%s)', [ids])
+
+    def delete_shop(self, shop_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE shop_id = %s', [shop_id])
+
+    def insert(self, documents):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (product_info_id, shop_id, category_id, document) VALUES (%s, %s, %s, '
+                f"setweight(to_tsvector('{self.config}', %s), 'A') || "
+                f"setweight(to_tsvector('simple', %s), 'B') || "
+                f"setweight(to_tsvector('{self.config}', %s), 'C') || "
+                f"setweight(to_tsvector('{self.config}', %s), 'D')) "
+                f'ON CONFLICT (product_info_id) DO UPDATE SET shop_id = EXCLUDED.shop_id, '
+                f'category_id = EXCLUDED.category_id, document = EXCLUDED.document',
+                [(product_info_id, shop_id, category_id, name, model, category, parameters)
+                 for product_info_id, shop_id, category_id, name, model, category, parameters in documents])
+
+    def search(self, query, limit, category_id=None, shop_id=None):
+        terms = ' & '.join(f'{word}:*' for word in words(query))
+        if not terms:
+            return []
+        sql = [f"SELECT product_info_id FROM {self.table}, to_tsquery('{self.config}', %s) query "
+               'WHERE document @@ query AND shop_id IN (SELECT id FROM shop_shop WHERE status)']
+        params = [terms]
+        if category_id:
+            sql.append('AND category_id = %s')
+            params.append(int(category_id))
+        if shop_id:
+            sql.append('AND shop_id = %s')
+            params.append(int(shop_id))
+        sql.append('ORDER BY ts_rank(document, query) DESC, product_info_id LIMIT %s')
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(' '.join(sql), params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SqliteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    """
+    Поисковый индекс из настройки SEARCH_BACKEND или по СУБД; None, если для СУБД индекса нет
+    """
+    if getattr(settings, 'SEARCH_BACKEND', None):
+        return import_string(settings.SEARCH_BACKEND)()
+    backend = BACKENDS.get(connection.vendor)
+    return backend() if backend else None
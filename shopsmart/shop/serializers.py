@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import User, Shop, Category, Product, ProductInfo, ProductParameter, OrderInfo, Order, UserInfo,\
-         EmailToken, Parameter
+         EmailToken, Parameter, ImportJob, BestOffer
+from . import registry
 
 
 class UserInfoSerializer(serializers.ModelSerializer):
@@ -37,20 +38,39 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 class ProductSerializer(serializers.ModelSerializer):
-    category = serializers.StringRelatedField()
+    category = serializers.SerializerMethodField()
+    product_info = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = ('id', 'name', 'category', 'product_info')
 
+    def get_category(self, obj):
+        """
+        Название категории из реестра, без запроса к базе
+        """
+        return registry.categories.name(obj.category_id)
+
+    def get_product_info(self, obj) -> list[int]:
+        """
+        id строк товара в опубликованных каталогах, без скрытых строк, оставленных для заказов
+        """
+        return list(obj.product_info.live().order_by('model', 'id').values_list('id', flat=True))
+
 
 class ProductParameterSerializer(serializers.ModelSerializer):
-    parameter = serializers.StringRelatedField()
+    parameter = serializers.SerializerMethodField()
 
     class Meta:
         model = ProductParameter
         fields = ('id', 'parameter', 'value')
 
+    def get_parameter(self, obj):
+        """
+        Название параметра из реестра, без запроса к базе
+        """
+        return registry.parameters.name(obj.parameter_id)
+
 
 class ProductInfoSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
@@ -61,8 +81,31 @@ class ProductInfoSerializer(serializers.ModelSerializer):
         fields = ('id', 'product', 'model', 'price', 'price_rrc', 'quantity','shop', 'product_parameters')
 
 
-class OrderInfoSerializer(serializers.ModelSerializer):
+class BestOfferSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='product.name', read_only=True)
+    category = serializers.SerializerMethodField()
+    best_price = serializers.IntegerField(source='min_price', read_only=True)
+    price_spread = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BestOffer
+        fields = ('product', 'name', 'category', 'best_price', 'max_price', 'price_spread', 'offer_count',
+                  'product_info', 'shop')
+
+    def get_category(self, obj) -> str:
+        """
+        Название категории из реестра, без запроса к базе
+        """
+        return registry.categories.name(obj.category_id)
 
+    def get_price_spread(self, obj) -> int:
+        """
+        Разница между самой высокой и лучшей ценой
+        """
+        return obj.max_price - obj.min_price
+
+
+class OrderInfoSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderInfo
         fields = ('id', 'order', 'product_info', 'quantity')
@@ -90,3 +133,14 @@ class EmailSerializer(serializers.ModelSerializer):
         model = EmailToken
         fields = ('id', 'user', 'token', 'created_at')
         read_only_fields = ('id', 'created_at')
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    duration = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = ('id', 'url', 'status', 'skipped', 'rows_processed', 'resumed_from', 'rows_per_second',
+                  'rows_created', 'rows_updated', 'rows_deleted', 'rows_unchanged', 'errors', 'created_at',
+                  'started_at', 'finished_at', 'duration')
+        read_only_fields = fields
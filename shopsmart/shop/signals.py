@@ -2,11 +2,13 @@ from typing import Type
 from .tasks import send_email_task
 from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import Signal, receiver
 from django.template.defaultfilters import title
 
-from .models import User, EmailToken
+from .models import User, EmailToken, Category, Parameter, Shop
+from . import catalog_cache, readmodel, registry
 
 
 new_order = Signal()
@@ -33,3 +35,44 @@ def new_user_registered_signal(sender: Type[User], instance: User, created: bool
         # send an e-mail to the user
         token, _ = EmailToken.objects.get_or_create(user_id=instance.pk)
         send_email_task.delay(instance.email,'Подтверждение электронной почты', token.key)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Parameter)
+def name_saved_signal(sender, instance, **kwargs):
+    """
+    Обновление реестра названий при сохранении категории или параметра
+    """
+    names = registry.categories if sender is Category else registry.parameters
+    names.remember(instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Parameter)
+def name_deleted_signal(sender, instance, **kwargs):
+    """
+    Удаление записи из реестра названий
+    """
+    names = registry.categories if sender is Category else registry.parameters
+    names.forget(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+def list_changed_signal(sender, **kwargs):
+    """
+    Смена версии списка категорий или магазинов для ETag (см. catalog_cache)
+    """
+    catalog_cache.bump([catalog_cache.CATEGORIES_KEY if sender is Category else catalog_cache.SHOPS_KEY])
+
+
+@receiver(post_save, sender=Shop)
+def shop_saved_signal(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Перенос статуса магазина в строки каталога после фиксации транзакции (см. readmodel)
+    """
+    if created or (update_fields is not None and 'status' not in update_fields):
+        return
+    transaction.on_commit(lambda: readmodel.refresh_shops([instance.pk]))
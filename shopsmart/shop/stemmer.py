@@ -0,0 +1,119 @@
+"""
+Стеммер для русского языка (алгоритм Snowball, snowballstem.org/algorithms/russian).
+
+Используется поисковым индексом SQLite: в FTS5 нет русского стеммера, поэтому
+слова приводятся к основе до записи в индекс и в поисковом запросе.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (('в', 'вши', 'вшись'), ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+ADJECTIVE = ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'его', 'ого',
+             'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею')
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+REFLEXIVE = ('ся', 'сь')
+VERB = (('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+        ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило',
+         'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'))
+NOUN = ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям',
+        'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я')
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+CYRILLIC = re.compile('[а-я]')
+
+
+def _by_length(endings, after_a=False):
+    """
+    Окончания от длинных к коротким; after_a - окончание должно следовать за "а" или "я"
+    """
+    return sorted(((ending, after_a) for ending in endings), key=lambda item: -len(item[0]))
+
+
+PERFECTIVE_GERUND_ENDINGS = sorted(_by_length(PERFECTIVE_GERUND[0], True) + _by_length(PERFECTIVE_GERUND[1]),
+                                   key=lambda item: -len(item[0]))
+ADJECTIVE_ENDINGS = _by_length(ADJECTIVE)
+PARTICIPLE_ENDINGS = sorted(_by_length(PARTICIPLE[0], True) + _by_length(PARTICIPLE[1]),
+                            key=lambda item: -len(item[0]))
+REFLEXIVE_ENDINGS = _by_length(REFLEXIVE)
+VERB_ENDINGS = sorted(_by_length(VERB[0], True) + _by_length(VERB[1]), key=lambda item: -len(item[0]))
+NOUN_ENDINGS = _by_length(NOUN)
+SUPERLATIVE_ENDINGS = _by_length(SUPERLATIVE)
+DERIVATIONAL_ENDINGS = _by_length(DERIVATIONAL)
+
+
+def _regions(word):
+    """
+    Границы областей RV и R2 алгоритма
+    """
+    rv = len(word)
+    for index, letter in enumerate(word):
+        if letter in VOWELS:
+            rv = index + 1
+            break
+
+    def region_after(start):
+        for index in range(start + 1, len(word)):
+            if word[index - 1] in VOWELS and word[index] not in VOWELS:
+                return index + 1
+        return len(word)
+
+    return rv, region_after(region_after(0))
+
+
+def _strip(word, start, endings):
+    """
+    Удаление самого длинного окончания из endings, лежащего в области, начинающейся с start
+    """
+    for ending, after_a in endings:
+        stem_length = len(word) - len(ending)
+        if stem_length < start or not word.endswith(ending):
+            continue
+        if after_a and (stem_length - 1 < start or word[stem_length - 1] not in 'ая'):
+            continue
+        return word[:stem_length]
+    return None
+
+
+def stem(word):
+    """
+    Основа русского слова. Слова без кириллицы возвращаются без изменений.
+    """
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC.search(word):
+        return word
+    rv, r2 = _regions(word)
+
+    # Шаг 1: деепричастие, иначе возвратная частица и прилагательное, глагол или существительное
+    stripped = _strip(word, rv, PERFECTIVE_GERUND_ENDINGS)
+    if stripped is None:
+        word = _strip(word, rv, REFLEXIVE_ENDINGS) or word
+        stripped = _strip(word, rv, ADJECTIVE_ENDINGS)
+        if stripped is not None:
+            stripped = _strip(stripped, rv, PARTICIPLE_ENDINGS) or stripped
+        else:
+            stripped = _strip(word, rv, VERB_ENDINGS)
+            if stripped is None:
+                stripped = _strip(word, rv, NOUN_ENDINGS)
+    if stripped is not None:
+        word = stripped
+
+    # Шаг 2
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Шаг 3: словообразовательный суффикс в R2
+    word = _strip(word, r2, DERIVATIONAL_ENDINGS) or word
+
+    # Шаг 4: превосходная степень, двойное "н" и мягкий знак
+    stripped = _strip(word, rv, SUPERLATIVE_ENDINGS)
+    if stripped is not None:
+        word = stripped
+        if word.endswith('нн') and len(word) - 1 >= rv:
+            word = word[:-1]
+    elif word.endswith('нн') and len(word) - 2 >= rv:
+        word = word[:-1]
+    elif word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
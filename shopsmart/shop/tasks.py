@@ -18,4 +18,18 @@ def send_email_task(user_email, subject, message):
 def generate_thumbnails(model, pk, field):
     instance = model._default_manager.get(pk=pk)
     fieldfile = getattr(instance, field)
-    generate_all_aliases(fieldfile, include_global=True)
\ No newline at end of file
+    generate_all_aliases(fieldfile, include_global=True)
+
+# Задача подтверждается после выполнения: если воркер погибнет, брокер выдаст ее повторно,
+# и импорт продолжится с контрольной точки
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def import_price_list(job_id):
+    # Импортируем здесь, т.к. models импортирует этот модуль
+    from .importer import run_import_job
+    run_import_job(job_id)
+
+
+@shared_task()
+def refresh_shop_feeds():
+    from .scheduler import refresh_shop_feeds as refresh
+    return [job.id for job in refresh()]
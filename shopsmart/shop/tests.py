@@ -1,5 +1,141 @@
+import csv
+import gzip
+import re
+import tempfile
+import tracemalloc
+from base64 import urlsafe_b64encode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from threading import Thread
+from unittest import skipUnless
+from unittest.mock import patch
+
+from datetime import timedelta
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
 from rest_framework.test import force_authenticate, APIRequestFactory, APIClient, APITestCase
-from.models import User, Shop, Category, Product, ProductInfo, Parameter, Order, EmailToken, OrderInfo, UserInfo
+from ujson import dumps, loads
+from.models import User, Shop, Category, Product, ProductInfo, Parameter, Order, EmailToken, OrderInfo, UserInfo, \
+    ImportJob, ProductParameter, ProductInfoUpdate, ShopFeed, ParameterFacet, CatalogEntry, BestOffer
+from .feeds import PriceList, read_yaml, read_jsonl
+from .catalog import collect_garbage
+from .facets import rebuild_facets
+from .stemmer import stem
+from .scheduler import refresh_shop_feeds
+from .importer import run_import_job, write_price_list, lock_key, PriceListWriter
+from .renderers import JsonResponse, UJSONParser, UJSONRenderer
+from .fields import FieldSelection
+from .serializers import OrderInfoSerializer, OrderSerializer, ProductInfoSerializer
+from .views import CatalogPagination
+from . import catalog_cache, compression, export, fast_serializers, readmodel, registry
+import testdata
+
+
+PRICE_LIST = '''
+shop: Связной
+categories:
+  - id: 224
+    name: Смартфоны
+  - id: 15
+    name: Аксессуары
+goods:
+  - id: 4216292
+    category: 224
+    model: apple/iphone/xs-max
+    name: Смартфон Apple iPhone XS Max 512GB (золотистый)
+    price: 110000
+    price_rrc: 116990
+    quantity: 14
+    parameters:
+      "Диагональ (дюйм)": 6.5
+      "Разрешение (пикс)": 2688x1242
+      "Цвет": золотистый
+  - id: 4216313
+    category: 224
+    model: apple/iphone/xr
+    name: Смартфон Apple iPhone XR 256GB (красный)
+    price: 65000
+    price_rrc: 69990
+    quantity: 9
+    parameters:
+      "Диагональ (дюйм)": 6.1
+      "Цвет": красный
+'''
+
+
+class CatalogTestCase(APITestCase):
+    """
+    Тесты каталога: реестры названий сбрасываются до и после теста (см. registry.reset),
+    кэш с версиями каталога и счетчиками ограничения частоты запросов очищается
+    """
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        cache.clear()
+
+
+class FeedServer:
+    """
+    Локальный HTTP сервер, отдающий прайс-листы поставщиков для тестов
+    """
+
+    def __init__(self):
+        self.feeds = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append((self.path, dict(self.headers)))
+                body, headers = server.feeds.get(self.path, (None, {}))
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                if 'ETag' in headers and self.headers.get('If-None-Match') == headers['ETag']:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.httpd.server_port}{path}'
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def generate_yaml(count):
+    lines = ['shop: Связной', 'categories:', '  - id: 1', '    name: Смартфоны', 'goods:']
+    for i in range(count):
+        lines += [f'  - id: {i}', '    category: 1', f'    model: model-{i}', f'    name: Товар {i}',
+                  '    price: 100', '    price_rrc: 120', '    quantity: 5', '    parameters:',
+                  '      "Цвет": черный']
+    return '\n'.join(lines).encode()
 
 
 
@@ -149,3 +285,1309 @@ class ProductInfoViewTestCase(APITestCase):
         response = self.client.get('api/v1/product/info')
         self.assertEqual(response.status_code, 200)
         self.assertIn('id', response.data[0])
+
+
+class ProductInfoCursorTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        shop = Shop.objects.create(name='Связной', status=True)
+        category = Category.objects.create(name='Смартфоны')
+        product = Product.objects.create(name='Смартфон', category=category)
+        ProductInfo.objects.bulk_create([ProductInfo(product=product, shop=shop, external_id=i, model=f'model-{i}',
+                                                     price=100 + i % 10, price_rrc=120, quantity=i % 3)
+                                         for i in range(25)])
+        readmodel.refresh_products([product.id])
+        self.ids = list(ProductInfo.objects.order_by('id').values_list('id', flat=True))
+
+    def test_walk_pages(self):
+        url, pages = '/api/v1/product/info?page_size=10', []
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                data = self.client.get(url).json()
+                self.assertNotIn('count', data)
+                pages.append(data)
+                url = data['next']
+        self.assertEqual([item['id'] for page in pages for item in page['results']], self.ids)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['previous'])
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+        data = self.client.get(pages[2]['previous']).json()
+        self.assertEqual([item['id'] for item in data['results']], self.ids[10:20])
+
+    def test_count_on_request(self):
+        data = self.client.get('/api/v1/product/info?count=true').json()
+        self.assertEqual(data['count'], 25)
+        data = self.client.get('/api/v1/product/info?page=2').json()
+        self.assertEqual(data['count'], 25)
+        self.assertEqual([item['id'] for item in data['results']], self.ids[10:20])
+
+    def walk(self, url):
+        pages = []
+        while url:
+            data = self.client.get(url).json()
+            pages.append(data)
+            url = data['next']
+        return pages
+
+    def test_ordering(self):
+        # Много запросов подряд: лимит для пользователя выше, чем для анонима
+        self.client.force_authenticate(User.objects.create_user(email='buyer@example.com', password='123456'))
+        infos = {info['id']: info for info in ProductInfo.objects.values('id', 'price', 'quantity')}
+        for ordering, key in (('price', lambda pk: (infos[pk]['price'], pk)),
+                              ('-price', lambda pk: (-infos[pk]['price'], -pk)),
+                              ('quantity', lambda pk: (infos[pk]['quantity'], pk))):
+            with self.subTest(ordering):
+                pages = self.walk(f'/api/v1/product/info?page_size=7&ordering={ordering}')
+                self.assertEqual([item['id'] for page in pages for item in page['results']],
+                                 sorted(self.ids, key=key))
+                # Курсор назад возвращает предыдущую страницу в той же сортировке
+                data = self.client.get(pages[2]['previous']).json()
+                self.assertEqual(data['results'], pages[1]['results'])
+        data = self.client.get('/api/v1/product/info?ordering=-price&page=1&page_size=3').json()
+        self.assertEqual([item['id'] for item in data['results']],
+                         sorted(self.ids, key=lambda pk: (-infos[pk]['price'], -pk))[:3])
+        self.assertEqual(self.client.get('/api/v1/product/info?ordering=model').status_code, 400)
+
+    def test_price_and_stock_filters(self):
+        infos = ProductInfo.objects.order_by('id')
+        pages = self.walk('/api/v1/product/info?min_price=103&max_price=105&in_stock=true')
+        self.assertEqual([item['id'] for page in pages for item in page['results']],
+                         [info.id for info in infos if 103 <= info.price <= 105 and info.quantity])
+        data = self.client.get('/api/v1/product/info?max_price=101&count=true').json()
+        self.assertEqual(data['count'], 6)
+        self.assertEqual(self.client.get('/api/v1/product/info?min_price=дешево').status_code, 400)
+
+    def test_invalid_input(self):
+        cursor = urlsafe_b64encode(dumps({'p': ['abc'], 'r': 0}).encode()).decode()
+        for params, status in (({'cursor': cursor}, 404), ({'cursor': 'не курсор'}, 404), ({'page': 100}, 404),
+                               ({'category_id': 'abc'}, 400), ({'shop_id': '1;'}, 400), ({'min_price': 'x'}, 400)):
+            with self.subTest(params):
+                response = self.client.get('/api/v1/product/info', params)
+                self.assertEqual(response.status_code, status)
+                # Ответ с ошибкой не получает ETag, и клиент не будет перепроверять его
+                self.assertFalse(response.has_header('ETag'))
+        self.assertTrue(self.client.get('/api/v1/product/info').has_header('ETag'))
+
+
+class PartnerImportTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='shop@example.com', password='123456', type='shop')
+        self.client.force_authenticate(user=self.user)
+        self.server = FeedServer()
+        self.addCleanup(self.server.close)
+
+    @patch('shop.views.import_price_list.delay')
+    def test_update_queues_job(self, delay):
+        response = self.client.post('/api/v1/partner/update/', {'url': 'http://example.com/price.yaml'})
+        self.assertEqual(response.status_code, 202)
+        job = ImportJob.objects.get(user=self.user)
+        self.assertEqual(response.json()['Job'], job.id)
+        delay.assert_called_once_with(job.id)
+
+    def test_import_job_progress(self):
+        self.server.feeds['/price.yaml'] = (PRICE_LIST.encode(), {'Content-Type': 'application/x-yaml'})
+        job = ImportJob.objects.create(user=self.user, url=self.server.url('/price.yaml'))
+        run_import_job(job.id)
+
+        response = self.client.get(f'/api/v1/partner/import/{job.id}/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['Job']
+        self.assertEqual(data['status'], 'done')
+        self.assertEqual(data['rows_processed'], 2)
+        self.assertEqual(data['errors'], [])
+        self.assertIsNotNone(data['duration'])
+        self.assertIsNotNone(data['rows_per_second'])
+        self.assertEqual(ProductInfo.objects.filter(shop__name='Связной').count(), 2)
+        self.assertEqual(ProductParameter.objects.count(), 5)
+
+    def test_shop_ownership(self):
+        self.server.feeds['/price.yaml?token=secret'] = (PRICE_LIST.encode(), {})
+        url = self.server.url('/price.yaml?token=secret')
+        shop = Shop.objects.create(name='Связной', url='https://svyaznoy.ru')
+        job = run_import_job(ImportJob.objects.create(user=self.user, url=url).id)
+        # Магазин без владельца не переходит к поставщику, приславшему прайс-лист с его названием
+        self.assertEqual(job.status, 'failed')
+        shop.refresh_from_db()
+        self.assertIsNone(shop.user_id)
+        self.assertFalse(ProductInfo.objects.exists())
+
+        Shop.objects.filter(id=shop.id).update(user=self.user)
+        job = run_import_job(ImportJob.objects.create(user=self.user, url=url).id)
+        self.assertEqual(job.status, 'done')
+        # Ссылка на прайс-лист с токеном не попадает в публичную ссылку магазина
+        shop.refresh_from_db()
+        self.assertEqual(shop.url, 'https://svyaznoy.ru')
+        self.assertEqual(ShopFeed.objects.get(shop=shop).url, url)
+        self.assertNotIn('secret', self.client.get('/api/v1/shops/').content.decode())
+
+    def test_redelivered_job_resumes(self):
+        self.server.feeds['/price.yaml'] = (generate_yaml(5), {})
+        job = ImportJob.objects.create(user=self.user, url=self.server.url('/price.yaml'))
+        small_batches = patch.object(PriceListWriter.__init__, '__defaults__', (2, ''))
+        # Воркер погибает после второго пакета: блокировка магазина остается у задачи
+        killed = patch.object(PriceListWriter, '_report_progress',
+                              side_effect=[None, RuntimeError('Воркер остановлен')])
+        with small_batches, killed, self.assertRaises(RuntimeError):
+            run_import_job(job.id)
+        shop = Shop.objects.get(name='Связной')
+        cache.set(lock_key(shop.id), job.id)
+
+        other = run_import_job(ImportJob.objects.create(user=self.user, url=job.url).id)
+        self.assertEqual(other.status, 'failed')
+        self.assertIn('Импорт этого магазина уже выполняется', other.errors)
+
+        # Брокер выдает задачу повторно, она продолжает импорт с контрольной точки
+        with small_batches:
+            job = run_import_job(job.id)
+        self.assertEqual(job.status, 'done')
+        self.assertEqual((job.resumed_from, job.rows_processed, job.rows_created), (4, 5, 5))
+        self.assertEqual(ProductInfo.objects.live().filter(shop=shop).count(), 5)
+        self.assertIsNone(cache.get(lock_key(shop.id)))
+
+    def test_foreign_job_not_found(self):
+        other = User.objects.create_user(email='other@example.com', password='123456', type='shop')
+        job = ImportJob.objects.create(user=other, url='http://example.com/price.yaml')
+        response = self.client.get(f'/api/v1/partner/import/{job.id}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_write_queries(self):
+        goods = [{'id': i, 'category': 1, 'model': f'model-{i}', 'name': f'Товар {i}', 'price': 100 + i,
+                  'price_rrc': 120 + i, 'quantity': 5, 'parameters': {'Цвет': 'черный', 'Память': i % 4}}
+                 for i in range(500)] + [{'id': 1, 'category': 2, 'name': 'Без категории'}]
+        job = ImportJob.objects.create(user=self.user, url='http://example.com/price.yaml')
+        with CaptureQueriesContext(connection) as queries:
+            write_price_list(job, PriceList('Связной', [{'id': 1, 'name': 'Смартфоны'}], iter(goods)))
+
+        # Запросов - константа на пакет (включая пересборку строк каталога и лучших предложений), а не на строку
+        self.assertLess(len(queries), 75)
+        self.assertEqual(job.rows_processed, 501)
+        self.assertEqual(len(job.errors), 1)
+        self.assertEqual(ProductInfo.objects.count(), 500)
+        self.assertEqual(ProductParameter.objects.count(), 1000)
+        self.assertEqual(Parameter.objects.count(), 2)
+
+    def test_import_jsonl(self):
+        body = '\n'.join([
+            '{"shop": "Связной", "categories": [{"id": 224, "name": "Смартфоны"}]}',
+            '{"id": 1, "category": 224, "model": "a", "name": "Товар", "price": 10, "price_rrc": 12, "quantity": 1,'
+            ' "parameters": {"Цвет": "черный"}}',
+            '{"id": 1, "category": 224, "model": "a", "name": "Товар", "price": 10, "price_rrc": 12, "quantity": 1}',
+        ]).encode()
+        self.server.feeds['/price.jsonl'] = (body, {'Content-Type': 'application/x-ndjson'})
+        job = run_import_job(ImportJob.objects.create(user=self.user, url=self.server.url('/price.jsonl')).id)
+
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.rows_processed, 2)
+        self.assertEqual(len(job.errors), 1)
+        self.assertEqual(ProductInfo.objects.count(), 1)
+
+    def test_out_of_range_rows(self):
+        item = {'category': 1, 'model': 'a', 'name': 'Товар', 'price': 10, 'price_rrc': 12, 'quantity': 1}
+        goods = [dict(item, id=1), dict(item, id=2, quantity=-1), dict(item, id=3, price=-5),
+                 dict(item, id=-4), dict(item, id=5, model='m' * 201), dict(item, id=6, name='н' * 201),
+                 dict(item, id=7, parameters={'Цвет': 'ч' * 201})]
+        job = ImportJob.objects.create(user=self.user, url='http://example.com/price.yaml')
+        write_price_list(job, PriceList('Связной', [{'id': 1, 'name': 'Смартфоны'}], iter(goods)))
+
+        # Строки вне диапазонов полей модели - ошибки строк, а не ошибка всего пакета
+        self.assertEqual(job.rows_processed, 7)
+        self.assertEqual(len(job.errors), 6)
+        self.assertIn('quantity', job.errors[0])
+        self.assertEqual(list(ProductInfo.objects.values_list('external_id', flat=True)), [1])
+
+
+class ConditionalFetchTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='shop@example.com', password='123456', type='shop')
+        self.server = FeedServer()
+        self.addCleanup(self.server.close)
+
+    def run_job(self, path):
+        return run_import_job(ImportJob.objects.create(user=self.user, url=self.server.url(path)).id)
+
+    def test_not_modified(self):
+        self.server.feeds['/price.yaml'] = (PRICE_LIST.encode(), {'ETag': '"v1"'})
+        self.assertFalse(self.run_job('/price.yaml').skipped)
+        self.assertEqual(ShopFeed.objects.get().etag, '"v1"')
+
+        with CaptureQueriesContext(connection) as queries:
+            job = self.run_job('/price.yaml')
+        self.assertEqual(job.status, 'done')
+        self.assertTrue(job.skipped)
+        self.assertEqual(self.server.requests[-1][1]['If-None-Match'], '"v1"')
+        self.assertFalse([query for query in queries if 'shop_productinfo' in query['sql']])
+
+    def test_same_content_hash(self):
+        self.server.feeds['/price.yaml'] = (PRICE_LIST.encode(), {})
+        self.run_job('/price.yaml')
+        self.assertTrue(self.run_job('/price.yaml').skipped)
+
+        self.server.feeds['/price.yaml'] = (PRICE_LIST.replace('110000', '100000').encode(), {})
+        job = self.run_job('/price.yaml')
+        self.assertFalse(job.skipped)
+        self.assertEqual(job.rows_updated, 1)
+
+
+@override_settings(FEED_REFRESH_CONCURRENCY=4, FEED_REFRESH_SLOW_SECONDS=600, FEED_REFRESH_INTERVAL=3600)
+class FeedSchedulerTestCase(APITestCase):
+    def setUp(self):
+        self.feeds = []
+        for i in range(6):
+            user = User.objects.create_user(email=f'shop{i}@example.com', password='123456', type='shop')
+            shop = Shop.objects.create(name=f'Магазин {i}', user=user)
+            self.feeds.append(ShopFeed.objects.create(shop=shop, url=f'http://example.com/{i}.yaml',
+                                                      last_duration=3600 if i < 3 else 5))
+
+    @patch('shop.scheduler.import_price_list.delay')
+    def test_fair_refresh(self, delay):
+        now = timezone.now()
+        busy = self.feeds[3]
+        ImportJob.objects.create(user=busy.shop.user, shop=busy.shop, url=busy.url, status='running')
+
+        jobs = refresh_shop_feeds(now)
+        shops = {job.shop_id for job in jobs}
+        # Свободно 3 слота: медленным прайс-листам достается не больше половины слотов,
+        # магазин с незавершенным импортом пропускается
+        self.assertEqual(len(jobs), 3)
+        self.assertEqual(len(shops & {feed.shop_id for feed in self.feeds[:3]}), 2)
+        self.assertNotIn(busy.shop_id, shops)
+        self.assertEqual(delay.call_count, 3)
+        for job in jobs:
+            self.assertEqual(ShopFeed.objects.get(shop_id=job.shop_id).next_refresh_at, now + timedelta(hours=1))
+
+        # Пока задачи не завершены, новых не ставим
+        self.assertEqual(refresh_shop_feeds(now), [])
+
+    def test_record_duration_and_lag(self):
+        server = FeedServer()
+        self.addCleanup(server.close)
+        server.feeds['/price.yaml'] = (PRICE_LIST.encode(), {})
+        user = User.objects.create_user(email='svyaznoy@example.com', password='123456', type='shop')
+        job = ImportJob.objects.create(user=user, url=server.url('/price.yaml'),
+                                       due_at=timezone.now() - timedelta(minutes=5))
+        run_import_job(job.id)
+
+        feed = ShopFeed.objects.get(shop__name='Связной')
+        self.assertIsNotNone(feed.last_duration)
+        self.assertGreaterEqual(feed.last_lag, 300)
+
+
+class IncrementalImportTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='shop@example.com', password='123456', type='shop')
+        self.categories = [{'id': 1, 'name': 'Смартфоны'}]
+        self.goods = [{'id': i, 'category': 1, 'model': f'model-{i}', 'name': f'Товар {i}', 'price': 100,
+                       'price_rrc': 120, 'quantity': 5, 'parameters': {'Цвет': 'черный'}} for i in range(5)]
+        self.import_goods(self.goods)
+
+    def import_goods(self, goods):
+        job = ImportJob.objects.create(user=self.user, url='http://example.com/price.yaml')
+        write_price_list(job, PriceList('Связной', self.categories, iter([dict(item) for item in goods])))
+        return job
+
+    def test_only_changes_written(self):
+        kept = ProductInfo.objects.get(external_id=0)
+        ids = dict(ProductInfo.objects.values_list('external_id', 'id'))
+        buyer = User.objects.create_user(email='buyer@example.com', password='123456')
+        basket = Order.objects.create(user=buyer, status='basket',
+                                      user_info=UserInfo.objects.create(user=buyer, city='Москва', street='Тверская',
+                                                                        phone='123'))
+        OrderInfo.objects.create(order=basket, product_info=kept, quantity=1)
+
+        goods = [dict(item) for item in self.goods]
+        goods[1]['price'] = 90
+        goods[2]['parameters'] = {'Цвет': 'белый'}
+        del goods[4]
+        goods.append({'id': 5, 'category': 1, 'model': 'model-5', 'name': 'Товар 5', 'price': 100, 'price_rrc': 120,
+                      'quantity': 1})
+        job = self.import_goods(goods)
+
+        self.assertEqual((job.rows_created, job.rows_updated, job.rows_deleted, job.rows_unchanged), (1, 2, 1, 2))
+        live = ProductInfo.objects.live()
+        self.assertEqual(live.get(external_id=0).id, kept.id)
+        self.assertEqual(live.get(external_id=1).price, 90)
+        self.assertEqual(ProductParameter.objects.get(product_info__in=live, product_info__external_id=2).value,
+                         'белый')
+        self.assertFalse(live.filter(external_id=4).exists())
+        # Изменившиеся строки сохраняют id
+        self.assertEqual(live.get(external_id=1).id, ids[1])
+        self.assertEqual(live.get(external_id=2).id, ids[2])
+        self.assertFalse(ProductInfoUpdate.objects.exists())
+        response = self.client.get('/api/v1/product/info/bulk', {'ids': f'{ids[1]},{ids[2]}'})
+        self.assertEqual(response.json()['missing'], [])
+        self.assertTrue(OrderInfo.objects.filter(order=basket, product_info=kept).exists())
+
+    def test_unchanged_feed_writes_nothing(self):
+        with CaptureQueriesContext(connection) as queries:
+            job = self.import_goods(self.goods)
+        self.assertEqual(job.rows_unchanged, 5)
+        self.assertFalse([query for query in queries if query['sql'].startswith('INSERT INTO "shop_productinfo"')])
+        self.assertEqual(Shop.objects.get(name='Связной').catalog_generation, 1)
+
+
+    def test_generation_swap(self):
+        shop = Shop.objects.get(name='Связной')
+        buyer = User.objects.create_user(email='buyer@example.com', password='123456')
+        basket = Order.objects.create(user=buyer, status='basket',
+                                      user_info=UserInfo.objects.create(user=buyer, city='Москва', street='Тверская',
+                                                                        phone='123'))
+        line = OrderInfo.objects.create(order=basket, product_info=ProductInfo.objects.get(external_id=1), quantity=1)
+
+        goods = [dict(item) for item in self.goods]
+        goods[1]['price'] = 90
+        job = ImportJob.objects.create(user=self.user, url='http://example.com/price.yaml')
+        writer = PriceListWriter(job, shop)
+        writer.write_categories(self.categories)
+        seen = []
+
+        def feed():
+            for item in goods:
+                yield dict(item)
+            # Перед публикацией покупатели видят прежний каталог целиком
+            seen.extend(ProductInfo.objects.live().filter(shop=shop).values_list('price', flat=True))
+
+        writer.write_goods(feed())
+        self.assertEqual(sorted(seen), [100] * 5)
+        self.assertEqual(sorted(ProductInfo.objects.live().filter(shop=shop).values_list('price', flat=True)),
+                         [90] + [100] * 4)
+
+        line.refresh_from_db()
+        self.assertEqual(line.product_info.price, 90)
+        self.assertEqual(collect_garbage(shop.id), 0)
+        self.assertEqual(ProductInfo.objects.filter(shop=shop).count(), 5)
+
+    def test_derived_data_after_flip(self):
+        ids = dict(ProductInfo.objects.values_list('external_id', 'id'))
+        goods = [dict(item) for item in self.goods]
+        goods[1]['price'] = 90
+        goods[2]['parameters'] = {'Цвет': 'белый'}
+        # Поиск и модель чтения обновляются вне транзакции переключения: их сбой не откатывает публикацию
+        with patch('shop.catalog.get_backend', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.import_goods(goods)
+        self.assertEqual(Shop.objects.get(name='Связной').catalog_generation, 2)
+        self.assertEqual(ProductInfo.objects.get(id=ids[1]).price, 90)
+        self.assertEqual(set(ParameterFacet.objects.values_list('value', 'count')), {('черный', 4), ('белый', 1)})
+        self.assertEqual(CatalogEntry.objects.get(product_info_id=ids[1]).price, 100)
+
+        call_command('rebuild_catalog', stdout=StringIO())
+        self.assertEqual(CatalogEntry.objects.get(product_info_id=ids[1]).price, 90)
+
+    def test_resume_from_checkpoint(self):
+        shop = Shop.objects.get(name='Связной')
+        goods = [dict(item) for item in self.goods[:4]]
+        goods[1]['price'] = 90
+        goods += [{'id': i, 'category': 1, 'model': f'model-{i}', 'name': f'Товар {i}', 'price': 100,
+                   'price_rrc': 120, 'quantity': 5} for i in range(5, 11)]
+
+        def interrupted():
+            for item in goods[:7]:
+                yield dict(item)
+            raise RuntimeError('Воркер остановлен')
+
+        job = ImportJob.objects.create(user=self.user, url='http://example.com/price.yaml')
+        writer = PriceListWriter(job, shop, batch_size=3, content_hash='hash')
+        writer.write_categories(self.categories)
+        with self.assertRaises(RuntimeError):
+            writer.write_goods(interrupted())
+        self.assertEqual(ShopFeed.objects.get(shop=shop).checkpoint_rows, 6)
+        self.assertEqual(shop.catalog_generation, 1)
+
+        job = ImportJob.objects.create(user=self.user, url='http://example.com/price.yaml')
+        writer = PriceListWriter(job, shop, batch_size=3, content_hash='hash')
+        writer.write_categories(self.categories)
+        with CaptureQueriesContext(connection) as queries:
+            writer.write_goods(dict(item) for item in goods)
+
+        self.assertEqual(job.resumed_from, 6)
+        self.assertEqual(job.rows_processed, 10)
+        self.assertEqual((job.rows_created, job.rows_updated, job.rows_deleted, job.rows_unchanged), (6, 1, 1, 3))
+        # Заново записываются только строки незафиксированного пакета
+        self.assertEqual(len([query for query in queries
+                              if query['sql'].startswith('INSERT INTO "shop_productinfo"')]), 2)
+        live = ProductInfo.objects.live().filter(shop=shop)
+        self.assertEqual(sorted(live.values_list('external_id', flat=True)), [0, 1, 2, 3, 5, 6, 7, 8, 9, 10])
+        self.assertEqual(live.get(external_id=1).price, 90)
+        self.assertEqual(ProductInfo.objects.filter(shop=shop, generation=2).count(), 6)
+        self.assertEqual(ShopFeed.objects.get(shop=shop).checkpoint_rows, 0)
+
+
+class FacetTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='shop@example.com', password='123456', type='shop')
+        self.goods = [{'id': i, 'category': 1, 'model': f'model-{i}', 'name': f'Товар {i}', 'price': 100,
+                       'price_rrc': 120, 'quantity': 5,
+                       'parameters': {'Цвет': 'черный' if i % 2 else 'белый', 'Диагональ (дюйм)': 6.5}}
+                      for i in range(6)]
+        self.import_goods(self.goods)
+        Shop.objects.filter(name='Связной').update(status=True)
+
+    def import_goods(self, goods):
+        job = ImportJob.objects.create(user=self.user, url='http://example.com/price.yaml')
+        write_price_list(job, PriceList('Связной', [{'id': 1, 'name': 'Смартфоны'}],
+                                        iter([dict(item) for item in goods])))
+
+    def facets(self):
+        return sorted(ParameterFacet.objects.values_list('parameter__name', 'value', 'count'))
+
+    def test_incremental_update(self):
+        self.assertEqual(self.facets(), [('Диагональ (дюйм)', '6.5', 6), ('Цвет', 'белый', 3),
+                                         ('Цвет', 'черный', 3)])
+        goods = [dict(item) for item in self.goods[:5]]
+        goods[0]['parameters'] = {'Цвет': 'красный', 'Диагональ (дюйм)': 6.5}
+        self.import_goods(goods)
+        incremental = self.facets()
+        self.assertEqual(incremental, [('Диагональ (дюйм)', '6.5', 5), ('Цвет', 'белый', 2),
+                                       ('Цвет', 'красный', 1), ('Цвет', 'черный', 2)])
+        rebuild_facets(Shop.objects.get(name='Связной').id)
+        self.assertEqual(self.facets(), incremental)
+
+    def test_filter_and_counts(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/v1/product/info?facets=true').json()
+        self.assertFalse([query for query in queries if 'shop_productparameter' in query['sql']
+                          and 'GROUP BY' in query['sql']])
+        self.assertEqual(data['facets'][1], {'parameter': 'Цвет', 'values': [{'value': 'белый', 'count': 3},
+                                                                            {'value': 'черный', 'count': 3}]})
+
+        data = self.client.get('/api/v1/product/info',
+                               {'param': ['Цвет=черный', 'Диагональ (дюйм)=6.5'], 'facets': 'true'}).json()
+        self.assertEqual(sorted(item['product']['name'] for item in data['results']),
+                         ['Товар 1', 'Товар 3', 'Товар 5'])
+        self.assertEqual(data['facets'][1], {'parameter': 'Цвет', 'values': [{'value': 'черный', 'count': 3}]})
+
+        data = self.client.get('/api/v1/product/info', {'param': 'Вес=1'}).json()
+        self.assertEqual(data['results'], [])
+
+
+class SearchTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='shop@example.com', password='123456', type='shop')
+        self.goods = [
+            {'id': 1, 'category': 1, 'model': 'apple/iphone/xs-max', 'name': 'Смартфон Apple iPhone XS Max',
+             'parameters': {'Цвет': 'золотистый'}},
+            {'id': 2, 'category': 2, 'model': 'case-1', 'name': 'Чехол красный для смартфона',
+             'parameters': {'Цвет': 'красный'}},
+            {'id': 3, 'category': 3, 'model': 'lenovo/ideapad', 'name': 'Ноутбук Lenovo IdeaPad',
+             'parameters': {'Цвет': 'красный'}},
+        ]
+        self.import_goods(self.goods)
+        Shop.objects.filter(name='Связной').update(status=True)
+
+    def import_goods(self, goods, accessories='Аксессуары'):
+        job = ImportJob.objects.create(user=self.user, url='http://example.com/price.yaml')
+        categories = [{'id': 1, 'name': 'Смартфоны'}, {'id': 2, 'name': accessories}, {'id': 3, 'name': 'Ноутбуки'}]
+        write_price_list(job, PriceList('Связной', categories, iter(
+            [dict(item, price=100, price_rrc=120, quantity=1) for item in goods])))
+
+    def search(self, query):
+        response = self.client.get('/api/v1/product/search', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [item['product']['name'] for item in response.json()['results']]
+
+    def test_stemmer(self):
+        self.assertEqual({stem(word) for word in ('смартфоны', 'смартфона', 'смартфонов')}, {'смартфон'})
+        self.assertEqual(stem('Красные'), stem('красный'))
+
+    def test_search(self):
+        self.assertEqual(self.search('смартфоны apple'), ['Смартфон Apple iPhone XS Max'])
+        self.assertEqual(len(self.search('смартфонов')), 2)
+        self.assertEqual(self.search('ноут'), ['Ноутбук Lenovo IdeaPad'])
+        self.assertEqual(self.search('аксессуары'), ['Чехол красный для смартфона'])
+        # Совпадение в названии весит больше совпадения в параметрах
+        self.assertEqual(self.search('красные'), ['Чехол красный для смартфона', 'Ноутбук Lenovo IdeaPad'])
+
+    def test_filters(self):
+        response = self.client.get('/api/v1/product/search', {'q': 'красный', 'category_id': 2})
+        self.assertEqual([item['product']['name'] for item in response.json()['results']],
+                         ['Чехол красный для смартфона'])
+        for name in ('category_id', 'shop_id'):
+            response = self.client.get('/api/v1/product/search', {'q': 'красный', name: 'abc'})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'Status': False, 'Errors': f'{name} задается целым числом'})
+
+    def test_index_follows_imports(self):
+        goods = [dict(item) for item in self.goods[:2]]
+        goods[0]['name'] = 'Смартфон Apple iPhone XR'
+        self.import_goods(goods)
+        self.assertEqual(self.search('ноутбук'), [])
+        self.assertEqual(self.search('iphone'), ['Смартфон Apple iPhone XR'])
+        Shop.objects.filter(name='Связной').update(status=False)
+        self.assertEqual(self.search('iphone'), [])
+
+    def test_index_follows_renames(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_goods(self.goods, accessories='Бижутерия')
+        self.assertEqual(self.search('бижутерия'), ['Чехол красный для смартфона'])
+        self.assertEqual(self.search('аксессуары'), [])
+
+        request = APIRequestFactory().get('/')
+        parameter_value = ProductParameter.objects.get(product_info__product__name='Ноутбук Lenovo IdeaPad')
+        with self.captureOnCommitCallbacks(execute=True):
+            parameter_value.value = 'синий'
+            admin.site._registry[ProductParameter].save_model(request, parameter_value, None, True)
+        self.assertEqual(self.search('синий'), ['Ноутбук Lenovo IdeaPad'])
+        self.assertEqual(self.search('красный'), ['Чехол красный для смартфона'])
+
+        product = Product.objects.get(name='Чехол красный для смартфона')
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.site._registry[Product].delete_model(request, product)
+        self.assertEqual(self.search('красный'), [])
+
+
+class NameRegistryTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Смартфоны')
+        self.parameter = Parameter.objects.create(name='Цвет')
+
+    def test_serializer_uses_registry(self):
+        shop = Shop.objects.create(name='Связной')
+        product = Product.objects.create(name='Смартфон', category=self.category)
+        info = ProductInfo.objects.create(product=product, shop=shop, external_id=1, price=100, price_rrc=120,
+                                          quantity=1)
+        ProductParameter.objects.create(product_info=info, parameter=self.parameter, value='черный')
+        infos = list(ProductInfo.objects.filter(id=info.id).select_related('product')
+                     .prefetch_related('product_parameters'))
+
+        registry.categories.name(self.category.id)
+        registry.parameters.name(self.parameter.id)
+        with CaptureQueriesContext(connection) as queries:
+            data = ProductInfoSerializer(infos, many=True).data
+        self.assertEqual(data[0]['product']['category'], 'Смартфоны')
+        self.assertEqual(data[0]['product_parameters'][0]['parameter'], 'Цвет')
+        # Остается только запрос product_info из ProductSerializer
+        self.assertEqual(len(queries), 1)
+
+    def test_coherent_with_changes(self):
+        self.assertEqual(registry.parameters.ids(['Цвет']), {'Цвет': self.parameter.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.parameter.name = 'Оттенок'
+            self.parameter.save()
+        self.assertEqual(registry.parameters.name(self.parameter.id), 'Оттенок')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            created = registry.parameters.ids(['Цвет', 'Вес'], create=True)
+        self.assertEqual(Parameter.objects.get(name='Вес').id, created['Вес'])
+        with self.assertNumQueries(0):
+            self.assertEqual(registry.parameters.ids(['Вес', 'Оттенок']),
+                             {'Вес': created['Вес'], 'Оттенок': self.parameter.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertIsNone(registry.categories.name(self.category.id))
+
+    def test_reloaded_after_rollback(self):
+        with transaction.atomic():
+            weight = Parameter.objects.create(name='Вес')
+            self.assertEqual(registry.parameters.ids(['Вес']), {'Вес': weight.id})
+            transaction.set_rollback(True)
+        # Реестр загружен в откаченной транзакции: вне транзакции он загружается заново
+        with patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(registry.parameters.ids(['Вес', 'Цвет']), {'Цвет': self.parameter.id})
+
+
+class CatalogReadModelTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='shop@example.com', password='123456', type='shop')
+        self.goods = [{'id': i, 'category': 1, 'model': f'model-{i}', 'name': f'Товар {i}', 'price': 100 + i,
+                       'price_rrc': 120, 'quantity': 5, 'parameters': {'Цвет': 'черный'}} for i in range(5)]
+        self.import_goods(self.goods)
+        self.shop = Shop.objects.get(name='Связной')
+
+    def import_goods(self, goods, category='Смартфоны'):
+        job = ImportJob.objects.create(user=self.user, url='http://example.com/price.yaml')
+        with self.captureOnCommitCallbacks(execute=True):
+            write_price_list(job, PriceList('Связной', [{'id': 1, 'name': category}],
+                                            iter([dict(item) for item in goods])))
+
+    def serialized(self):
+        infos = ProductInfo.objects.live().order_by('id').select_related('product').prefetch_related(
+            'product_parameters')
+        return [dict(item) for item in ProductInfoSerializer(infos, many=True).data]
+
+    def test_entries_match_serializer(self):
+        self.assertEqual([entry.data for entry in CatalogEntry.objects.order_by('pk')], self.serialized())
+
+        goods = [dict(item) for item in self.goods[1:]]
+        goods[0]['price'] = 500
+        self.import_goods(goods, category='Телефоны')
+        entries = [entry.data for entry in CatalogEntry.objects.order_by('pk')]
+        self.assertEqual(entries, self.serialized())
+        self.assertEqual(len(entries), 4)
+        self.assertEqual({entry['product']['category'] for entry in entries}, {'Телефоны'})
+
+        CatalogEntry.objects.all().delete()
+        readmodel.rebuild()
+        self.assertEqual([entry.data for entry in CatalogEntry.objects.order_by('pk')], entries)
+
+    def test_page_is_single_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/v1/product/info', {'category_id': 1}).json()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries[0]['sql'])
+        self.assertEqual(data['results'], self.serialized())
+
+    def test_bulk_lookup(self):
+        ids = list(ProductInfo.objects.live().order_by('-id').values_list('id', flat=True))
+        expected = {item['id']: item for item in self.serialized()}
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/v1/product/info/bulk',
+                                   {'ids': f'{ids[0]},0,{ids[2]},{ids[0]},{ids[1]}'}).json()
+        self.assertEqual(len(queries), 1)
+        self.assertIn(' IN ', queries[0]['sql'])
+        self.assertEqual(data['results'], [expected[ids[0]], expected[ids[2]], expected[ids[1]]])
+        self.assertEqual(data['missing'], [0])
+
+        data = self.client.get('/api/v1/product/info/bulk', {'ids': ids[0], 'fields': 'id,price'}).json()
+        self.assertEqual(data['results'], [{'id': ids[0], 'price': expected[ids[0]]['price']}])
+        for value in ('', 'один', ','.join(map(str, range(1, 302)))):
+            self.assertEqual(self.client.get('/api/v1/product/info/bulk', {'ids': value}).status_code, 400)
+
+    def test_admin_changes(self):
+        request = APIRequestFactory().get('/')
+        product = Product.objects.get(name='Товар 0')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Смартфон'
+            admin.site._registry[Product].save_model(request, product, None, True)
+        self.assertEqual(CatalogEntry.objects.get(product=product).data['product']['name'], 'Смартфон')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop.status = False
+            admin.site._registry[Shop].save_model(request, self.shop, None, True)
+        self.assertEqual(self.client.get('/api/v1/product/info').json()['results'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.site._registry[Product].delete_model(request, product)
+        self.assertEqual(CatalogEntry.objects.count(), 4)
+
+    def test_shop_status_saved(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop.status = False
+            self.shop.save()
+        self.assertEqual(self.client.get('/api/v1/product/info').json()['results'], [])
+        self.assertFalse(BestOffer.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop.status = True
+            self.shop.save(update_fields=['status'])
+        self.assertEqual(len(self.client.get('/api/v1/product/info').json()['results']), 5)
+
+
+class BestOfferTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        # Два магазина продают одни и те же товары по разным ценам
+        for number, (shop, prices) in enumerate((('Связной', (300, 150)), ('DNS', (200, 150)), ('Эльдорадо', (250,)))):
+            user = User.objects.create_user(email=f'shop{number}@example.com', password='123456', type='shop')
+            job = ImportJob.objects.create(user=user, url='http://example.com/price.yaml')
+            goods = [{'id': index, 'category': 1, 'model': f'model-{index}', 'name': f'Товар {index}',
+                      'price': price, 'price_rrc': 400, 'quantity': 5, 'parameters': {}}
+                     for index, price in enumerate(prices)]
+            with self.captureOnCommitCallbacks(execute=True):
+                write_price_list(job, PriceList(shop, [{'id': 1, 'name': 'Смартфоны'}], iter(goods)))
+        self.first, self.second = Product.objects.order_by('name')
+
+    def offers(self, params=None):
+        response = self.client.get('/api/v1/product/offers', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_best_offer(self):
+        dns = Shop.objects.get(name='DNS')
+        offer = self.offers({'product_id': self.first.id})[0]
+        self.assertEqual(offer, {
+            'product': self.first.id, 'name': 'Товар 0', 'category': 'Смартфоны', 'best_price': 200,
+            'max_price': 300, 'price_spread': 100, 'offer_count': 3,
+            'product_info': ProductInfo.objects.get(product=self.first, shop=dns).id, 'shop': dns.id})
+        # При равной цене лучшее предложение - более ранняя строка
+        offer = self.offers({'product_id': self.second.id})[0]
+        self.assertEqual((offer['best_price'], offer['price_spread'], offer['offer_count']), (150, 0, 2))
+        self.assertEqual(offer['shop'], Shop.objects.get(name='Связной').id)
+
+        self.assertEqual([offer['product'] for offer in self.offers({'ordering': 'price'})],
+                         [self.second.id, self.first.id])
+        self.assertEqual([offer['product'] for offer in self.offers({'ordering': '-price'})],
+                         [self.first.id, self.second.id])
+        self.assertEqual(len(self.offers({'category_id': self.first.category_id})), 2)
+        self.assertEqual(self.client.get('/api/v1/product/offers', {'ordering': 'name'}).status_code, 400)
+
+    def test_invalid_cursor(self):
+        for position in (['abc'], [None], [[1]], [{'id': 1}], [1, 2]):
+            cursor = urlsafe_b64encode(dumps({'p': position, 'r': 0}).encode()).decode()
+            with self.subTest(position):
+                response = self.client.get('/api/v1/product/offers', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertFalse(response.has_header('ETag'))
+        offers = self.offers()
+        cursor = urlsafe_b64encode(dumps({'p': [str(offers[0]['product'])], 'r': 0}).encode()).decode()
+        self.assertEqual(self.offers({'cursor': cursor}), offers[1:])
+
+    def test_follows_imports_and_shop_status(self):
+        request = APIRequestFactory().get('/')
+        dns = Shop.objects.get(name='DNS')
+        with self.captureOnCommitCallbacks(execute=True):
+            dns.status = False
+            admin.site._registry[Shop].save_model(request, dns, None, True)
+        offer = BestOffer.objects.get(product=self.first)
+        self.assertEqual((offer.min_price, offer.offer_count, offer.shop), (250, 2, Shop.objects.get(name='Эльдорадо')))
+
+        user = Shop.objects.get(name='Связной').user
+        job = ImportJob.objects.create(user=user, url='http://example.com/price.yaml')
+        with self.captureOnCommitCallbacks(execute=True):
+            write_price_list(job, PriceList('Связной', [{'id': 1, 'name': 'Смартфоны'}], iter([
+                {'id': 0, 'category': 1, 'model': 'model-0', 'name': 'Товар 0', 'price': 90, 'price_rrc': 400,
+                 'quantity': 5, 'parameters': {}}])))
+        offer = BestOffer.objects.get(product=self.first)
+        self.assertEqual((offer.min_price, offer.max_price, offer.offer_count), (90, 250, 2))
+        # У второго товара не осталось предложений в активных магазинах
+        self.assertFalse(BestOffer.objects.filter(product=self.second).exists())
+
+        BestOffer.objects.all().delete()
+        readmodel.rebuild()
+        self.assertEqual(BestOffer.objects.count(), 1)
+
+
+class CatalogCacheTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.shops = {}
+        for name, category_id in (('Связной', 1), ('Евросеть', 2)):
+            self.import_goods(name, category_id, price=100)
+        # У авторизованного пользователя лимит запросов выше, чем у анонимного
+        self.client.force_authenticate(User.objects.first())
+
+    def import_goods(self, name, category_id, price):
+        user, _ = User.objects.get_or_create(email=f'{category_id}@example.com', defaults={'type': 'shop'})
+        job = ImportJob.objects.create(user=user, url='http://example.com/price.yaml')
+        goods = [{'id': i, 'category': category_id, 'model': f'model-{i}', 'name': f'Товар {category_id}-{i}',
+                  'price': price, 'price_rrc': 120, 'quantity': 5} for i in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            write_price_list(job, PriceList(name, [{'id': category_id, 'name': f'Категория {category_id}'}],
+                                            iter(goods)))
+        self.shops[name] = Shop.objects.get(name=name).id
+
+    def get(self, **params):
+        return self.client.get('/api/v1/product/info', params)
+
+    def test_hit_and_precise_invalidation(self):
+        own, other = {'shop_id': self.shops['Связной']}, {'shop_id': self.shops['Евросеть']}
+        for params in ({}, own, other, {'category_id': 2}):
+            self.assertEqual(self.get(**params)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.get(**other)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(catalog_cache.stats()['hits'], 1)
+
+        # Импорт одного магазина не сбрасывает ответы по другому магазину и его категории
+        self.import_goods('Связной', 1, price=200)
+        self.assertEqual(self.get(**other)['X-Cache'], 'HIT')
+        self.assertEqual(self.get(category_id=2)['X-Cache'], 'HIT')
+        response = self.get(**own)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual({item['price'] for item in response.json()['results']}, {200})
+        self.assertEqual(self.get()['X-Cache'], 'MISS')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Shop.objects.filter(id=self.shops['Евросеть']).update(status=False)
+            readmodel.refresh_shops([self.shops['Евросеть']])
+        self.assertEqual(self.get(**own)['X-Cache'], 'HIT')
+        response = self.get(**other)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'], [])
+
+    def test_normalized_key(self):
+        self.get(category_id=1, page_size=2)
+        self.assertEqual(self.client.get('/api/v1/product/info?page_size=2&category_id=01')['X-Cache'], 'HIT')
+
+
+class ConditionalGetTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='shop@example.com', password='123456', type='shop')
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop = Shop.objects.create(name='Связной', user=self.user)
+            Category.objects.create(name='Смартфоны')
+
+    def assert_not_modified(self, url):
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        return etag
+
+    def test_lists(self):
+        for url, change in (('/api/v1/categories/', lambda: Category.objects.create(name='Ноутбуки')),
+                            ('/api/v1/shops/', lambda: self.shop.save())):
+            etag = self.assert_not_modified(url)
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_catalog(self):
+        url = '/api/v1/product/info?shop_id={}'.format(self.shop.id)
+        etag = self.assert_not_modified(url)
+        self.assertNotEqual(self.client.get('/api/v1/product/info')['ETag'], etag)
+
+        job = ImportJob.objects.create(user=self.user, url='http://example.com/price.yaml')
+        with self.captureOnCommitCallbacks(execute=True):
+            write_price_list(job, PriceList('Связной', [{'id': 1, 'name': 'Смартфоны'}], iter([
+                {'id': 1, 'category': 1, 'model': 'a', 'name': 'Товар', 'price': 10, 'price_rrc': 12, 'quantity': 1},
+            ])))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_expanded_shop(self):
+        job = ImportJob.objects.create(user=self.user, url='http://example.com/price.yaml')
+        with self.captureOnCommitCallbacks(execute=True):
+            write_price_list(job, PriceList('Связной', [{'id': 1, 'name': 'Смартфоны'}], iter([
+                {'id': 1, 'category': 1, 'model': 'a', 'name': 'Товар', 'price': 10, 'price_rrc': 12, 'quantity': 1},
+            ])))
+        info_id = ProductInfo.objects.get().id
+        urls = ('/api/v1/product/info?expand=shop', f'/api/v1/product/info/bulk?ids={info_id}&expand=shop')
+        etags = [self.assert_not_modified(url) for url in urls]
+        plain = self.client.get('/api/v1/product/info')['ETag']
+
+        # Переименование магазина не меняет строки каталога, но меняет раскрытый магазин
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop.name = 'Связной-Маркет'
+            self.shop.save()
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['results'][0]['shop']['name'], 'Связной-Маркет')
+        self.assertEqual(self.client.get('/api/v1/product/info')['ETag'], plain)
+
+
+class FieldSelectionTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='buyer@example.com', password='123456')
+        self.client.force_authenticate(self.user)
+        shop = Shop.objects.create(name='Связной')
+        category = Category.objects.create(name='Смартфоны')
+        product = Product.objects.create(name='Смартфон', category=category)
+        self.info = ProductInfo.objects.create(product=product, shop=shop, external_id=1, model='a', price=100,
+                                               price_rrc=120, quantity=5)
+        ProductParameter.objects.create(product_info=self.info, parameter=Parameter.objects.create(name='Цвет'),
+                                        value='черный')
+        readmodel.refresh_products([product.id])
+        contact = UserInfo.objects.create(user=self.user, city='Москва', street='Тверская', phone='123')
+        self.order = Order.objects.create(user=self.user, user_info=contact, status='basket')
+        OrderInfo.objects.create(order=self.order, product_info=self.info, quantity=2)
+
+    def test_catalog_fields(self):
+        data = self.client.get('/api/v1/product/info', {'fields': 'id,price,product.name'}).json()
+        self.assertEqual(data['results'], [{'id': self.info.id, 'product': {'name': 'Смартфон'}, 'price': 100}])
+
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/v1/product/info', {'fields': 'id,shop', 'expand': 'shop'}).json()
+        self.assertEqual(data['results'][0]['shop']['name'], 'Связной')
+
+    def test_order_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/v1/order/', {'fields': 'id,total_sum'}).json()
+        self.assertEqual(data['Orders'], [{'id': self.order.id, 'total_sum': 200}])
+        self.assertEqual(len(queries), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/v1/order/', {'fields': 'order_info.product_info.price'}).json()
+        self.assertEqual(data['Orders'], [{'order_info': [{'product_info': self.info.id}]}])
+        self.assertFalse([query for query in queries if 'shop_productinfo' in query['sql']])
+
+        data = self.client.get('/api/v1/order/', {'fields': 'order_info.product_info.price,'
+                                                            'order_info.product_info.product.name',
+                                                  'expand': 'order_info.product_info'}).json()
+        self.assertEqual(data['Orders'], [{'order_info': [{'product_info': {'product': {'name': 'Смартфон'},
+                                                                             'price': 100}}]}])
+
+    def test_basket_fields(self):
+        data = self.client.get('/api/v1/basket/', {'fields': 'id,order_info.quantity'}).json()
+        self.assertEqual(data['results'], [{'id': self.order.id, 'order_info': [{'quantity': 2}]}])
+
+
+class ExpandedOrderInfoSerializer(OrderInfoSerializer):
+    product_info = ProductInfoSerializer(read_only=True)
+
+
+class ExpandedOrderSerializer(OrderSerializer):
+    order_info = ExpandedOrderInfoSerializer(many=True, read_only=True)
+
+
+class FastSerializerTestCase(CatalogTestCase):
+    def test_identical_to_drf(self):
+        buyer = testdata.seed(30)
+        infos = ProductInfo.objects.live().order_by('id')
+        ids = [info.id for info in infos]
+        data = fast_serializers.product_infos(ids)
+        self.assertEqual(loads(dumps([data[pk] for pk in ids])),
+                         loads(dumps(ProductInfoSerializer(infos, many=True).data)))
+
+        orders = Order.objects.filter(user=buyer).annotate(
+            total_sum=Sum(F('order_info__product_info__price') * F('order_info__quantity'))).distinct()
+        for selection, serializer in ((FieldSelection(), OrderSerializer),
+                                      (FieldSelection(expand={'order_info.product_info'}), ExpandedOrderSerializer)):
+            with self.subTest(expand=selection.expand):
+                fast = fast_serializers.orders(fast_serializers.order_rows(orders, selection), selection)
+                self.assertEqual(loads(dumps(fast)), loads(dumps(serializer(orders, many=True).data)))
+
+    def test_orders_endpoint_queries(self):
+        buyer = testdata.seed(30)
+        self.client.force_authenticate(buyer)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/v1/order/').json()
+        self.assertEqual(len(data['Orders']), 3)
+        self.assertEqual(len(queries), 3)
+
+    def test_retired_siblings(self):
+        shop = Shop.objects.create(name='Связной', catalog_generation=1)
+        product = Product.objects.create(name='Смартфон', category=Category.objects.create(name='Смартфоны'))
+        live, retired = ProductInfo.objects.bulk_create([
+            ProductInfo(product=product, shop=shop, external_id=1, model='a', price=100, price_rrc=120, quantity=5,
+                        generation=1),
+            ProductInfo(product=product, shop=shop, external_id=2, model='b', price=90, price_rrc=120, quantity=5,
+                        retired_generation=1),
+        ])
+        data = fast_serializers.product_infos([live.id, retired.id])
+        # Скрытая строка выводится для заказов, но не попадает в соседние строки товара
+        self.assertEqual(data[retired.id]['product']['product_info'], [live.id])
+        self.assertEqual(data[live.id]['product']['product_info'], [live.id])
+        drf = ProductInfoSerializer([live, retired], many=True).data
+        self.assertEqual(loads(dumps(drf)), loads(dumps([data[live.id], data[retired.id]])))
+
+
+# Полный просмотр таблицы в плане запроса: SCAN без индекса в SQLite, Seq Scan в PostgreSQL
+FULL_SCAN = re.compile(r'^SCAN (\w+)$|Seq Scan on (\w+)')
+# Таблицы, которые читаются целиком по смыслу запроса: список категорий выдается полностью
+FULL_SCAN_ALLOWED = {'shop_category'}
+
+
+def query_plan(sql):
+    """
+    План выполнения запроса: строки EXPLAIN QUERY PLAN в SQLite или EXPLAIN в PostgreSQL
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # На маленьких тестовых таблицах полный просмотр дешевле индекса, поэтому он запрещается:
+            # если индекса для запроса нет, планировщик все равно выберет Seq Scan
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0].strip() for row in cursor.fetchall()]
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    """
+    Таблицы, которые план просматривает полностью, без индекса
+    """
+    tables = {next(filter(None, match.groups())) for match in map(FULL_SCAN.search, plan) if match}
+    # Подзапросы и представления в плане тоже просматриваются, но это не таблицы базы
+    return tables.intersection(connection.introspection.table_names()) - FULL_SCAN_ALLOWED
+
+
+class QueryPlanTestCase(CatalogTestCase):
+    """
+    Планы запросов представлений: каждый запрос чтения идет по индексу.
+    Запросы перехватываются при вызове представлений и проверяются через EXPLAIN.
+    """
+    def setUp(self):
+        super().setUp()
+        self.buyer = testdata.seed(30)
+        self.shop = Shop.objects.get()
+        self.category = Category.objects.first()
+        self.client.force_authenticate(self.buyer)
+        product_info = ProductInfo.objects.order_by('id').first()
+        basket = Order.objects.create(user=self.buyer, user_info=UserInfo.objects.get(), status='basket')
+        OrderInfo.objects.create(order=basket, product_info=product_info, quantity=1)
+        self.basket_item = Order.objects.filter(user_id=self.buyer.id, status='basket'), product_info.id
+
+    def assertIndexed(self, function, ordered=False):
+        """
+        Запросы, выполненные function, не просматривают таблицы полностью;
+        ordered - и не сортируют строки в памяти
+        """
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            function()
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            plan = query_plan(sql)
+            with self.subTest(sql=sql):
+                self.assertFalse(full_scans(plan), plan)
+                if ordered:
+                    self.assertFalse([line for line in plan if 'TEMP B-TREE FOR ORDER BY' in line], plan)
+
+    def get(self, path, params=None):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_catalog(self):
+        for params in ({}, {'category_id': self.category.id}, {'shop_id': self.shop.id},
+                       {'shop_id': self.shop.id, 'category_id': self.category.id}, {'page': 1},
+                       {'param': 'Цвет=черный'}, {'ordering': 'price'}, {'ordering': '-price', 'page': 1},
+                       {'ordering': 'quantity', 'in_stock': 'true'},
+                       {'ordering': 'price', 'category_id': self.category.id, 'min_price': 1, 'max_price': 10 ** 6},
+                       {'ordering': '-price', 'shop_id': self.shop.id},
+                       {'ordering': 'quantity', 'category_id': self.category.id},
+                       {'ordering': 'quantity', 'shop_id': self.shop.id, 'in_stock': 'true'}):
+            self.assertIndexed(lambda: self.get('/api/v1/product/info', params), ordered=True)
+        self.assertIndexed(lambda: self.get('/api/v1/product/info/bulk', {'ids': '3,1,2', 'expand': 'shop'}))
+        for params in ({}, {'ordering': 'price'}, {'ordering': '-price', 'category_id': self.category.id},
+                       {'category_id': self.category.id}, {'product_id': [1, 2]}):
+            self.assertIndexed(lambda: self.get('/api/v1/product/offers', params), ordered=True)
+        # Следующая страница по курсору читается с позиции в индексе сортировки
+        for ordering in CatalogPagination.orderings:
+            next_page = self.get('/api/v1/product/info', {'ordering': ordering, 'page_size': 5})['next']
+            self.assertIndexed(lambda: self.get(next_page), ordered=True)
+
+    def test_lists(self):
+        self.assertIndexed(lambda: self.get('/api/v1/categories/'))
+        self.assertIndexed(lambda: self.get('/api/v1/shops/'))
+        self.assertIndexed(lambda: self.get('/api/v1/product/search', {'q': 'товар'}))
+
+    def test_orders(self):
+        self.assertIndexed(lambda: self.get('/api/v1/basket/'))
+        self.assertIndexed(lambda: self.get('/api/v1/order/'))
+        # Строки корзины по заказу и товару (BasketOfGoodsView.put и delete)
+        basket, product_info_id = self.basket_item
+        items = OrderInfo.objects.filter(order__in=basket, product_info_id=product_info_id)
+        self.assertIndexed(lambda: items.first())
+        self.assertIndexed(lambda: items.delete())
+
+
+class CatalogExportTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        testdata.seed(30)
+        self.rows = [entry.data for entry in CatalogEntry.objects.order_by('pk')]
+
+    def download(self, path, **headers):
+        response = self.client.get(path, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson(self):
+        response, content = self.download('/api/v1/product/export.ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual([loads(line) for line in content.decode().splitlines()], self.rows)
+
+        shop_id = self.rows[0]['shop']
+        _, content = self.download(f'/api/v1/product/export.ndjson?shop_id={shop_id}&category_id=0')
+        self.assertEqual(content, b'')
+        self.assertEqual(self.client.get('/api/v1/product/export.xml').status_code, 404)
+        self.assertEqual(self.client.get('/api/v1/product/export.csv?shop_id=x').status_code, 400)
+
+    def test_csv(self):
+        _, content = self.download('/api/v1/product/export.csv')
+        rows = list(csv.reader(content.decode().splitlines()))
+        self.assertEqual(tuple(rows[0]), export.CSV_FIELDS)
+        self.assertEqual(len(rows), len(self.rows) + 1)
+        first = dict(zip(rows[0], rows[1]))
+        self.assertEqual((int(first['id']), first['product'], int(first['price'])),
+                         (self.rows[0]['id'], self.rows[0]['product']['name'], self.rows[0]['price']))
+        self.assertEqual(loads(first['parameters']), {parameter['parameter']: parameter['value']
+                                                      for parameter in self.rows[0]['product_parameters']})
+
+    def test_gzip(self):
+        _, plain = self.download('/api/v1/product/export.csv')
+        response, content = self.download('/api/v1/product/export.csv', accept_encoding='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(content), plain)
+
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('export_catalog', '--gzip', '--output', f'{directory}/catalog.ndjson.gz')
+            with gzip.open(f'{directory}/catalog.ndjson.gz', 'rt', encoding='utf-8') as file:
+                self.assertEqual([loads(line) for line in file], self.rows)
+
+    def test_constant_memory(self):
+        shop, category = Shop.objects.get(), Category.objects.first()
+        product = Product.objects.create(name='Товар', category=category)
+        peaks = []
+        for count in (300, 3000):
+            infos = ProductInfo.objects.bulk_create([
+                ProductInfo(product=product, shop=shop, external_id=index, model=f'model-{index}', price=index,
+                            price_rrc=index, quantity=1, generation=len(peaks)) for index in range(count)])
+            CatalogEntry.objects.bulk_create([
+                CatalogEntry(product_info=info, product=product, shop=shop, category=category, shop_status=True,
+                             price=info.price, quantity=1, data={'id': info.id, 'model': info.model * 20})
+                for info in infos])
+            tracemalloc.start()
+            lines = export.ndjson_lines(export.catalog_rows(chunk_size=100))
+            for _ in compression.compress_stream('gzip', export.byte_chunks(lines)):
+                pass
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        self.assertLess(peaks[1], peaks[0] * 2)
+
+
+class CompressionTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.buyer = testdata.seed(30)
+        self.client.force_authenticate(self.buyer)
+
+    def test_negotiate(self):
+        best = compression.available_encodings()[0]
+        self.assertEqual(compression.negotiate('gzip, deflate'), 'gzip')
+        self.assertEqual(compression.negotiate('*'), best)
+        self.assertEqual(compression.negotiate('zstd, br, gzip;q=0.9'), best)
+        self.assertEqual(compression.negotiate('gzip;q=0.5, br;q=0.4'), 'gzip')
+        for header in ('', 'identity', 'gzip;q=0', 'deflate', 'gzip;q=x'):
+            self.assertIsNone(compression.negotiate(header), header)
+
+    def test_json_response(self):
+        plain = self.client.get('/api/v1/product/info', {'page_size': 50})
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        response = self.client.get('/api/v1/product/info', {'page_size': 50}, headers={'accept-encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(plain.content) / 3)
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        # ETag сжатого ответа слабый, условный запрос с ним по-прежнему дает 304
+        self.assertEqual(response['ETag'], f'W/{plain["ETag"]}')
+        response = self.client.get('/api/v1/product/info', {'page_size': 50},
+                                   headers={'accept-encoding': 'gzip', 'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_small_response(self):
+        response = self.client.get('/api/v1/product/info', {'page_size': 1, 'fields': 'id'},
+                                   headers={'accept-encoding': 'gzip'})
+        self.assertLess(len(response.content), 1024)
+        self.assertNotIn('Content-Encoding', response)
+        with override_settings(COMPRESSION_MIN_SIZE=0):
+            response = self.client.get('/api/v1/order/', headers={'accept-encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_html_not_compressed(self):
+        # Страницы с токеном CSRF не сжимаются (BREACH)
+        request = APIRequestFactory().get('/', headers={'accept-encoding': 'gzip'})
+        page = HttpResponse('<input name="csrfmiddlewaretoken" value="token">' * 100, content_type='text/html')
+        self.assertNotIn('Content-Encoding', compression.CompressionMiddleware(lambda request: page)(request))
+        rows = HttpResponse('id,price\n' * 200, content_type='text/csv; charset=utf-8')
+        self.assertEqual(compression.CompressionMiddleware(lambda request: rows)(request)['Content-Encoding'], 'gzip')
+
+    def test_compress_responses(self):
+        bodies = {
+            'catalog': self.client.get('/api/v1/product/info', {'page_size': 100}).content,
+            'orders': self.client.get('/api/v1/order/', {'expand': 'order_info.product_info'}).content,
+            'export': b''.join(self.client.get('/api/v1/product/export.ndjson').streaming_content),
+        }
+        for name, body in bodies.items():
+            for encoding in compression.available_encodings():
+                with self.subTest(name, encoding=encoding):
+                    self.assertLess(len(compression.compress(encoding, body, 1)), len(body) / 2)
+        self.assertEqual(gzip.decompress(b''.join(compression.compress_stream('gzip', iter([b'a' * 10, b'b'])))),
+                         b'a' * 10 + b'b')
+
+    @skipUnless(compression.brotli and compression.zstandard, 'нужны пакеты brotli и zstandard')
+    def test_brotli_zstd(self):
+        decompress = {'br': compression.brotli.decompress,
+                      'zstd': lambda data: compression.zstandard.ZstdDecompressor().decompressobj().decompress(data)}
+        self.assertEqual(compression.available_encodings(), ['zstd', 'br', 'gzip'])
+        plain = self.client.get('/api/v1/product/info', {'page_size': 50}).content
+        export = b''.join(self.client.get('/api/v1/product/export.ndjson').streaming_content)
+        for encoding in ('zstd', 'br'):
+            with self.subTest(encoding):
+                self.assertEqual(compression.negotiate(f'gzip, {encoding}'), encoding)
+                response = self.client.get('/api/v1/product/info', {'page_size': 50},
+                                           headers={'accept-encoding': encoding})
+                self.assertEqual(response['Content-Encoding'], encoding)
+                self.assertLess(len(response.content), len(plain) / 3)
+                self.assertEqual(decompress[encoding](response.content), plain)
+                response = self.client.get('/api/v1/product/export.ndjson', headers={'accept-encoding': encoding})
+                self.assertEqual(response['Content-Encoding'], encoding)
+                self.assertEqual(decompress[encoding](b''.join(response.streaming_content)), export)
+
+
+class RendererTestCase(CatalogTestCase):
+    def test_matches_json_renderer(self):
+        data = {'name': 'Смартфон "A/B"\u2028', 'created_at': timezone.now(), 'id': [1, None, True],
+                'nested': {'price': 1.5, 'delay': timedelta(seconds=3)}}
+        self.assertEqual(UJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(UJSONRenderer().render(data, 'application/json; indent=2'),
+                         JSONRenderer().render(data, 'application/json; indent=2'))
+        self.assertEqual(UJSONRenderer().render(None), b'')
+        response = JsonResponse({'Status': False, 'Errors': 'Ошибка'}, status=400)
+        self.assertEqual((response.status_code, response['Content-Type']), (400, 'application/json'))
+        self.assertEqual(loads(response.content), {'Status': False, 'Errors': 'Ошибка'})
+
+    def test_parser(self):
+        self.assertEqual(UJSONParser().parse(BytesIO('{"items": [1, "ж"]}'.encode())), {'items': [1, 'ж']})
+        with self.assertRaises(ParseError):
+            UJSONParser().parse(BytesIO(b'{"items": '))
+
+    def test_api_settings(self):
+        self.assertIs(api_settings.DEFAULT_RENDERER_CLASSES[0], UJSONRenderer)
+        self.assertIs(api_settings.DEFAULT_PARSER_CLASSES[0], UJSONParser)
+
+    def test_identical_on_catalog(self):
+        buyer = testdata.seed(30)
+        selection = FieldSelection(expand={'order_info.product_info'})
+        payloads = {
+            'catalog': {'next': None, 'results': list(CatalogEntry.objects.values_list('data', flat=True))},
+            'orders': {'Status': True, 'Orders': fast_serializers.orders(
+                fast_serializers.order_rows(Order.objects.filter(user=buyer), selection), selection)},
+        }
+        for name, data in payloads.items():
+            with self.subTest(name):
+                body = JSONRenderer().render(data)
+                self.assertEqual(UJSONRenderer().render(data), body)
+                self.assertEqual(UJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+                self.assertEqual(loads(JsonResponse(data).content), loads(body))
+
+
+class FeedReaderTestCase(APITestCase):
+    def test_read_yaml(self):
+        price_list = read_yaml(BytesIO(PRICE_LIST.encode()))
+        self.assertEqual(price_list.shop, 'Связной')
+        self.assertEqual(len(price_list.categories), 2)
+        first = next(price_list.goods)
+        self.assertEqual(first['id'], 4216292)
+        self.assertEqual(first['parameters']['Диагональ (дюйм)'], 6.5)
+        self.assertEqual(len(list(price_list.goods)), 1)
+
+    def test_read_jsonl(self):
+        price_list = read_jsonl(BytesIO(b'{"shop": "A", "categories": []}\n\n{"id": 1}\n{"id": 2}'))
+        self.assertEqual(price_list.shop, 'A')
+        self.assertEqual([item['id'] for item in price_list.goods], [1, 2])
+
+    def test_constant_memory(self):
+        peaks = []
+        for count in (300, 3000):
+            stream = BytesIO(generate_yaml(count))
+            tracemalloc.start()
+            self.assertEqual(sum(1 for _ in read_yaml(stream).goods), count)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        self.assertLess(peaks[1], peaks[0] * 2)
+
+    def test_generated_feed(self):
+        goods = list(testdata.generate_goods(50))
+        with tempfile.TemporaryDirectory() as directory:
+            for format, reader in (('yaml', read_yaml), ('jsonl', read_jsonl)):
+                with open(testdata.write_feed(f'{directory}/price.{format}', 50, format), 'rb') as file:
+                    price_list = reader(file)
+                    self.assertEqual(price_list.shop, 'Бенчмарк')
+                    self.assertEqual(list(price_list.goods), goods)
@@ -1,16 +1,22 @@
 from django.urls import path, include
-from .views import (PartnerUpdate, LoginUserView, RegisterUser, BasketOfGoodsView, CategoryView, ShopView,
-                   ProductInfoView, UserInfoView, OrderView, ConfirmEmailView, UserContactView)
+from .views import (PartnerUpdate, PartnerImportView, LoginUserView, RegisterUser, BasketOfGoodsView, CategoryView,
+                   ShopView, ProductInfoView, ProductSearchView, UserInfoView, OrderView, ConfirmEmailView,
+                   UserContactView, BestOfferView, ProductInfoBulkView, ProductExportView)
 
 
 urlpatterns = [
     path('partner/update/', PartnerUpdate.as_view(), name='partner_update'),
+    path('partner/import/<int:job_id>/', PartnerImportView.as_view(), name='partner_import'),
     path('user/login/', LoginUserView.as_view(), name='login'),
     path('user/register/', RegisterUser.as_view(), name='register'),
     path('basket/', BasketOfGoodsView.as_view(), name='basket'),
     path('categories/', CategoryView.as_view(), name='categories'),
     path('shops/', ShopView.as_view(), name='shops'),
     path('product/info', ProductInfoView.as_view(), name='products'),
+    path('product/info/bulk', ProductInfoBulkView.as_view(), name='products_bulk'),
+    path('product/export.<str:export_format>', ProductExportView.as_view(), name='product_export'),
+    path('product/search', ProductSearchView.as_view(), name='product_search'),
+    path('product/offers', BestOfferView.as_view(), name='product_offers'),
     path('user/info', UserInfoView.as_view(), name='user_info'),
     path('order/', OrderView.as_view(), name='order'),
     path('user/register/confirm_email/', ConfirmEmailView.as_view(), name='confirm_email'),
@@ -1,27 +1,34 @@
 from django.contrib.auth import authenticate
 from django.shortcuts import render
+from django.utils.decorators import method_decorator
 from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter, OpenApiExample
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
 from django.core.validators import URLValidator
 from django.db import IntegrityError
 from .forms import ImageForm
 from .signals import new_order
-from django.db.models import Q, F, Sum
-from django.http import JsonResponse, HttpResponseRedirect
+from django.db.models import Q, Exists, OuterRef
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from rest_framework.authtoken.models import Token
 from rest_framework.generics import ListAPIView
 from rest_framework.pagination import PageNumberPagination
-from yaml import load as load_yaml, Loader
 from ujson import load as load_json
-from requests import get
-from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth.password_validation import validate_password
-from .models import ProductInfo, Shop, Category, Product, ProductParameter, Parameter, Order, EmailToken, \
-    OrderInfo, UserInfo, generate_thumbnails_async
+from .models import Shop, Category, ProductParameter, Order, EmailToken, OrderInfo, UserInfo, ImportJob, CatalogEntry, \
+    BestOffer, generate_thumbnails_async
 from .serializers import (UserSerializer, ShopSerializer, CategorySerializer, ProductSerializer, ProductInfoSerializer,
                          ProductParameterSerializer, OrderSerializer, OrderInfoSerializer, UserInfoSerializer,
-                         OrderInfoCreateSerializer, EmailSerializer)
+                         OrderInfoCreateSerializer, EmailSerializer, ImportJobSerializer, BestOfferSerializer)
+from .tasks import import_price_list
+from .pagination import KeysetPagination
+from .facets import facet_counts
+from .fields import FieldSelection
+from .renderers import JsonResponse
+from .search import get_backend as get_search_backend
+from . import catalog_cache, export, fast_serializers, registry
+from .importer import load_progress
 from .parameters import token_param, email_param, password_param, type_param, first_name_param, last_name_param, \
     city_param, phone_param, street_param, house_number_param, flat_number_param
 
@@ -32,6 +39,43 @@ class InfoPagination(PageNumberPagination):
     max_page_size = 100
 
 
+SEARCH_LIMIT = 20  # Количество результатов поиска по умолчанию
+SEARCH_MAX_LIMIT = 100
+BULK_MAX_IDS = 300  # Наибольшее количество id в одном запросе ProductInfoBulkView
+
+
+def catalog_results(entries, selection):
+    """
+    Готовые ответы строк каталога с выбранными полями, магазины запрашиваются только по ?expand=shop
+    """
+    results = [entry.data for entry in entries]
+    if selection.expands('shop'):
+        shops = {item['id']: item for item in ShopSerializer(
+            Shop.objects.filter(id__in={result['shop'] for result in results}), many=True).data}
+        results = [{**result, 'shop': shops.get(result['shop'])} for result in results]
+    return selection.project(results)
+
+
+class CatalogPagination(KeysetPagination):
+    """
+    Постраничный вывод каталога по курсору с сортировкой по id строки товара.
+    Сортировки orderings выбираются параметром ?ordering=, при равных значениях
+    строки идут по id, так что ключ курсора остается уникальным.
+    Для каждой сортировки есть индекс CatalogEntry, и страница читается без сортировки в памяти.
+    """
+    ordering = ('pk',)
+    orderings = {'price': ('price', 'pk'), '-price': ('-price', '-pk'), 'quantity': ('quantity', 'pk')}
+
+
+class BestOfferPagination(KeysetPagination):
+    """
+    Постраничный вывод лучших предложений по курсору с сортировкой по id товара
+    или по лучшей цене (?ordering=price или -price)
+    """
+    ordering = ('pk',)
+    orderings = {'price': ('min_price', 'pk'), '-price': ('-min_price', '-pk')}
+
+
 
 
 def upload_images(request):
@@ -48,7 +92,8 @@ def upload_images(request):
 
 class PartnerUpdate(APIView):
     """
-    Класс для обновления прайса от поставщика
+    Класс для обновления прайса от поставщика.
+    Загрузка и запись прайс-листа выполняются в фоновой задаче.
     """
     def post(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
@@ -62,40 +107,45 @@ class PartnerUpdate(APIView):
             validate_url = URLValidator()
             try:
                 validate_url(url)
-            except ValidationError as e:
+            except DjangoValidationError as e:
                 return JsonResponse({'Status': False, 'Error': str(e)})
             else:
-                stream = get(url).content
-
-                data = load_yaml(stream, Loader=Loader)
-
-                shop, _ = Shop.objects.get_or_create(name=data['shop'], user_id=request.user.id)
-                for category in data['categories']:
-                    category_object, _ = Category.objects.get_or_create(id=category['id'], name=category['name'])
-                    category_object.shops.add(shop.id)
-                    category_object.save()
-                ProductInfo.objects.filter(shop_id=shop.id).delete()
-                for item in data['goods']:
-                    product, _ = Product.objects.get_or_create(name=item['name'], category_id=item['category'])
-
-                    product_info = ProductInfo.objects.create(product_id=product.id,
-                                                              external_id=item['id'],
-                                                              model=item['model'],
-                                                              price=item['price'],
-                                                              price_rrc=item['price_rrc'],
-                                                              quantity=item['quantity'],
-                                                              shop_id=shop.id)
-                    for name, value in item['parameters'].items():
-                        parameter_object, _ = Parameter.objects.get_or_create(name=name)
-                        ProductParameter.objects.create(product_info_id=product_info.id,
-                                                        parameter_id=parameter_object.id,
-                                                        value=value)
+                # Создаем задачу импорта и ставим ее в очередь
+                job = ImportJob.objects.create(user_id=request.user.id, url=url)
+                import_price_list.delay(job.id)
 
-                return JsonResponse({'Status': True})
+                return JsonResponse({'Status': True, 'Job': job.id}, status=202)
 
         return JsonResponse({'Status': False, 'Errors': 'Не указаны все необходимые аргументы'})
 
 
+@extend_schema(tags=['Partner'])
+@extend_schema_view(
+    get=extend_schema(
+        summary='Получение статуса импорта прайс-листа',
+    ),
+)
+class PartnerImportView(APIView):
+    """
+    Класс для получения статуса задачи импорта прайс-листа
+    """
+    serializer_class = ImportJobSerializer
+
+    def get(self, request, job_id, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'Status': False, 'Error': 'Log in required'}, status=403)
+
+        if request.user.type != 'shop':
+            return JsonResponse({'Status': False, 'Error': 'Только для магазинов'}, status=403)
+
+        job = ImportJob.objects.filter(id=job_id, user_id=request.user.id).first()
+        if job is None:
+            return JsonResponse({'Status': False, 'Errors': 'Задача импорта не найдена'}, status=404)
+
+        serializer = ImportJobSerializer(load_progress(job))
+        return JsonResponse({'Status': True, 'Job': serializer.data})
+
+
 @extend_schema(tags=['Register User'])
 @extend_schema_view(
     post=extend_schema(
@@ -303,9 +353,11 @@ class UserInfoView(APIView):
         summary='Получение списка категорий товаров',
     ),
 )
+@method_decorator(catalog_cache.conditional(catalog_cache.list_etag(catalog_cache.CATEGORIES_KEY)), name='get')
 class CategoryView(ListAPIView):
     """
-    Класс для получения списка категорий
+    Класс для получения списка категорий.
+    ETag ответа зависит от версии списка категорий, на совпавший If-None-Match отдается 304.
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -317,9 +369,11 @@ class CategoryView(ListAPIView):
         summary='Получение списка магазинов',
     ),
 )
+@method_decorator(catalog_cache.conditional(catalog_cache.list_etag(catalog_cache.SHOPS_KEY)), name='get')
 class ShopView(ListAPIView):
     """
-    Класс для получения списка магазинов
+    Класс для получения списка магазинов.
+    ETag ответа зависит от версии списка магазинов, на совпавший If-None-Match отдается 304.
     """
     queryset = Shop.objects.filter(status=True)
     serializer_class = ShopSerializer
@@ -334,18 +388,32 @@ class ShopView(ListAPIView):
 class ProductInfoView(APIView):
     """
     Класс для получения информации о товарах.
+    По умолчанию страницы выдаются по курсору (?cursor=), общее количество
+    товаров считается только при ?count=true. Параметр ?page= включает
+    прежний постраничный вывод по номеру страницы.
+    Фильтр по параметрам: ?param=Цвет=черный&param=Цвет=белый&param=Диагональ (дюйм)=6.5,
+    значения одного параметра объединяются через ИЛИ, разные параметры - через И.
+    При ?facets=true в ответ добавляются количества товаров по значениям параметров.
+    Поля ответа выбираются через ?fields=id,price,product.name, ?expand=shop выводит магазин объектом.
+    Фильтры по цене и наличию: ?min_price=100&max_price=500&in_stock=true,
+    сортировка: ?ordering=price, -price или quantity (по умолчанию по id).
+    ETag ответа зависит от параметров запроса и версии области каталога (см. catalog_cache).
     """
-    pagination_class = InfoPagination  # Указываем класс пагинации для ответов
+    pagination_class = CatalogPagination  # Указываем класс пагинации для ответов
     serializer_class = ProductInfoSerializer
 
+    @method_decorator(catalog_cache.conditional(catalog_cache.page_etag))
     def get(self, request, *args, **kwargs):
         # Создаем начальный запрос для фильтрации товаров,
-        # учитывая только активные магазины (shop с status=True)
-        query = Q(shop__status=True)
+        # учитывая только активные магазины (статус магазина хранится в строке каталога)
+        query = Q(shop_status=True)
 
         # Получаем параметры фильтрации из запроса
         category_id = request.query_params.get('category_id')
         shop_id = request.query_params.get('shop_id')
+        for name, value in (('category_id', category_id), ('shop_id', shop_id)):
+            if value and not value.isdigit():
+                return JsonResponse({'Status': False, 'Errors': f'{name} задается целым числом'}, status=400)
 
         # Если указан идентификатор категории, добавляем условие к запросу
         if category_id:
@@ -353,26 +421,257 @@ class ProductInfoView(APIView):
 
         # Если указан идентификатор магазина, добавляем условие к запросу
         if shop_id:
-            query &= Q(product__shop_id=shop_id)
+            query &= Q(shop_id=shop_id)
 
+        # Фильтры по цене и наличию на складе
         try:
-            # Выполняем запрос к базе данных с учетом всех условий фильтрации,
-            # выбираем связанные объекты для оптимизации запросов (select_related)
-            # и подгружаем параметры продуктов (prefetch_related)
-            queryset = ProductInfo.objects.filter(query).select_related(
-                'product__category', 'shop').prefetch_related('product_parameters__parameter').distinct()
-
-            # Инициализируем пагинатор и получаем страницу результатов
+            min_price, max_price = (int(request.query_params[name]) if request.query_params.get(name) else None
+                                    for name in ('min_price', 'max_price'))
+        except ValueError:
+            return JsonResponse({'Status': False, 'Errors': 'Цена задается целым числом'}, status=400)
+        if min_price is not None:
+            query &= Q(price__gte=min_price)
+        if max_price is not None:
+            query &= Q(price__lte=max_price)
+        in_stock = request.query_params.get('in_stock', '').lower() in ('1', 'true', 'yes')
+        if in_stock:
+            query &= Q(quantity__gt=0)
+
+        ordering = request.query_params.get('ordering')
+        if ordering and ordering not in CatalogPagination.orderings:
+            orderings = ', '.join(CatalogPagination.orderings)
+            return JsonResponse({'Status': False, 'Errors': f'Сортировка задается как ordering={orderings}'},
+                                status=400)
+
+        # Собираем фильтры по значениям параметров
+        parameter_values = {}
+        for parameter_filter in request.query_params.getlist('param'):
+            name, separator, value = parameter_filter.partition('=')
+            if not separator:
+                return JsonResponse({'Status': False,
+                                     'Errors': 'Фильтр по параметру задается как param=название=значение'},
+                                    status=400)
+            parameter_values.setdefault(name, []).append(value)
+        parameter_ids = registry.parameters.ids(parameter_values)
+        # Для неизвестного параметра parameter_id=None, и товаров не найдется
+        parameter_filters = [Exists(ProductParameter.objects.filter(product_info=OuterRef('pk'),
+                                                                    parameter_id=parameter_ids.get(name),
+                                                                    value__in=values))
+                             for name, values in parameter_values.items()]
+
+        # Ответ на такой же запрос мог быть сохранен в кэше (см. catalog_cache)
+        cache_key = catalog_cache.page_key(request)
+        data = catalog_cache.get_page(cache_key)
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        # Строки каталога хранят готовый ответ сериализатора (см. readmodel),
+        # поэтому страница читается одним запросом по индексу, без соединений.
+        # В модели чтения только строки опубликованного поколения каталога магазина,
+        # так что каталог, импорт которого еще не завершен, не виден
+        # Цена и количество читаются для позиции курсора при сортировке по ним
+        queryset = CatalogEntry.objects.filter(query, *parameter_filters).only('product_info_id', 'data',
+                                                                               'price', 'quantity')
+
+        # Инициализируем пагинатор и получаем страницу результатов
+        ordering = CatalogPagination.orderings.get(ordering, CatalogPagination.ordering)
+        if 'page' in request.query_params:
+            paginator = InfoPagination()
+            queryset = queryset.order_by(*ordering)
+        else:
             paginator = self.pagination_class()
-            page_query = paginator.paginate_queryset(queryset, request)
+            paginator.ordering = ordering
+        page_query = paginator.paginate_queryset(queryset, request)
+
+        # Возвращаем ответ с пагинированными данными
+        response = paginator.get_paginated_response(catalog_results(page_query,
+                                                                    FieldSelection.from_request(request)))
+        if request.query_params.get('facets', '').lower() in ('1', 'true', 'yes'):
+            # Без фильтров по параметрам, цене и наличию счетчики берутся из предрассчитанных фасетов
+            filtered = parameter_filters or min_price is not None or max_price is not None or in_stock
+            response.data['facets'] = facet_counts(category_id, shop_id, queryset if filtered else None)
+        catalog_cache.set_page(cache_key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
 
-            # Сериализуем данные страницы с помощью сериализатора
-            serializer = ProductInfoSerializer(page_query, many=True)
 
-            # Возвращаем ответ с пагинированными данными
-            return paginator.get_paginated_response(serializer.data)
-        except Exception as e:
-            return JsonResponse({'Status': False, 'Errors': str(e)})
+@extend_schema(tags=['Product'])
+@extend_schema_view(
+    get=extend_schema(
+        summary='Полнотекстовый поиск товаров',
+        parameters=[
+            OpenApiParameter(name='q', type=str, location=OpenApiParameter.QUERY, required=True,
+                             description='Поисковый запрос, слова ищутся по началу основы'),
+            OpenApiParameter(name='limit', type=int, location=OpenApiParameter.QUERY, required=False,
+                             description=f'Количество результатов, не больше {SEARCH_MAX_LIMIT}'),
+        ],
+    ),
+)
+class ProductSearchView(APIView):
+    """
+    Класс для полнотекстового поиска товаров по названию, модели, категории и параметрам.
+    Результаты упорядочены по релевантности (см. search).
+    """
+    serializer_class = ProductInfoSerializer
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return JsonResponse({'Status': False, 'Errors': 'Не указан поисковый запрос'}, status=400)
+        try:
+            limit = min(max(int(request.query_params.get('limit', SEARCH_LIMIT)), 1), SEARCH_MAX_LIMIT)
+        except ValueError:
+            return JsonResponse({'Status': False, 'Errors': 'Некорректный limit'}, status=400)
+
+        filters = {}
+        for name in ('category_id', 'shop_id'):
+            value = request.query_params.get(name)
+            if value:
+                if not value.isdigit():
+                    return JsonResponse({'Status': False, 'Errors': f'{name} задается целым числом'}, status=400)
+                filters[name] = int(value)
+
+        backend = get_search_backend()
+        if backend is None:
+            return JsonResponse({'Status': False, 'Errors': 'Поиск недоступен'}, status=501)
+
+        # Индекс возвращает id по убыванию релевантности, готовые строки каталога получаем одним запросом
+        ids = backend.search(query, limit, **filters)
+        entries = CatalogEntry.objects.filter(pk__in=ids, shop_status=True).only('product_info_id', 'data').in_bulk()
+        return Response({'results': catalog_results([entries[info_id] for info_id in ids if info_id in entries],
+                                                    FieldSelection.from_request(request))})
+
+
+@extend_schema(tags=['Product'])
+@extend_schema_view(
+    get=extend_schema(
+        summary='Информация о нескольких товарах по id',
+        parameters=[
+            OpenApiParameter(name='ids', type=str, location=OpenApiParameter.QUERY, required=True,
+                             description=f'id строк товаров через запятую, не больше {BULK_MAX_IDS}'),
+        ],
+    ),
+)
+@method_decorator(catalog_cache.conditional(catalog_cache.list_etag(catalog_cache.scope_key())), name='get')
+class ProductInfoBulkView(APIView):
+    """
+    Класс для получения информации о нескольких товарах одним запросом (корзина, избранное, заказ).
+    Строки выдаются в порядке ?ids=, повторы убираются; id, которых нет в каталоге
+    активных магазинов, перечисляются в missing.
+    Поля ответа выбираются так же, как в ProductInfoView (?fields=, ?expand=shop).
+    ETag ответа зависит от версии всего каталога (см. catalog_cache).
+    """
+    serializer_class = ProductInfoSerializer
+
+    def get(self, request, *args, **kwargs):
+        try:
+            ids = list(dict.fromkeys(int(info_id) for value in request.query_params.getlist('ids')
+                                     for info_id in value.split(',') if info_id.strip()))
+        except ValueError:
+            return JsonResponse({'Status': False, 'Errors': 'id задаются целыми числами через запятую'}, status=400)
+        if not ids:
+            return JsonResponse({'Status': False, 'Errors': 'Не указаны id товаров'}, status=400)
+        if len(ids) > BULK_MAX_IDS:
+            return JsonResponse({'Status': False, 'Errors': f'Можно запросить не больше {BULK_MAX_IDS} товаров'},
+                                status=400)
+
+        # Готовые строки каталога читаются одним запросом IN по первичному ключу
+        entries = CatalogEntry.objects.filter(pk__in=ids, shop_status=True).only('product_info_id', 'data').in_bulk()
+        return Response({
+            'results': catalog_results([entries[info_id] for info_id in ids if info_id in entries],
+                                       FieldSelection.from_request(request)),
+            'missing': [info_id for info_id in ids if info_id not in entries],
+        })
+
+
+@extend_schema(tags=['Product'])
+@extend_schema_view(
+    get=extend_schema(
+        summary='Выгрузка каталога в NDJSON или CSV',
+        parameters=[
+            OpenApiParameter(name='category_id', type=int, location=OpenApiParameter.QUERY, required=False,
+                             description='Категория товаров'),
+            OpenApiParameter(name='shop_id', type=int, location=OpenApiParameter.QUERY, required=False,
+                             description='Магазин'),
+        ],
+        responses={(200, content_type): str for content_type in export.CONTENT_TYPES.values()},
+    ),
+)
+class ProductExportView(APIView):
+    """
+    Класс для полной выгрузки каталога активных магазинов: /product/export.ndjson
+    (строка JSON на товар, как в ProductInfoView) или /product/export.csv.
+    Ответ пишется потоком по мере чтения строк (см. export), без пагинации и подсчета строк.
+    Поток сжимается по Accept-Encoding (см. compression).
+    """
+    def get(self, request, export_format, *args, **kwargs):
+        if export_format not in export.FORMATS:
+            return JsonResponse({'Status': False, 'Errors': f'Формат выгрузки: {", ".join(export.FORMATS)}'},
+                                status=404)
+        # Фильтры проверяются до начала ответа: ошибка посреди потока оборвала бы выгрузку
+        filters = {}
+        for name in ('category_id', 'shop_id'):
+            value = request.query_params.get(name)
+            if value:
+                if not value.isdigit():
+                    return JsonResponse({'Status': False, 'Errors': f'{name} задается целым числом'}, status=400)
+                filters[name] = int(value)
+
+        response = StreamingHttpResponse(export.export(export_format, **filters),
+                                         content_type=f'{export.CONTENT_TYPES[export_format]}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="catalog.{export_format}"'
+        return response
+
+
+@extend_schema(tags=['Product'])
+@extend_schema_view(
+    get=extend_schema(
+        summary='Сравнение цен: лучшее предложение по каждому товару',
+        parameters=[
+            OpenApiParameter(name='category_id', type=int, location=OpenApiParameter.QUERY, required=False,
+                             description='Категория товаров'),
+            OpenApiParameter(name='product_id', type=int, location=OpenApiParameter.QUERY, required=False,
+                             many=True, description='Товары, можно указать несколько раз'),
+            OpenApiParameter(name='ordering', type=str, location=OpenApiParameter.QUERY, required=False,
+                             enum=list(BestOfferPagination.orderings), description='Сортировка по лучшей цене'),
+        ],
+    ),
+)
+@method_decorator(catalog_cache.conditional(catalog_cache.list_etag(catalog_cache.scope_key())), name='get')
+class BestOfferView(APIView):
+    """
+    Класс для сравнения цен товара в магазинах, принимающих заказы.
+    Для каждого товара выдаются лучшая цена и предложение с ней, самая высокая цена,
+    разница цен и количество предложений. Ответ читается из таблицы BestOffer,
+    которую пересчитывают пересборка каталога и смена статуса магазина (см. readmodel).
+    ETag ответа зависит от версии всего каталога (см. catalog_cache).
+    """
+    pagination_class = BestOfferPagination
+    serializer_class = BestOfferSerializer
+
+    def get(self, request, *args, **kwargs):
+        query = Q()
+        try:
+            if request.query_params.get('category_id'):
+                query &= Q(category_id=int(request.query_params['category_id']))
+            product_ids = [int(product_id) for product_id in request.query_params.getlist('product_id')]
+        except ValueError:
+            return JsonResponse({'Status': False, 'Errors': 'Идентификатор задается целым числом'}, status=400)
+        if product_ids:
+            query &= Q(pk__in=product_ids)
+
+        ordering = request.query_params.get('ordering')
+        if ordering and ordering not in self.pagination_class.orderings:
+            orderings = ', '.join(self.pagination_class.orderings)
+            return JsonResponse({'Status': False, 'Errors': f'Сортировка задается как ordering={orderings}'},
+                                status=400)
+
+        paginator = self.pagination_class()
+        paginator.ordering = self.pagination_class.orderings.get(ordering, paginator.ordering)
+        offers = paginator.paginate_queryset(BestOffer.objects.filter(query).select_related('product').only(
+            'product_id', 'product__name', 'category_id', 'product_info_id', 'shop_id', 'min_price', 'max_price',
+            'offer_count'), request)
+        return paginator.get_paginated_response(self.serializer_class(offers, many=True).data)
 
 
 @extend_schema(tags=['Basket',])
@@ -396,6 +695,7 @@ class BasketOfGoodsView(APIView):
     """
     Класс для добавления товаров в корзину.
     Этот класс обрабатывает GET и POST запросы для работы с корзиной пользователя.
+    В GET поля ответа выбираются через ?fields= и ?expand=, как в OrderView.
     """
     pagination_class = InfoPagination  # Указываем класс пагинации для ответов
     def get_serializer_class(self):
@@ -407,21 +707,21 @@ class BasketOfGoodsView(APIView):
         # Проверяем, авторизован ли пользователь
         if request.user.is_authenticated:
             try:
-                # Получаем корзину пользователя с учетом связанных объектов и суммируем стоимость товаров
-                basket = Order.objects.filter(user_id=request.user.id, status='basket').prefetch_related(
-                    'order_info__product_info__product__category',
-                    'order_info__product_info__product_parameters__parameter').annotate(
-                    total_sum=Sum(F('order_info__product_info__product__price') * F('order_info__quantity'))).distinct()
+                # Получаем корзину пользователя и суммируем стоимость товаров. Связанные объекты
+                # запрашиваются, только если попадают в ответ (?fields=, ?expand=, см. fields)
+                selection = FieldSelection.from_request(request)
+                basket = fast_serializers.order_rows(Order.objects.filter(user_id=request.user.id, status='basket'),
+                                                     selection)
 
                 # Инициализируем пагинатор и получаем страницу результатов
                 paginator = self.pagination_class()
                 page_query = paginator.paginate_queryset(basket, request)
 
-                # Сериализуем данные страницы с помощью сериализатора
-                serializer = OrderSerializer(page_query, many=True)
+                # Сериализуем данные страницы словарями из строк .values() (см. fast_serializers)
+                data = fast_serializers.orders(page_query, selection)
 
                 # Возвращаем ответ с пагинированными данными
-                return paginator.get_paginated_response(serializer.data)
+                return paginator.get_paginated_response(data)
             except Exception as e:
                 # В случае возникновения ошибки возвращаем сообщение об ошибке
                 return JsonResponse({'Status': False, 'Errors': str(e)})
@@ -658,7 +958,8 @@ class UserContactView(APIView):
 )
 class OrderView(APIView):
     """
-    Класс для получения и размещения заказов пользователя
+    Класс для получения и размещения заказов пользователя.
+    Поля ответа выбираются через ?fields=, ?expand=order_info.product_info выводит товары объектами.
     """
     serializer_class = OrderSerializer
 
@@ -666,16 +967,15 @@ class OrderView(APIView):
         # Проверяем, авторизован ли пользователь
         if request.user.is_authenticated:
             try:
-                # Если пользователь авторизирован, получаем данные заказов и отправляем их
-                order = Order.objects.filter(user_id=request.user.id).prefetch_related(
-                    'order_info__product_info__product__category',
-                    'order_info__product_info__product_parameters__parameter').select_related('user_info').annotate(
-                    total_price=Sum(F('order_info__product_info__price') * F('order_info__quantity'))).distinct()
+                # Если пользователь авторизирован, получаем данные заказов и отправляем их.
+                # Связанные объекты подгружаются, только если попадают в ответ (?fields=, ?expand=)
+                selection = FieldSelection.from_request(request)
+                order = fast_serializers.order_rows(Order.objects.filter(user_id=request.user.id), selection)
             except ObjectDoesNotExist as e:
                 return JsonResponse({'Status': False, 'Errors': str(e)})
             else:
-                serializer = OrderSerializer(order, many=True)
-                return JsonResponse({'Status': True, 'Orders': serializer.data})
+                # Заказы сериализуются словарями из строк .values() (см. fast_serializers)
+                return JsonResponse({'Status': True, 'Orders': fast_serializers.orders(order, selection)})
 
         return JsonResponse({'Status': False, 'Errors': 'Необходима авторизация'})
 
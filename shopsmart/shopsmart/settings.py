@@ -56,6 +56,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Сжатие ответов по Accept-Encoding, см. COMPRESSION_* ниже
+    'shop.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -144,10 +146,13 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 40,
 
-    'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
-
+    # JSON на ujson (см. shop.renderers), HTML-интерфейс API - только при отладке
+    'DEFAULT_RENDERER_CLASSES': ('shop.renderers.UJSONRenderer',) + (
+        ('rest_framework.renderers.BrowsableAPIRenderer',) if DEBUG else ()),
+    'DEFAULT_PARSER_CLASSES': (
+        'shop.renderers.UJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -297,6 +302,34 @@ BATON = {
 # Celery settings
 CELERY_BROKER_URL = "redis://localhost:6379/0"
 CELERY_RESULT_BACKEND = "redis://localhost:6379/1"
+# Импорт прайс-листов выполняется отдельным пулом воркеров: celery -A shopsmart worker -Q feeds
+CELERY_TASK_ROUTES = {
+    'shop.tasks.import_price_list': {'queue': 'feeds'},
+}
+CELERY_BEAT_SCHEDULE = {
+    'refresh-shop-feeds': {
+        'task': 'shop.tasks.refresh_shop_feeds',
+        'schedule': 60.0,  # Проверка наступления срока обновления прайс-листов раз в минуту
+    },
+}
+
+# Плановое обновление прайс-листов
+FEED_REFRESH_INTERVAL = 60 * 60  # Период обновления прайс-листа магазина в секундах
+FEED_REFRESH_CONCURRENCY = 4  # Максимальное число одновременно выполняемых импортов
+FEED_REFRESH_SLOW_SECONDS = 10 * 60  # Прайс-листы дольше этого времени занимают не больше половины слотов
+FEED_JOB_TIMEOUT = 6 * 60 * 60  # Через сколько секунд незавершенная задача импорта считается потерянной
+
+# Класс поискового индекса каталога (см. shop.search), по умолчанию выбирается по СУБД:
+# FTS5 для SQLite, tsvector для PostgreSQL
+SEARCH_BACKEND = None
+
+# Время жизни ответов каталога в кэше в секундах (см. shop.catalog_cache), 0 - не кэшировать
+CATALOG_CACHE_TIMEOUT = 10 * 60
+
+# Сжатие ответов (см. shop.compression): ответы короче COMPRESSION_MIN_SIZE байт не сжимаются,
+# brotli и zstd используются при установленных пакетах brotli и zstandard
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_LEVELS = {'zstd': 3, 'br': 5, 'gzip': 6}
 
 ROLLBAR = {
     'access_token': '',
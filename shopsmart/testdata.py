@@ -0,0 +1,106 @@
+"""
+Синтетические данные для тестов и бенчмарков (benchmarks); в приложение shop не входят.
+
+Прайс-листы в формате, который принимает PartnerUpdate: shop, categories и goods
+с параметрами товаров. Прайс-лист пишется в файл построчно, поэтому его размер
+не ограничен памятью. Строки записываются как JSON-строки, которые являются
+допустимыми YAML-скалярами в двойных кавычках.
+
+seed заполняет базу каталогом из импортированного прайс-листа и заказами
+по его строкам.
+"""
+from random import Random
+
+from ujson import dumps
+
+CATEGORY_NAMES = ('Смартфоны', 'Аксессуары', 'Ноутбуки', 'Телевизоры', 'Планшеты', 'Наушники', 'Часы', 'Фототехника')
+COLORS = ('черный', 'белый', 'золотистый', 'красный', 'синий', 'серебристый')
+BRANDS = ('Apple', 'Samsung', 'Xiaomi', 'Huawei', 'Sony', 'Lenovo')
+LINES_PER_ORDER = 10
+
+
+def generate_goods(count, categories=len(CATEGORY_NAMES), seed=0, changed=0.0):
+    """
+    Товары прайс-листа. При changed > 0 у такой доли товаров меняется цена,
+    что имитирует повторную загрузку прайс-листа поставщика.
+    """
+    random = Random(seed)
+    for external_id in range(1, count + 1):
+        brand = BRANDS[external_id % len(BRANDS)]
+        price = 1000 + external_id % 997 * 100
+        if changed and random.random() < changed:
+            price += 10
+        yield {
+            'id': external_id,
+            'category': external_id % categories + 1,
+            'model': f'{brand.lower()}/model-{external_id}',
+            'name': f'{brand} модель {external_id}',
+            'price': price,
+            'price_rrc': price + price // 10,
+            'quantity': external_id % 50,
+            'parameters': {
+                'Цвет': COLORS[external_id % len(COLORS)],
+                'Память (ГБ)': 2 ** (external_id % 5 + 4),
+                'Диагональ (дюйм)': round(5 + external_id % 30 / 10, 1),
+            },
+        }
+
+
+def write_header(file, format, shop, categories):
+    category_list = [{'id': number + 1, 'name': CATEGORY_NAMES[number % len(CATEGORY_NAMES)]}
+                     for number in range(categories)]
+    if format == 'jsonl':
+        file.write(dumps({'shop': shop, 'categories': category_list}, ensure_ascii=False) + '\n')
+        return
+    file.write(f'shop: {dumps(shop, ensure_ascii=False)}\ncategories:\n')
+    for category in category_list:
+        file.write(f'  - id: {category["id"]}\n    name: {dumps(category["name"], ensure_ascii=False)}\n')
+    file.write('goods:\n')
+
+
+def write_item(file, format, item):
+    if format == 'jsonl':
+        file.write(dumps(item, ensure_ascii=False) + '\n')
+        return
+    lines = [f'  - id: {item["id"]}']
+    for field in ('category', 'model', 'name', 'price', 'price_rrc', 'quantity'):
+        lines.append(f'    {field}: {dumps(item[field], ensure_ascii=False)}')
+    lines.append('    parameters:')
+    for name, value in item['parameters'].items():
+        lines.append(f'      {dumps(name, ensure_ascii=False)}: {dumps(value, ensure_ascii=False)}')
+    file.write('\n'.join(lines) + '\n')
+
+
+def write_feed(path, count, format='yaml', shop='Бенчмарк', categories=len(CATEGORY_NAMES), seed=0, changed=0.0):
+    """
+    Запись прайс-листа из count товаров в файл path
+    """
+    with open(path, 'w', encoding='utf-8') as file:
+        write_header(file, format, shop, categories)
+        for item in generate_goods(count, categories, seed, changed):
+            write_item(file, format, item)
+    return path
+
+
+def seed(rows):
+    """
+    Каталог из rows товаров и заказы, в которых rows строк
+    """
+    # Модели импортируются при вызове: модуль загружается до настройки Django
+    from shop.feeds import PriceList
+    from shop.importer import write_price_list
+    from shop.models import ImportJob, Order, OrderInfo, ProductInfo, User, UserInfo
+
+    shop_user = User.objects.create_user(email='shop@example.com', password='benchmark', type='shop')
+    categories = [{'id': index, 'name': name} for index, name in enumerate(CATEGORY_NAMES, 1)]
+    write_price_list(ImportJob.objects.create(user=shop_user, url='http://example.com/price.yaml'),
+                     PriceList('Бенчмарк', categories, generate_goods(rows)))
+
+    buyer = User.objects.create_user(email='buyer@example.com', password='benchmark')
+    contact = UserInfo.objects.create(user=buyer, city='Москва', street='Тверская', phone='123')
+    info_ids = list(ProductInfo.objects.order_by('id').values_list('id', flat=True))
+    orders = Order.objects.bulk_create([Order(user=buyer, user_info=contact, status='new')
+                                        for _ in range(0, len(info_ids), LINES_PER_ORDER)])
+    OrderInfo.objects.bulk_create([OrderInfo(order=orders[index // LINES_PER_ORDER], product_info_id=info_id,
+                                             quantity=1 + index % 3) for index, info_id in enumerate(info_ids)])
+    return buyer